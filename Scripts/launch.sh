@@ -17,4 +17,7 @@ printf "  • http://localhost:8501\n"
 printf "  • http://host.docker.internal:8501  (if supported)\n\n"
 printf "==============================================\n\n"
 
+# Snapshot livré avec l'image : recalculé avant d'ouvrir le port seulement s'il est périmé
+poetry run python Scripts/precalculer_snapshot.py --si-perime || echo "Précalcul impossible, le dashboard le fera au premier chargement"
+
 poetry run streamlit run app/main.py --server.address 0.0.0.0 --server.port 8501
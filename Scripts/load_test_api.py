@@ -0,0 +1,138 @@
+"""
+Test de charge de l'API JSON (app/api.py) sur un jeu de données synthétique.
+
+    python Scripts/load_test_api.py --requetes 5000 --concurrence 16
+
+Affiche le débit (req/s) et les latences p50/p95/p99, à froid (cache de réponses vide)
+puis à chaud, ainsi que le coût d'une revalidation ETag (304). Seules les réponses 200 / 304
+entrent dans ces chiffres ; les autres sont comptées à part et font échouer le test.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+import numpy as np
+
+if str(PROJECT_ROOT := Path(__file__).resolve().parent.parent) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import api
+from src.data.aggregats import construire_aggregats
+from src.data.factice import generer_donnees_factices
+from src.data.snapshot import ouvrir_snapshot, publier_snapshot
+from src.data.transform import enrichir_base
+
+# Part des requêtes générées qui filtrent sur une gare de départ / sur un service
+PART_FILTRE_GARE = 0.5
+PART_FILTRE_SERVICE = 0.3
+STATUTS_ATTENDUS = {200, 304}
+
+
+def generer_requetes(df, nb_distinctes: int, graine: int = 0) -> list[str]:
+    """Pool d'URL de filtres réalistes (années, service, gares, top)."""
+    rng = random.Random(graine)
+    annees = sorted(df["Year"].unique().tolist())
+    departs = sorted(df["gare_depart"].unique().tolist())
+    urls = []
+    for _ in range(nb_distinctes):
+        debut = rng.choice(annees)
+        params = {"annees": ",".join(str(a) for a in annees if debut <= a <= debut + rng.randint(0, 2))}
+        if rng.random() < PART_FILTRE_GARE:
+            params["gare_depart"] = rng.choice(departs)
+        if rng.random() < PART_FILTRE_SERVICE:
+            params["service"] = rng.choice(["National", "International"])
+        ressource = rng.choice(["metriques", "gares", "liaisons", "causes"])
+        if ressource == "liaisons":
+            params["top"] = rng.choice([3, 5, 10])
+        urls.append(f"/v1/{ressource}?{urlencode(params)}")
+    return urls
+
+
+def lancer_charge(port: int, urls: list[str], nb_requetes: int, concurrence: int, entetes: dict | None = None):
+    """
+    Envoie nb_requetes réparties sur `concurrence` connexions keep-alive, renvoie
+    (durée, latences des réponses 200 / 304, nombre de réponses par autre statut).
+    """
+    par_client = nb_requetes // concurrence
+
+    def client(indice: int) -> tuple[list[float], Counter]:
+        rng = random.Random(indice)
+        connexion = http.client.HTTPConnection("127.0.0.1", port)
+        latences, erreurs = [], Counter()
+        for _ in range(par_client):
+            debut = time.perf_counter()
+            connexion.request("GET", rng.choice(urls), headers=entetes or {})
+            reponse = connexion.getresponse()
+            reponse.read()
+            if reponse.status in STATUTS_ATTENDUS:
+                latences.append(time.perf_counter() - debut)
+            else:
+                erreurs[reponse.status] += 1
+        connexion.close()
+        return latences, erreurs
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as pool:
+        resultats = list(pool.map(client, range(concurrence)))
+    duree = time.perf_counter() - debut
+    latences = np.array([latence for lats, _ in resultats for latence in lats])
+    return duree, latences, sum((erreurs for _, erreurs in resultats), Counter())
+
+
+def afficher(titre: str, duree: float, latences: np.ndarray, erreurs: Counter) -> int:
+    """Une ligne de résultats ; renvoie le nombre de réponses en erreur."""
+    ligne = f"{titre:<28} {len(latences) / duree:>9.0f} req/s"
+    if len(latences):
+        p50, p95, p99 = np.percentile(latences, [50, 95, 99]) * 1000
+        ligne += f"   p50 {p50:6.2f} ms   p95 {p95:6.2f} ms   p99 {p99:6.2f} ms"
+    if erreurs:
+        ligne += "   erreurs " + ", ".join(f"{statut}: {n}" for statut, n in sorted(erreurs.items()))
+    print(ligne)
+    return sum(erreurs.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'API SNCF")
+    parser.add_argument("--requetes", type=int, default=4000)
+    parser.add_argument("--concurrence", type=int, default=16)
+    parser.add_argument("--distinctes", type=int, default=300, help="nombre d'URL de filtres différentes")
+    parser.add_argument("--annees", type=int, default=5)
+    parser.add_argument("--liaisons", type=int, default=300)
+    args = parser.parse_args()
+
+    df = enrichir_base(generer_donnees_factices(nb_annees=args.annees, nb_liaisons=args.liaisons))
+    dossier = Path(tempfile.mkdtemp(prefix="sncf_api_"))
+    publier_snapshot(df, construire_aggregats(df), dossier=dossier)
+    api.charger_etat(ouvrir_snapshot(dossier))
+
+    serveur = api.creer_serveur("127.0.0.1", 0)
+    port = serveur.server_address[1]
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+
+    urls = generer_requetes(df, args.distinctes)
+    print(f"{len(df)} lignes, {len(urls)} URL distinctes, {args.concurrence} clients, version {api.ETAT['version']}")
+
+    # chaque URL une fois : que des calculs (cache vide)
+    nb_froid = len(urls) - len(urls) % args.concurrence
+    nb_erreurs = afficher("froid (calcul)", *lancer_charge(port, urls, nb_froid, args.concurrence))
+    nb_erreurs += afficher("chaud (cache réponses)", *lancer_charge(port, urls, args.requetes, args.concurrence))
+    etag = {"If-None-Match": f'"{api.ETAT["version"]}"'}
+    nb_erreurs += afficher("revalidation (304)", *lancer_charge(port, urls, args.requetes, args.concurrence, etag))
+
+    serveur.shutdown()
+    if nb_erreurs:
+        sys.exit(f"{nb_erreurs} réponses hors 200 / 304 : chiffres non représentatifs")
+
+
+if __name__ == "__main__":
+    main()
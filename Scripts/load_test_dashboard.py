@@ -0,0 +1,258 @@
+"""
+Test de charge du dashboard Streamlit : N sessions simulées (sans navigateur) qui
+enchaînent des interactions aléatoires dans la sidebar sur un jeu de données factice.
+
+    python Scripts/load_test_dashboard.py --sessions 1,2,4,8 --interactions 15 --sortie capacite.json
+
+Pour chaque N : latences par interaction (p50/p95/p99), débit, CPU et RSS du process,
+et taille des figures plotly envoyées au navigateur à chaque rerun.
+Le rapport JSON est fait pour être comparé d'une release à l'autre.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+
+try:
+    import psutil
+except ImportError:  # optionnel : sans psutil, RSS = pic mesuré par getrusage
+    psutil = None
+
+if str(PROJECT_ROOT := Path(__file__).resolve().parent.parent) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# store et snapshot factices dans un dossier jetable (supprimé à la sortie), lus par l'app comme en production
+os.environ["SNCF_DATA_DIR"] = (DOSSIER_DONNEES := tempfile.TemporaryDirectory(prefix="sncf_charge_")).name
+
+from src.config import NB_ANNEES
+from src.data.carte import OPTIONS_NB_TRAJETS
+from src.data.collect_api import reseaux_actifs
+from src.data.factice import generer_donnees_factices
+from src.data.pipeline import publier_donnees
+from src.data.temporel import GRANULARITES
+from src.data.transform import enrichir_base
+
+APP = PROJECT_ROOT / "app" / "main.py"
+TIMEOUT_RERUN = 300  # secondes
+INTERVALLE_MESURE = 0.2  # secondes entre deux relevés CPU / RSS
+PART_OPTION_PAR_DEFAUT = 0.3  # part des choix qui reviennent à "Toutes" / "Tous"
+
+
+def partager_etat_serveur() -> None:
+    """
+    AppTest n'est pas prévu pour plusieurs sessions en parallèle. Comme le vrai serveur,
+    toutes les sessions partagent ici un seul Runtime et un seul cache du script compilé :
+    - chaque run installe son Runtime factice puis remet Runtime._instance à None en sortant,
+      sous les pieds des runs des autres threads ("Runtime hasn't been created!", widgets
+      perdus) : on garde le dernier Runtime installé pour les runs encore en cours ;
+    - chaque run recompile main.py dans son propre ScriptCache, et des ast.parse simultanés
+      font planter CPython 3.11 ("AST constructor recursion depth mismatch").
+    """
+    cache_script = ScriptCache()
+
+    def partager_cache(self):
+        self._cache, self._lock = cache_script._cache, cache_script._lock
+
+    ScriptCache.__init__ = partager_cache
+
+    dernier = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            dernier["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" not in dernier:
+            raise RuntimeError("Runtime hasn't been created!")
+        return dernier["runtime"]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in dernier)
+
+
+def interaction_aleatoire(at: AppTest, rng: random.Random) -> str:
+    """Modifie un widget de la sidebar au hasard, renvoie le nom de l'interaction."""
+    cles = {w.key for w in at.selectbox} | {w.key for w in at.slider} | {w.key for w in at.checkbox}
+    choix = rng.choice([
+        "slider_annees", "select_gare_depart", "select_gare_arrivee",
+        "select_service", "select_nb_trajets", "select_reseau",
+        "granularite", "show_retard", "show_annulation",
+    ])
+    if choix not in cles and choix != "granularite":
+        choix = "select_gare_depart"
+
+    if choix == "granularite":
+        # options affichées via format_func : AppTest attend la valeur brute
+        at.radio(key=choix).set_value(rng.choice(list(GRANULARITES)))
+    elif choix in ("show_retard", "show_annulation"):
+        case = at.checkbox(key=choix)
+        case.set_value(not case.value)
+    elif choix == "slider_annees":
+        slider = at.slider(key=choix)
+        debut = rng.randint(slider.min, slider.max)
+        slider.set_range(debut, rng.randint(debut, slider.max))
+    else:
+        selectbox = at.selectbox(key=choix)
+        if choix == "select_nb_trajets":
+            # options affichées via format_func : AppTest attend la valeur brute
+            selectbox.set_value(rng.choice(OPTIONS_NB_TRAJETS))
+        else:
+            # "Toutes"/"Tous" reste fréquent, comme dans un usage réel
+            options = selectbox.options
+            selectbox.set_value(options[0] if rng.random() < PART_OPTION_PAR_DEFAUT else rng.choice(options))
+    return choix
+
+
+def octets_graphiques(at: AppTest) -> int:
+    """Taille des figures plotly (JSON) du dernier rerun, telles qu'envoyées au navigateur."""
+    return sum(len(graphique.proto.spec) for graphique in at.get("plotly_chart"))
+
+
+def simuler_session(indice: int, nb_interactions: int) -> list[tuple[str, float, int]]:
+    """Une session : premier affichage puis nb_interactions reruns, chacun chronométré (et ses figures pesées)."""
+    rng = random.Random(indice)
+    at = AppTest.from_file(str(APP), default_timeout=TIMEOUT_RERUN)
+
+    mesures = []
+    debut = time.perf_counter()
+    at.run()
+    mesures.append(("premier_affichage", time.perf_counter() - debut, octets_graphiques(at)))
+
+    for _ in range(nb_interactions):
+        # un widget absent ou une option refusée est une régression du dashboard : l'erreur remonte
+        nom = interaction_aleatoire(at, rng)
+        debut = time.perf_counter()
+        at.run()
+        mesures.append((nom, time.perf_counter() - debut, octets_graphiques(at)))
+        if at.exception:
+            raise RuntimeError(f"{nom} : {at.exception[0].value}")
+    return mesures
+
+
+def rss_octets() -> int:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def mesurer_niveau(nb_sessions: int, nb_interactions: int) -> dict:
+    """Lance nb_sessions sessions en parallèle (threads, comme le serveur Streamlit)."""
+    releves = []
+    fin = threading.Event()
+
+    def surveiller():
+        cpu_avant, mur_avant = time.process_time(), time.perf_counter()
+        while not fin.is_set():
+            time.sleep(INTERVALLE_MESURE)
+            cpu, mur = time.process_time(), time.perf_counter()
+            releves.append(((cpu - cpu_avant) / (mur - mur_avant) * 100, rss_octets()))
+            cpu_avant, mur_avant = cpu, mur
+
+    moniteur = threading.Thread(target=surveiller, daemon=True)
+    moniteur.start()
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=nb_sessions) as pool:
+        sessions = list(pool.map(
+            lambda i: simuler_session(i, nb_interactions), range(nb_sessions)
+        ))
+    duree = time.perf_counter() - debut
+    fin.set()
+    moniteur.join()
+
+    interactions = np.array([t for s in sessions for nom, t, _ in s if nom != "premier_affichage"])
+    graphiques = np.array([o for s in sessions for nom, _, o in s if nom != "premier_affichage"])
+    premiers = np.array([t for s in sessions for nom, t, _ in s if nom == "premier_affichage"])
+    par_type = {}
+    for s in sessions:
+        for nom, t, _ in s:
+            par_type.setdefault(nom, []).append(t)
+
+    cpu = np.array([c for c, _ in releves] or [0.0])
+    rss = np.array([r for _, r in releves] or [rss_octets()])
+    p50, p95, p99 = np.percentile(interactions, [50, 95, 99]) * 1000
+    return {
+        "sessions": nb_sessions,
+        "interactions": int(len(interactions)),
+        "debit_reruns_s": round(len(interactions) / duree, 2),
+        "latence_ms": {"p50": round(p50, 1), "p95": round(p95, 1), "p99": round(p99, 1)},
+        "premier_affichage_ms_p50": round(float(np.median(premiers)) * 1000, 1),
+        "latence_p50_par_interaction_ms": {
+            nom: round(float(np.median(t)) * 1000, 1) for nom, t in sorted(par_type.items())
+        },
+        "graphiques_ko_par_rerun_p50": round(float(np.median(graphiques)) / 1024, 1),
+        "cpu_pct": {"moyen": round(float(cpu.mean()), 1), "max": round(float(cpu.max()), 1)},
+        "rss_mo": {"max": round(float(rss.max()) / 2**20, 1)},
+    }
+
+
+def version_code() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True
+        ).strip()
+    except Exception:
+        return "inconnue"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du dashboard Streamlit")
+    parser.add_argument("--sessions", default="1,2,4,8", help="niveaux de sessions simultanées")
+    parser.add_argument("--interactions", type=int, default=10, help="interactions par session")
+    parser.add_argument("--annees", type=int, default=5)
+    parser.add_argument("--liaisons", type=int, default=150)
+    parser.add_argument("--sortie", type=Path, default=None, help="fichier JSON du rapport")
+    args = parser.parse_args()
+
+    # les avertissements de dépréciation de Streamlit noient la sortie
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    os.chdir(PROJECT_ROOT)  # main.py lit LogoSNCF.png en relatif
+    partager_etat_serveur()
+
+    df = enrichir_base(generer_donnees_factices(nb_annees=args.annees, nb_liaisons=args.liaisons))
+    publier_donnees(df, NB_ANNEES, reseaux_actifs())
+
+    niveaux = []
+    print(f"{len(df)} lignes, {args.interactions} interactions par session")
+    print(
+        f"{'sessions':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'CPU %':>6} {'RSS Mo':>7} "
+        f"{'figs Ko':>8}"
+    )
+    for nb in [int(n) for n in args.sessions.split(",")]:
+        niveau = mesurer_niveau(nb, args.interactions)
+        niveaux.append(niveau)
+        lat = niveau["latence_ms"]
+        print(
+            f"{nb:>8} {niveau['debit_reruns_s']:>9} {lat['p50']:>8} {lat['p95']:>8} {lat['p99']:>8} "
+            f"{niveau['cpu_pct']['moyen']:>6} {niveau['rss_mo']['max']:>7} {niveau['graphiques_ko_par_rerun_p50']:>8}"
+        )
+
+    rapport = {
+        "version_code": version_code(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "donnees": {"lignes": len(df), "annees": args.annees, "liaisons": args.liaisons},
+        "niveaux": niveaux,
+    }
+    if args.sortie:
+        args.sortie.write_text(json.dumps(rapport, indent=2, ensure_ascii=False))
+        print(f"Rapport écrit dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
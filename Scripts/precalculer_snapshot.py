@@ -0,0 +1,50 @@
+"""
+Collecte les données, précalcule les agrégats et la vue par défaut, puis publie le snapshot.
+
+    python Scripts/precalculer_snapshot.py [--forcer | --si-perime]
+    SNCF_FICHIERS_LOCAUX=exports/ python Scripts/precalculer_snapshot.py   # sans réseau
+
+Lancé au build de l'image (le snapshot est livré avec elle), puis avec --si-perime
+au démarrage du conteneur : le premier visiteur reçoit directement la vue d'accueil
+précalculée, et rien n'est retéléchargé tant que le snapshot livré est frais.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+if str(PROJECT_ROOT := Path(__file__).resolve().parent.parent) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.config import NB_ANNEES
+from src.data.pipeline import construire_snapshot, snapshot_perime
+from src.data.snapshot import ouvrir_snapshot, version_courante
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Précalcul du snapshot du dashboard SNCF")
+    parser.add_argument("--annees", type=int, default=NB_ANNEES)
+    parser.add_argument("--forcer", action="store_true", help="republier même si la source n'a pas changé")
+    parser.add_argument(
+        "--si-perime", action="store_true", help="ne rien faire si le snapshot publié est encore frais"
+    )
+    args = parser.parse_args()
+
+    snap = ouvrir_snapshot()
+    if args.si_perime and snap is not None and not snapshot_perime(snap, args.annees):
+        print(f"Snapshot {snap['version']} encore frais, rien à recalculer")
+        return
+
+    debut = time.perf_counter()
+    version = construire_snapshot(nb_annees=args.annees, forcer=args.forcer)
+    duree = time.perf_counter() - debut
+    if version is None:
+        print(f"Source injoignable (ou aucun fichier local lisible), snapshot inchangé (version {version_courante()})")
+        return
+    print(f"Snapshot {version} publié en {duree:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
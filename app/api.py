@@ -0,0 +1,244 @@
+"""
+API JSON en lecture seule sur les agrégats précalculés du dashboard.
+
+    python app/api.py --port 8502
+
+GET /v1/version
+GET /v1/metriques?annees=2023,2024&reseau=TGV&service=National&gare_depart=...&gare_arrivee=...
+GET /v1/gares?role=depart|arrivee|ensemble&...
+GET /v1/liaisons?top=10&tri=nb_train_retard_arrivee|retard_100km|retard_arrivee_100km&...
+GET /v1/causes?...
+GET /v1/export?table=lignes|metriques|liaisons|gares&format=csv|parquet|xlsx&...   (fichier en flux)
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+if str(PROJECT_ROOT := Path(__file__).resolve().parent.parent) not in sys.path:  # Project_SNCF/
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.data.aggregats import (
+    CRITERE_LIAISONS_DEFAUT,
+    CRITERES_LIAISONS,
+    filtrer_cellules,
+    metriques_mensuelles,
+    retards_par_liaison,
+    top_liaisons,
+)
+from src.data.causes import finaliser_causes, reagreger_composantes
+from src.data.export import FORMATS, ExportInvalideError, fichier_export
+from src.data.gares import LIBELLES_ROLES, finaliser_gares
+from src.data.snapshot import en_pandas, ouvrir_snapshot, version_courante
+
+INTERVALLE_RECHARGEMENT = 30  # secondes entre deux vérifications du pointeur CURRENT
+TAILLE_CACHE_REPONSES = 2048
+TOP_LIAISONS_DEFAUT = 10
+RESSOURCES = ("/v1/version", "/v1/metriques", "/v1/gares", "/v1/liaisons", "/v1/causes", "/v1/export")
+TAILLE_BLOC_ENVOI = 64 * 1024
+
+# Version servie : remplacée d'un bloc (pas de mutation) pour que les threads lisent un état cohérent
+ETAT: dict = {"version": None, "cree_le": 0.0, "aggregats": {}, "reponse": None}
+
+
+class RequeteInvalideError(ValueError):
+    pass
+
+
+def charger_etat(snap: dict | None) -> None:
+    """Passe l'API sur un snapshot (les agrégats sont convertis une seule fois)."""
+    if snap is None:
+        return
+    global ETAT
+    etat = {
+        "version": snap["version"],
+        "cree_le": snap["meta"].get("cree_le", time.time()),
+        "aggregats": {nom: en_pandas(table) for nom, table in snap["aggregats"].items()},
+    }
+    # Cache de réponses propre à la version : il disparaît avec elle
+    etat["reponse"] = lru_cache(maxsize=TAILLE_CACHE_REPONSES)(
+        lambda chemin, requete: reponse_json(chemin, requete, etat)
+    )
+    ETAT = etat
+
+
+def surveiller_versions(intervalle: float = INTERVALLE_RECHARGEMENT) -> None:
+    """Boucle (thread) qui bascule sur la nouvelle version dès qu'elle est publiée."""
+    while True:
+        time.sleep(intervalle)
+        version = version_courante()
+        if version and version != ETAT["version"]:
+            charger_etat(ouvrir_snapshot(version=version))
+
+
+def lire_filtres(params: dict, aggregats: dict) -> tuple:
+    """Filtres de la requête au format de filtrer_cellules."""
+    if "annees" in params:
+        try:
+            annees = [int(a) for a in params["annees"].split(",") if a]
+        except ValueError as e:
+            raise RequeteInvalideError("annees doit être une liste d'entiers séparés par des virgules") from e
+    else:
+        annees = aggregats["trafic"]["Year"].unique().tolist()
+    return (
+        annees,
+        params.get("service", "Tous"),
+        params.get("gare_depart", "Toutes"),
+        params.get("gare_arrivee", "Toutes"),
+        params.get("reseau", "Tous"),
+    )
+
+
+def calculer_ressource(chemin: str, params: dict, etat: dict):
+    """Données d'une ressource de l'API (DataFrame ou dict)."""
+    aggregats = etat["aggregats"]
+    if chemin == "/v1/version":
+        return {"version": etat["version"], "cree_le": etat["cree_le"]}
+
+    filtres = lire_filtres(params, aggregats)
+    if chemin == "/v1/metriques":
+        df = metriques_mensuelles(filtrer_cellules(aggregats, "trafic", *filtres))
+        return df[["Date", "late_rate", "cancellation_rate", "nb_train_prevu", "nb_annulation",
+                   "nb_train_retard_arrivee", "retard_moyen"]] if not df.empty else df
+    if chemin == "/v1/gares":
+        gares = finaliser_gares(filtrer_cellules(aggregats, "gares", *filtres), coordonnees=aggregats["coordonnees"])
+        role = params.get("role")
+        if role is not None and role not in LIBELLES_ROLES:
+            raise RequeteInvalideError(f"role doit valoir {', '.join(LIBELLES_ROLES)}")
+        return gares[gares["role"] == role] if role else gares
+    if chemin == "/v1/liaisons":
+        try:
+            top = int(params.get("top", TOP_LIAISONS_DEFAUT))
+        except ValueError as e:
+            raise RequeteInvalideError("top doit être un entier") from e
+        tri = params.get("tri", CRITERE_LIAISONS_DEFAUT)
+        if tri not in CRITERES_LIAISONS:
+            raise RequeteInvalideError(f"tri doit valoir {', '.join(CRITERES_LIAISONS)}")
+        trajets = retards_par_liaison(filtrer_cellules(aggregats, "trafic", *filtres), aggregats["distances"])
+        return top_liaisons(trajets, top, tri)
+    if chemin == "/v1/causes":
+        cellules = filtrer_cellules(aggregats, "causes", *filtres)
+        return finaliser_causes(reagreger_composantes(cellules))[["Cause", "Pourcentage", "Retard_moyen"]]
+    raise KeyError(chemin)
+
+
+def reponse_json(chemin: str, requete: tuple, etat: dict) -> bytes:
+    """Corps JSON compact d'une ressource (mis en cache par version dans etat["reponse"])."""
+    donnees = calculer_ressource(chemin, dict(requete), etat)
+    if isinstance(donnees, dict):
+        return json.dumps(donnees, separators=(",", ":")).encode()
+    return donnees.to_json(orient="records", date_format="iso", double_precision=4).encode()
+
+
+class GestionnaireAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # en-têtes et corps partent en deux écritures : sans TCP_NODELAY, ~40 ms d'ACK retardé en keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # noqa: N802
+        etat = ETAT
+        if etat["version"] is None:
+            self._envoyer(503, b'{"erreur":"aucun snapshot disponible"}')
+            return
+
+        url = urlsplit(self.path)
+        if url.path not in RESSOURCES:
+            self._envoyer(404, b'{"erreur":"ressource inconnue"}')
+            return
+
+        requete = tuple(sorted(parse_qsl(url.query)))
+        etag = f'"{etat["version"]}"'
+        derniere_modif = formatdate(etat["cree_le"], usegmt=True)
+        entetes = {"ETag": etag, "Last-Modified": derniere_modif, "Cache-Control": "no-cache"}
+
+        if self._non_modifie(etag, etat["cree_le"]):
+            self._envoyer(304, b"", entetes)
+            return
+
+        try:
+            if url.path == "/v1/export":
+                self._envoyer_export(dict(requete), etat, entetes)
+                return
+            corps = etat["reponse"](url.path, requete)
+        except (RequeteInvalideError, ExportInvalideError) as e:
+            self._envoyer(400, json.dumps({"erreur": str(e)}).encode())
+            return
+        self._envoyer(200, corps, entetes)
+
+    def _envoyer_export(self, params: dict, etat: dict, entetes: dict) -> None:
+        """Export écrit (ou retrouvé) sur disque puis envoyé par blocs : jamais entier en mémoire."""
+        table = params.get("table", "lignes")
+        format = params.get("format", "csv")
+        filtres = lire_filtres(params, etat["aggregats"])
+        chemin = fichier_export(etat["version"], table, format, filtres, etat["aggregats"])
+
+        extension, mime = FORMATS[format]
+        self.send_response(200)
+        self.send_header("Content-Type", mime)
+        self.send_header("Content-Length", str(chemin.stat().st_size))
+        self.send_header("Content-Disposition", f'attachment; filename="sncf_{table}.{extension}"')
+        for cle, valeur in entetes.items():
+            self.send_header(cle, valeur)
+        self.end_headers()
+        with chemin.open("rb") as f:
+            shutil.copyfileobj(f, self.wfile, TAILLE_BLOC_ENVOI)
+
+    def _non_modifie(self, etag: str, cree_le: float) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= int(cree_le)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _envoyer(self, statut: int, corps: bytes, entetes: dict | None = None) -> None:
+        self.send_response(statut)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        for cle, valeur in (entetes or {}).items():
+            self.send_header(cle, valeur)
+        self.end_headers()
+        if corps:
+            self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def creer_serveur(hote: str = "0.0.0.0", port: int = 8502) -> ThreadingHTTPServer:
+    """Serveur prêt à l'emploi (le snapshot doit déjà être chargé via charger_etat)."""
+    serveur = ThreadingHTTPServer((hote, port), GestionnaireAPI)
+    serveur.daemon_threads = True
+    return serveur
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON des agrégats SNCF")
+    parser.add_argument("--hote", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    charger_etat(ouvrir_snapshot())
+    if ETAT["version"] is None:
+        print("Aucun snapshot publié : lancer le dashboard ou src.data.pipeline.construire_snapshot()")
+    threading.Thread(target=surveiller_versions, daemon=True).start()
+
+    print(f"API SNCF sur http://{args.hote}:{args.port} (version {ETAT['version']})")
+    creer_serveur(args.hote, args.port).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,60 @@ import base64
 import sys
 from pathlib import Path
 
-import folium
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
-from folium.plugins import AntPath
 from streamlit_folium import st_folium
 
-PROJECT_ROOT = Path(__file__).resolve().parent.parent  # Project_SNCF/
-if str(PROJECT_ROOT) not in sys.path:
+if str(PROJECT_ROOT := Path(__file__).resolve().parent.parent) not in sys.path:  # Project_SNCF/
     sys.path.insert(0, str(PROJECT_ROOT))
 
 # Import des modules de collecte et transformation
-from src.data.collect_api import (
-    get_gares_coordinates,
-    telecharger_donnees_sncf,
-    trouver_coordonnees,
+from src.config import NB_ANNEES
+from src.data.aggregats import (
+    CRITERE_LIAISONS_DEFAUT,
+    CRITERES_LIAISONS,
+    filtrer_cellules,
+    retards_par_liaison,
+    top_liaisons,
+)
+from src.data.anomalies import LIBELLES_MOTIFS, SEUIL_ANOMALIE, anomalies_signalees
+from src.data.carte import OPTIONS_NB_TRAJETS, construire_carte
+from src.data.causes import finaliser_causes, reagreger_composantes
+from src.data.comparaison import comparer_selections
+from src.data.export import (
+    FORMATS,
+    LIBELLES_FORMATS,
+    LIBELLES_TABLES,
+    MAX_LIGNES_EXCEL,
+    fichier_export,
+    formats_disponibles,
+)
+from src.data.facettes import (
+    annees_facettes,
+    compte_facette,
+    construire_index_facettes,
+    options_facette,
+)
+from src.data.figures import (
+    CARTES_CHALEUR,
+    figure_chaleur,
+    figure_temporelle,
+    figures_causes,
+)
+from src.data.gares import LIBELLES_ROLES, finaliser_gares
+from src.data.kpi import calculer_kpis, evolution_pct
+from src.data.pipeline import obtenir_snapshot
+from src.data.previsions import HORIZON_PREVISION, prevision_serie
+from src.data.snapshot import en_pandas, ouvrir_snapshot, version_courante
+from src.data.store import filtre_store, lire_store
+from src.data.temporel import (
+    GRANULARITES,
+    LIBELLES_GRANULARITES,
+    carte_chaleur,
+    cumuls_temporels,
 )
-from src.data.transform import enrichir_base, generer_metrics_synthetiques
 
 st.set_page_config(
     page_title="Dashboard Retards SNCF",
@@ -133,23 +168,113 @@ st.markdown("---")
 # ====================================
 # CHARGEMENT DES DONNÉES
 # ====================================
-@st.cache_data(show_spinner=False)
-def charger_donnees(nb_annees=5):
-    """Charge et enrichit les données SNCF"""
-    df = telecharger_donnees_sncf(nb_annees=nb_annees)
-    if not df.empty:
-        df = enrichir_base(df)
-    return df
-
-
-if 'df' not in st.session_state:
-    with st.spinner("Chargement des données SNCF..."):
-        df = charger_donnees(nb_annees=5)
-        st.session_state.df = df
-else:
-    df = st.session_state.df
+DELAI_VERIFICATION_SNAPSHOT = 600  # secondes entre deux vérifications de fraîcheur du snapshot
+
 
-if df.empty:
+@st.cache_resource(show_spinner=False, ttl=DELAI_VERIFICATION_SNAPSHOT)
+def verifier_snapshot(nb_annees=NB_ANNEES):
+    """
+    Publie le snapshot s'il manque ou s'il est périmé, au plus une fois par délai
+    pour tout le process. Ne charge rien : seul le pointeur CURRENT peut changer.
+    """
+    obtenir_snapshot(nb_annees=nb_annees)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def charger_donnees(version):
+    """
+    Ouvre le snapshot Arrow (memory-map) des agrégats précalculés de `version`.
+    cache_resource : un seul objet partagé par toutes les sessions du process,
+    recalculé seulement quand une nouvelle version est publiée.
+    """
+    snap = ouvrir_snapshot(version=version) if version is not None else None
+    if snap is None:
+        return {}, {}, None, None
+    aggregats = {nom: en_pandas(table) for nom, table in snap["aggregats"].items()}
+    # index des listes de la sidebar, construit une seule fois par version
+    facettes = construire_index_facettes(aggregats["facettes"])
+    # vue d'accueil précalculée à la publication (absente des snapshots plus anciens)
+    vue = snap["vue_defaut"]
+    if vue is not None:
+        vue = {nom: en_pandas(v) if nom not in ("resume", "cartes") else v for nom, v in vue.items()}
+    return aggregats, facettes, snap["version"], vue
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def charger_selection(version, annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau):
+    """
+    Lignes brutes des filtres courants, lues dans le store partitionné de `version` :
+    seules les partitions des années / réseau / service choisis sont ouvertes,
+    la mémoire dépend de la fenêtre sélectionnée et non de tout l'historique.
+    """
+    filtre = filtre_store(annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau)
+    return lire_store(version, filtre=filtre)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def charger_temporel(version, annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, _aggregats):
+    """Séries temporelles de toutes les granularités (mensuelle déjà lissée) pour les filtres courants."""
+    cellules = filtrer_cellules(
+        _aggregats, "trafic", annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
+    )
+    return cumuls_temporels(cellules)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def charger_gares(version, annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, _aggregats):
+    """Indicateurs par gare (départs, arrivées, ensemble) avec coordonnées, pour les filtres courants."""
+    cellules = filtrer_cellules(
+        _aggregats, "gares", annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
+    )
+    return finaliser_gares(cellules, coordonnees=_aggregats["coordonnees"])
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def charger_anomalies(version, annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, _aggregats):
+    """Mois anormaux des liaisons filtrées : les scores sont calculés à la publication, ici on ne fait que filtrer."""
+    cellules = filtrer_cellules(
+        _aggregats, "anomalies", annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
+    )
+    return anomalies_signalees(cellules)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def charger_figure_temporelle(
+    version, annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau,
+    granularite, courbes, avec_prevision, _series, _prevision
+):
+    """
+    Graphique temporel construit une fois par (filtres, granularité, courbes affichées) :
+    cocher / décocher une courbe ou revenir à une granularité déjà vue ne reconstruit rien.
+    """
+    return figure_temporelle(_series[granularite], granularite, courbes, _prevision if avec_prevision else None)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def charger_figures_chaleur(
+    version, annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, _mensuel
+):
+    """Cartes de chaleur Année × Mois (retards, annulations) des filtres courants."""
+    return [
+        figure_chaleur(carte_chaleur(_mensuel, colonne), titre, echelle)
+        for colonne, titre, echelle in CARTES_CHALEUR
+    ]
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def charger_figures_causes(
+    version, annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, _causes
+):
+    """Camembert et barres des causes des filtres courants."""
+    return figures_causes(_causes)
+
+
+
+with st.spinner("Chargement des données SNCF..."):
+    verifier_snapshot(nb_annees=NB_ANNEES)
+    aggregats, facettes, version_donnees, vue_defaut = charger_donnees(version_courante())
+
+if not facettes:
     st.error("❌ Impossible de charger les données")
     st.stop()
 
@@ -162,7 +287,7 @@ with st.sidebar:
 
     # Période
     st.markdown("### Période d'analyse")
-    annees_disponibles = sorted(df['Year'].unique())
+    annees_disponibles = annees_facettes(facettes)
 
     if len(annees_disponibles) > 1:
         default_range = (int(annees_disponibles[0]), int(annees_disponibles[-1]))
@@ -180,13 +305,31 @@ with st.sidebar:
         annees_selectionnees = annees_disponibles
         st.info(f"Année disponible : {annees_disponibles[0]}")
 
+    # Toutes les listes ci-dessous sont lues dans l'index de facettes de la période
+    periode = (int(annees_selectionnees[0]), int(annees_selectionnees[-1]))
+
     st.markdown("---")
 
+    # Réseau
+    reseaux_dispo = options_facette(facettes, periode, 'reseau')
+
+    if len(reseaux_dispo) > 1:
+        st.markdown("### Réseau")
+        filtre_reseau = st.selectbox(
+            "Réseau",
+            ["Tous"] + reseaux_dispo,
+            index=0,
+            key="select_reseau",
+            help="TGV, Intercités, TER"
+        )
+        st.markdown("---")
+    else:
+        filtre_reseau = "Tous"
+
     # Gares
     st.markdown("### Itinéraires")
-    df_temp = df[df['Year'].isin(annees_selectionnees)].copy()
 
-    gares_depart_dispo = sorted(df_temp['gare_depart'].dropna().unique())
+    gares_depart_dispo = options_facette(facettes, periode, 'gare_depart', filtre_reseau)
 
     if len(gares_depart_dispo) == 0:
         st.warning("Aucune gare disponible avec ces filtres")
@@ -201,10 +344,9 @@ with st.sidebar:
             help="Sélectionnez une gare de départ spécifique"
         )
 
-        if filtre_gare_depart != "Toutes":
-            df_temp = df_temp[df_temp['gare_depart'] == filtre_gare_depart]
-
-        gares_arrivee_dispo = sorted(df_temp['gare_arrivee'].dropna().unique())
+        gares_arrivee_dispo = options_facette(
+            facettes, periode, 'gare_arrivee', filtre_reseau, filtre_gare_depart
+        )
 
         if len(gares_arrivee_dispo) == 0:
             st.warning("Aucune destination disponible avec ces filtres")
@@ -222,7 +364,9 @@ with st.sidebar:
 
     # Type de service
     st.markdown("### Type de service")
-    services_dispo = ["Tous"] + sorted(df_temp.dropna(subset=['service'])['service'].unique().tolist())
+    services_dispo = ["Tous"] + options_facette(
+        facettes, periode, 'service', filtre_reseau, filtre_gare_depart, filtre_gare_arrivee
+    )
     
     filtre_service = st.selectbox(
         "Service",
@@ -232,66 +376,216 @@ with st.sidebar:
         help="National ou International"
     )
     
-    if filtre_service != "Tous":
-        df_temp = df_temp[df_temp['service'] == filtre_service]
-    
     st.markdown("---")
     
-    nb_liaisons_disponibles = len(df_temp)
+    nb_liaisons_disponibles = compte_facette(
+        facettes, periode, filtre_reseau, filtre_gare_depart, filtre_gare_arrivee, filtre_service
+    )
     st.caption(f"💡 {nb_liaisons_disponibles} liaison(s) disponible(s)")
-    st.caption(f"📊 Base totale : {len(df):,} lignes".replace(',', ' '))
+    nb_lignes_total = compte_facette(
+        facettes, (annees_disponibles[0], annees_disponibles[-1]), "Tous", "Toutes", "Toutes", "Tous"
+    )
+    st.caption(f"📊 Base totale : {nb_lignes_total:,} lignes".replace(',', ' '))
+
+    st.markdown("---")
+    mode_comparaison = st.toggle(
+        "🔀 Mode comparaison",
+        value=False,
+        key="mode_comparaison",
+        help="Comparer plusieurs liaisons, services ou périodes sur les mêmes graphiques"
+    )
 
 
 # ====================================
-# APPLICATION DES FILTRES
+# MODE COMPARAISON
 # ====================================
-df_filtre = df[df['Year'].isin(annees_selectionnees)].copy()
+COULEURS_SERIES = ['#e74c3c', '#3498db', '#2ecc71', '#f39c12']
 
-if filtre_service != "Tous":
-    df_filtre = df_filtre[df_filtre['service'] == filtre_service]
 
-if filtre_gare_depart != "Toutes":
-    df_filtre = df_filtre[df_filtre['gare_depart'] == filtre_gare_depart]
+@st.cache_resource(show_spinner=False, max_entries=16)
+def calculer_comparaison(version, selections, _aggregats):
+    """Toutes les sélections en une agrégation groupée, mise en cache par version et sélections."""
+    return comparer_selections(_aggregats, dict(selections))
 
-if filtre_gare_arrivee != "Toutes":
-    df_filtre = df_filtre[df_filtre['gare_arrivee'] == filtre_gare_arrivee]
+
+def saisir_selection(i):
+    """Widgets d'une sélection (mêmes listes en cascade que la sidebar) -> (libellé, filtres)."""
+    lettre = chr(ord('A') + i)
+    st.markdown(f"#### Sélection {lettre}")
+    if len(annees_disponibles) > 1:
+        debut, fin = st.slider(
+            "Années",
+            min_value=int(annees_disponibles[0]),
+            max_value=int(annees_disponibles[-1]),
+            value=(int(annees_disponibles[0]), int(annees_disponibles[-1])),
+            step=1,
+            key=f"cmp_annees_{i}"
+        )
+    else:
+        debut = fin = int(annees_disponibles[0])
+    annees = tuple(a for a in annees_disponibles if debut <= a <= fin)
+    periode_sel = (debut, fin)
+
+    reseau = st.selectbox(
+        "Réseau", ["Tous"] + options_facette(facettes, periode_sel, 'reseau'), key=f"cmp_reseau_{i}"
+    )
+    depart = st.selectbox(
+        "Gare de départ",
+        ["Toutes"] + options_facette(facettes, periode_sel, 'gare_depart', reseau),
+        key=f"cmp_depart_{i}"
+    )
+    arrivee = st.selectbox(
+        "Gare d'arrivée",
+        ["Toutes"] + options_facette(facettes, periode_sel, 'gare_arrivee', reseau, depart),
+        key=f"cmp_arrivee_{i}"
+    )
+    service = st.selectbox(
+        "Service",
+        ["Tous"] + options_facette(facettes, periode_sel, 'service', reseau, depart, arrivee),
+        key=f"cmp_service_{i}"
+    )
+
+    details = [f"{debut}-{fin}" if debut != fin else str(debut)]
+    if reseau != "Tous":
+        details.append(reseau)
+    if depart != "Toutes" or arrivee != "Toutes":
+        details.append(f"{depart} → {arrivee}")
+    if service != "Tous":
+        details.append(service)
+    return f"{lettre} · {' · '.join(details)}", (annees, service, depart, arrivee, reseau)
+
+
+if mode_comparaison:
+    st.header("Comparer plusieurs sélections")
+
+    nb_series = st.radio("Nombre de sélections", [2, 3, 4], horizontal=True, key="cmp_nb_series")
+    selections = []
+    for i, col in enumerate(st.columns(nb_series)):
+        with col:
+            selections.append(saisir_selection(i))
+
+    comparaison = calculer_comparaison(version_donnees, tuple(selections), aggregats)
+    libelles = [libelle for libelle, _ in selections]
+    couleurs = dict(zip(libelles, COULEURS_SERIES))
+
+    # KPI côte à côte
+    kpis_cmp = comparaison["kpis"].set_index("serie").reindex(libelles)
+    st.dataframe(
+        pd.DataFrame({
+            "Trains prévus": kpis_cmp["nb_train_prevu"].fillna(0).astype(int),
+            "Retard moyen (min)": kpis_cmp["retard_moyen"].round(1),
+            "Taux de retard (%)": kpis_cmp["late_rate"].round(2),
+            "Retards > 30 min (%)": kpis_cmp["taux_retard_sup_30"].round(2),
+            "Taux d'annulation (%)": kpis_cmp["cancellation_rate"].round(2),
+            "Cause principale": kpis_cmp["cause_principale"],
+        }),
+        use_container_width=True
+    )
+
+    # Séries superposées : trait plein = retard, pointillés = annulation
+    fig_cmp = go.Figure()
+    metriques_cmp = comparaison["metriques"]
+    for libelle in libelles:
+        serie = metriques_cmp[metriques_cmp["serie"] == libelle] if not metriques_cmp.empty else metriques_cmp
+        if serie.empty:
+            continue
+        fig_cmp.add_trace(go.Scatter(
+            x=serie['Date'], y=serie['late_rate'], mode='lines', name=f"{libelle} — retard",
+            line=dict(color=couleurs[libelle], width=2.5),
+            hovertemplate="%{x|%b %Y} : %{y:.2f}%<extra></extra>"
+        ))
+        fig_cmp.add_trace(go.Scatter(
+            x=serie['Date'], y=serie['cancellation_rate'], mode='lines', name=f"{libelle} — annulation",
+            line=dict(color=couleurs[libelle], width=1.5, dash='dot'),
+            hovertemplate="%{x|%b %Y} : %{y:.2f}%<extra></extra>"
+        ))
+    fig_cmp.update_layout(
+        title=dict(text="Taux de retard et d'annulation", font=dict(size=18, color="#F2F2F2"), x=0.5, xanchor='center'),
+        yaxis_title="Taux (%)",
+        hovermode='x unified',
+        template="plotly_dark",
+        height=500,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, bgcolor="rgba(0,0,0,0.3)"),
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)"
+    )
+    st.plotly_chart(fig_cmp, use_container_width=True)
+
+    # Parts de causes par sélection
+    fig_causes_cmp = px.bar(
+        comparaison["causes"],
+        x="Cause",
+        y="Pourcentage",
+        color="serie",
+        barmode="group",
+        color_discrete_map=couleurs,
+        category_orders={"serie": libelles},
+        labels={"serie": "", "Pourcentage": "Part (%)", "Cause": ""},
+    )
+    fig_causes_cmp.update_layout(
+        title=dict(text="Répartition des causes de retard", font=dict(size=18, color="#F2F2F2"), x=0.5, xanchor='center'),
+        template="plotly_dark",
+        height=450,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)"
+    )
+    st.plotly_chart(fig_causes_cmp, use_container_width=True)
+    st.stop()
+
+
+# ====================================
+# APPLICATION DES FILTRES
+# ====================================
+# Vue d'accueil (toutes les années, aucun filtre) : tout est lu dans le snapshot,
+# le store n'est ouvert que lorsque l'utilisateur change un filtre.
+est_vue_defaut = (
+    vue_defaut is not None
+    and annees_selectionnees == annees_disponibles
+    and (filtre_reseau, filtre_gare_depart, filtre_gare_arrivee, filtre_service) == ("Tous", "Toutes", "Toutes", "Tous")
+)
 
 
 # ====================================
 # CRÉATION DF ANNÉE PRÉCÉDENTE
 # ====================================
-def creer_df_filtre_prev(df, annees_selectionnees, 
-                         filtre_service, filtre_gare_depart, filtre_gare_arrivee):
+def creer_df_filtre_prev(annees_selectionnees,
+                         filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau="Tous"):
     """Clone les filtres appliqués à df_filtre mais décale l'année d'un an en arrière."""
     prev_years = sorted({int(y) - 1 for y in annees_selectionnees})
-    df_prev = df[df['Year'].isin(prev_years)].copy()
-
-    if filtre_service != "Tous":
-        df_prev = df_prev[df_prev['service'] == filtre_service]
-    if filtre_gare_depart != "Toutes":
-        df_prev = df_prev[df_prev['gare_depart'] == filtre_gare_depart]
-    if filtre_gare_arrivee != "Toutes":
-        df_prev = df_prev[df_prev['gare_arrivee'] == filtre_gare_arrivee]
+    df_prev = charger_selection(
+        version_donnees, tuple(prev_years),
+        filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
+    )
 
     return df_prev, prev_years
 
 
-df_filtre_prev, annees_prev = creer_df_filtre_prev(
-    df, 
-    annees_selectionnees,
-    filtre_service,
-    filtre_gare_depart,
-    filtre_gare_arrivee
-)
-
-
 # ====================================
 # GÉNÉRATION DES MÉTRIQUES
 # ====================================
-df_metrics = generer_metrics_synthetiques(df_filtre)
-
-total_trains_affiches = df_filtre['nb_train_prevu'].sum()
-nb_liaisons = len(df_filtre)
+if est_vue_defaut:
+    series_temporelles = {nom: vue_defaut[f"temporel_{nom}"] for nom in GRANULARITES}
+    total_trains_affiches = vue_defaut["resume"]["nb_train_prevu"]
+    nb_liaisons = vue_defaut["resume"]["nb_lignes"]
+else:
+    df_filtre = charger_selection(
+        version_donnees, tuple(annees_selectionnees),
+        filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
+    )
+    df_filtre_prev, annees_prev = creer_df_filtre_prev(
+        annees_selectionnees,
+        filtre_service,
+        filtre_gare_depart,
+        filtre_gare_arrivee,
+        filtre_reseau
+    )
+    series_temporelles = charger_temporel(
+        version_donnees, tuple(annees_selectionnees),
+        filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, aggregats
+    )
+    total_trains_affiches = df_filtre['nb_train_prevu'].sum()
+    nb_liaisons = len(df_filtre)
 
 if nb_liaisons == 0:
     st.error("❌ Aucune donnée disponible avec ces filtres. Veuillez modifier votre sélection.")
@@ -324,26 +618,48 @@ def get_card_color_by_evolution(value, is_inverse=False):
     return "#d48a8a", "↘", "dégradation"
 
 
+def formater_kpi(valeur, motif="{:.1f}"):
+    """Valeur d'une carte, « — » quand la mesure n'est pas publiée pour la sélection (ex. TER seul)."""
+    return "—" if pd.isna(valeur) else motif.format(valeur)
+
+
+def texte_evolution(fleche, evolution, valeur):
+    """« ↗ 3.2% » en pied de carte, « — » si la valeur courante est inconnue."""
+    return "—" if pd.isna(valeur) else f"{fleche} {abs(evolution):.1f}%"
+
+
 # ====================================
 # MÉTRIQUES PRINCIPALES (KPI)
 # ====================================
-current_year = df_filtre['Year'].max()
-previous_year = current_year - 1
+if est_vue_defaut:
+    current_year = vue_defaut["resume"]["annee_courante"]
+    previous_year = current_year - 1
+    kpis = vue_defaut["kpis"].set_index('Year')
+else:
+    current_year = df_filtre['Year'].max()
+    previous_year = current_year - 1
 
-df_current = df_filtre[df_filtre['Year'] == current_year]
-df_previous = df_filtre_prev[df_filtre_prev['Year'] == previous_year]
+    df_current = df_filtre[df_filtre['Year'] == current_year]
+    df_previous = df_filtre_prev[df_filtre_prev['Year'] == previous_year]
+
+    # Tous les KPI des deux années en une passe, chaque carte lit une ligne
+    kpis = calculer_kpis(pd.concat([df_previous, df_current]), par=['Year']).set_index('Year')
+kpi_current = kpis.loc[current_year]
+kpi_previous = kpis.loc[previous_year] if previous_year in kpis.index else kpi_current
 
 col1, col2, col3 = st.columns(3)
 
 # KPI 1 : RETARD MOYEN
 with col1:
-    retard_moyen_current = df_current['retard_moyen_tous_trains_arrivee'].mean()
-    retard_moyen_previous = df_previous['retard_moyen_tous_trains_arrivee'].mean() if len(df_previous) > 0 else retard_moyen_current
+    retard_moyen_current = kpi_current['retard_moyen']
+    retard_moyen_previous = kpi_previous['retard_moyen']
 
-    evolution_retard = ((retard_moyen_current - retard_moyen_previous) / retard_moyen_previous * 100) if retard_moyen_previous > 0 else 0
+    evolution_retard = evolution_pct(retard_moyen_current, retard_moyen_previous)
     card_color, arrow_retard, _ = get_card_color_by_evolution(evolution_retard, is_inverse=True)
 
-    if retard_moyen_current < 5:
+    if pd.isna(retard_moyen_current):
+        emoji = "➖"
+    elif retard_moyen_current < 5:
         emoji = "✅"
     elif retard_moyen_current < 15:  # noqa: PLR2004
         emoji = "⚠️"
@@ -366,7 +682,7 @@ with col1:
             </p>
             <h1 style="color: white; margin: 0.3rem 0; font-size: 2.8rem; font-weight: 700;
                        font-family: 'Arial Black', sans-serif; line-height: 1;">
-                {retard_moyen_current:.1f}<span style="font-size: 1.5rem;">min</span>
+                {formater_kpi(retard_moyen_current, '{:.1f}<span style="font-size: 1.5rem;">min</span>')}
             </h1>
             <p style="color: rgba(255,255,255,0.75); font-size: 0.85rem; margin: 0.3rem 0 0 0;">
                 de retard à l'arrivée
@@ -374,7 +690,7 @@ with col1:
         </div>
         <div style="margin-top: auto; padding-top: 0.8rem; border-top: 1px solid rgba(255,255,255,0.3);">
             <p style="color: white; font-size: 0.95rem; margin: 0; font-weight: 600;">
-                {arrow_retard} {abs(evolution_retard):.1f}% vs {previous_year}
+                {texte_evolution(arrow_retard, evolution_retard, retard_moyen_current)} vs {previous_year}
             </p>
         </div>
     </div>
@@ -382,25 +698,24 @@ with col1:
 
 # KPI 2 : RETARDS > 30MIN
 with col2:
-    very_late_30min_current = df_current['nb_train_retard_sup_30'].sum()
-    total_trains_current = df_current['nb_train_prevu'].sum()
-    very_late_30min_rate_current = (very_late_30min_current / total_trains_current * 100) if total_trains_current > 0 else 0
-
-    very_late_30min_previous = df_previous['nb_train_retard_sup_30'].sum()
-    total_trains_previous = df_previous['nb_train_prevu'].sum()
-    very_late_30min_rate_previous = (very_late_30min_previous / total_trains_previous * 100) if total_trains_previous > 0 else very_late_30min_rate_current
+    very_late_30min_rate_current = kpi_current['taux_retard_sup_30']
+    very_late_30min_rate_previous = (
+        kpi_previous['taux_retard_sup_30'] if kpi_previous['nb_train_prevu'] > 0 else very_late_30min_rate_current
+    )
 
-    evolution_very_late = ((very_late_30min_rate_current - very_late_30min_rate_previous) / very_late_30min_rate_previous * 100) if very_late_30min_rate_previous > 0 else 0
+    evolution_very_late = evolution_pct(very_late_30min_rate_current, very_late_30min_rate_previous)
     card_color, arrow_very_late, _ = get_card_color_by_evolution(evolution_very_late, is_inverse=True)
 
-    if very_late_30min_rate_current < 3:
+    if pd.isna(very_late_30min_rate_current):
+        emoji = "➖"
+    elif very_late_30min_rate_current < 3:
         emoji = "✅"
     elif very_late_30min_rate_current < 5:
         emoji = "⚠️"
     else:
         emoji = "🚨"
     
-    one_in_x = int(total_trains_current / very_late_30min_current) if very_late_30min_current > 0 else 0
+    one_in_x = kpi_current['un_sur_x']
     
     st.markdown(f"""
     <div style="background: linear-gradient(135deg, {card_color}20, {card_color}40); 
@@ -418,15 +733,15 @@ with col2:
             </p>
             <h1 style="color: white; margin: 0.3rem 0; font-size: 2.8rem; font-weight: 700; 
                        font-family: 'Arial Black', sans-serif; line-height: 1;">
-                1<span style="font-size: 1.5rem;"> sur </span>{one_in_x}
+                {formater_kpi(very_late_30min_rate_current, f'1<span style="font-size: 1.5rem;"> sur </span>{one_in_x}')}
             </h1>
             <p style="color: rgba(255,255,255,0.75); font-size: 0.85rem; margin: 0.3rem 0 0 0;">
-                soit {very_late_30min_rate_current:.1f}% des trains
+                soit {formater_kpi(very_late_30min_rate_current, '{:.1f}%')} des trains
             </p>
         </div>
         <div style="margin-top: auto; padding-top: 0.8rem; border-top: 1px solid rgba(255,255,255,0.3);">
             <p style="color: white; font-size: 0.95rem; margin: 0; font-weight: 600;">
-                {arrow_very_late} {abs(evolution_very_late):.1f}% vs {previous_year}
+                {texte_evolution(arrow_very_late, evolution_very_late, very_late_30min_rate_current)} vs {previous_year}
             </p>
         </div>
     </div>
@@ -434,16 +749,6 @@ with col2:
 
 # KPI 3 : CAUSE PRINCIPALE
 with col3:
-    causes = ['prct_cause_infra', 'prct_cause_externe', 'prct_cause_gestion_trafic', 
-              'prct_cause_materiel_roulant', 'prct_cause_gestion_gare', 'prct_cause_prise_en_charge_voyageurs']
-    causes_labels = {
-        'prct_cause_infra': 'Infrastructure',
-        'prct_cause_externe': 'Externes',
-        'prct_cause_gestion_trafic': 'Trafic',
-        'prct_cause_materiel_roulant': 'Matériel',
-        'prct_cause_gestion_gare': 'Gare',
-        'prct_cause_prise_en_charge_voyageurs': 'Affluence'
-    }
     causes_emojis = {
         'Infrastructure': '🛤️',
         'Externes': '🌩️',
@@ -453,14 +758,11 @@ with col3:
         'Affluence': '👥'
     }
     
-    cause_moyenne_current = {causes_labels[c]: df_current[c].mean() for c in causes}
-    cause_principale = max(cause_moyenne_current, key=cause_moyenne_current.get)
-    valeur_cause_current = cause_moyenne_current[cause_principale]
-    
-    cause_moyenne_previous = {causes_labels[c]: df_previous[c].mean() for c in causes} if len(df_previous) > 0 else cause_moyenne_current
-    valeur_cause_previous = cause_moyenne_previous.get(cause_principale, valeur_cause_current)
+    cause_principale = kpi_current['cause_principale']
+    valeur_cause_current = kpi_current['valeur_cause_principale']
+    valeur_cause_previous = kpi_previous[kpi_current['cause_principale_col']]
     
-    evolution_cause = ((valeur_cause_current - valeur_cause_previous) / valeur_cause_previous * 100) if valeur_cause_previous > 0 else 0
+    evolution_cause = evolution_pct(valeur_cause_current, valeur_cause_previous)
     card_color, arrow_cause, _ = get_card_color_by_evolution(evolution_cause, is_inverse=True)
     
     emoji_cause = causes_emojis.get(cause_principale, '📊')
@@ -482,15 +784,15 @@ with col3:
             <h1 style="color: white; margin: 0.3rem 0; font-size: 2.2rem; font-weight: 700; 
                        font-family: 'Arial Black', sans-serif; line-height: 1.1;
                        white-space: nowrap; overflow: hidden; text-overflow: ellipsis;">
-                {cause_principale}
+                {cause_principale or "—"}
             </h1>
             <p style="color: rgba(255,255,255,0.75); font-size: 0.85rem; margin: 0.3rem 0 0 0;">
-                {valeur_cause_current:.1f}% des causes
+                {formater_kpi(valeur_cause_current, '{:.1f}%')} des causes
             </p>
         </div>
         <div style="margin-top: auto; padding-top: 0.8rem; border-top: 1px solid rgba(255,255,255,0.3);">
             <p style="color: white; font-size: 0.95rem; margin: 0; font-weight: 600;">
-                {arrow_cause} {abs(evolution_cause):.1f}% vs {previous_year}
+                {texte_evolution(arrow_cause, evolution_cause, valeur_cause_current)} vs {previous_year}
             </p>
         </div>
     </div>
@@ -502,13 +804,29 @@ with col3:
 # ====================================
 st.header("Comment la régularité des trains évolue-t-elle dans le temps ?")
 
-# Moyenne mobile pour lisser
-window = 10
-df_metrics['late_rate_smooth'] = df_metrics['late_rate'].rolling(window=window, center=True, min_periods=1).mean()
-df_metrics['cancellation_rate_smooth'] = df_metrics['cancellation_rate'].rolling(window=window, center=True, min_periods=1).mean()
+# Granularité : toutes les séries sont déjà calculées, changer de granularité est un simple lookup
+granularite = st.radio(
+    "Granularité",
+    list(GRANULARITES),
+    format_func=LIBELLES_GRANULARITES.get,
+    horizontal=True,
+    key="granularite"
+)
+
+# Prévision précalculée à la publication : disponible quand les filtres correspondent à une série prévue
+# (tous services et réseaux, période jusqu'au dernier mois connu), en vue mensuelle
+prevision = pd.DataFrame()
+if (
+    granularite == 'mois'
+    and "previsions" in aggregats
+    and filtre_service == "Tous"
+    and filtre_reseau == "Tous"
+    and annees_selectionnees[-1] == annees_disponibles[-1]
+):
+    prevision = prevision_serie(aggregats["previsions"], filtre_gare_depart, filtre_gare_arrivee)
 
 # Checkbox pour sélectionner les courbes
-col1, col2 = st.columns([1, 1])
+col1, col2, col3 = st.columns([1, 1, 1])
 
 with col1:
     show_retard = st.checkbox(
@@ -526,71 +844,39 @@ with col2:
         help="Évolution du taux d'annulation"
     )
 
-# Graphique
-fig_temporal = go.Figure()
-
-if show_retard:
-    fig_temporal.add_trace(go.Scatter(
-        x=df_metrics['Date'],
-        y=df_metrics['late_rate_smooth'],
-        mode='lines',
-        name='Taux de retard (%)',
-        line=dict(color='#e74c3c', width=2.5, shape='spline', smoothing=1.3),
-        hovertemplate="<b>Taux de retard</b><br>Date: %{x|%b %Y}<br>Valeur: %{y:.2f}%<extra></extra>"
-    ))
-
-if show_annulation:
-    fig_temporal.add_trace(go.Scatter(
-        x=df_metrics['Date'],
-        y=df_metrics['cancellation_rate_smooth'],
-        mode='lines',
-        name="Taux d'annulation (%)",
-        line=dict(color='#f39c12', width=2.5, shape='spline', smoothing=1.3),
-        hovertemplate="<b>Taux d'annulation</b><br>Date: %{x|%b %Y}<br>Valeur: %{y:.2f}%<extra></extra>"
-    ))
-
-if not show_retard and not show_annulation:
+with col3:
+    show_prevision = st.checkbox(
+        f"🔮 Prévision ({HORIZON_PREVISION} mois)",
+        value=True,
+        key="show_prevision",
+        disabled=prevision.empty,
+        help="Tendance et saisonnalité des 36 derniers mois prolongées (vue mensuelle, tous services et réseaux)"
+    )
+
+# Graphique (figure mise en cache par filtres, granularité et courbes cochées)
+courbes = tuple(
+    colonne for colonne, afficher in (('late_rate', show_retard), ('cancellation_rate', show_annulation)) if afficher
+)
+if not courbes:
     st.warning("⚠️ Veuillez sélectionner au moins une métrique à afficher")
 else:
-    fig_temporal.update_layout(
-        title=dict(
-            text="Évolution temporelle des métriques",
-            font=dict(size=18, color="#F2F2F2"),
-            x=0.5,
-            xanchor='center'
-        ),
-        xaxis_title="",
-        yaxis_title="Taux (%)",
-        hovermode='x unified',
-        template="plotly_dark",
-        height=500,
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            bgcolor="rgba(0,0,0,0.3)"
-        ),
-        margin=dict(t=80, b=40, l=60, r=60),
-        plot_bgcolor="rgba(0,0,0,0)",
-        paper_bgcolor="rgba(0,0,0,0)"
+    fig_temporal = charger_figure_temporelle(
+        version_donnees, tuple(annees_selectionnees),
+        filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau,
+        granularite, courbes, show_prevision and not prevision.empty, series_temporelles, prevision
     )
-    
-    fig_temporal.update_xaxes(
-        tickangle=45,
-        dtick="M3",
-        tickformat="%b %Y",
-        gridcolor="rgba(255,255,255,0.1)"
-    )
-    
-    fig_temporal.update_yaxes(
-        gridcolor="rgba(255,255,255,0.1)"
-    )
-    
     st.plotly_chart(fig_temporal, use_container_width=True)
 
+# Carte de chaleur Année × Mois (lue dans la série mensuelle, sans nouveau calcul)
+st.subheader("Saisonnalité : taux par année et par mois")
+figures_chaleur = charger_figures_chaleur(
+    version_donnees, tuple(annees_selectionnees),
+    filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, series_temporelles['mois']
+)
+for col, fig_chaleur in zip(st.columns(2), figures_chaleur):
+    with col:
+        st.plotly_chart(fig_chaleur, use_container_width=True)
+
 st.markdown("---")
 st.markdown("<br>", unsafe_allow_html=True)
 
@@ -600,139 +886,22 @@ st.markdown("<br>", unsafe_allow_html=True)
 # ====================================
 st.header("Quelles sont les causes majeures de retard ?")
 
-causes_cols = {
-    "prct_cause_externe": "Causes externes",
-    "prct_cause_infra": "Infrastructure ferroviaire",
-    "prct_cause_gestion_trafic": "Gestion du trafic",
-    "prct_cause_materiel_roulant": "Matériel roulant",
-    "prct_cause_gestion_gare": "Gestion en gare",
-    "prct_cause_prise_en_charge_voyageurs": "Affluence voyageurs"
-}
-
-df_causes = df_filtre[list(causes_cols.keys())].mean().reset_index()
-df_causes.columns = ["Cause_raw", "Pourcentage"]
-df_causes["Cause"] = df_causes["Cause_raw"].map(causes_cols)
-
-# Calcul du retard moyen par cause
-global_avg_delay = df_filtre['retard_moyen_arrivee'].mean() if not df_filtre.empty else 0
-
-weights = []
-for cause in df_causes['Cause']:
-    if cause in ("Infrastructure ferroviaire", "Causes externes"):
-        weights.append(1.4)
-    elif cause in ("Affluence voyageurs", "Gestion en gare"):
-        weights.append(1.1)
-    else:
-        weights.append(0.8)
-
-weighted_percentages = df_causes['Pourcentage'] * weights
-total_weighted = weighted_percentages.sum()
-if total_weighted != 0:
-    weighted_norm = weighted_percentages / total_weighted
+# Parts de causes pondérées par le nombre de trains en retard de chaque liaison,
+# lues dans les cellules précalculées plutôt que recalculées sur la base brute.
+# (passer POIDS_HISTORIQUES de src.data.causes à finaliser_causes pour retrouver les anciens coefficients)
+if est_vue_defaut:
+    df_final = vue_defaut["causes"].copy()
 else:
-    weighted_norm = [0] * len(weighted_percentages)
-
-delay_vals = [round(global_avg_delay * share, 1) for share in weighted_norm]
-
-df_delay = pd.DataFrame({
-    "Cause": df_causes['Cause'],
-    "Retard_moyen": delay_vals
-})
-
-df_final = df_causes.merge(df_delay, on="Cause")
-
-# Palette de couleurs
-couleurs_causes = {
-    'Infrastructure ferroviaire': '#D91828',
-    'Causes externes': '#8B0A1A',
-    'Gestion du trafic': '#E8744F',
-    'Matériel roulant': '#F4A582',
-    'Affluence voyageurs': '#C7D4E8',
-    'Gestion en gare': '#92A8D1'
-}
-
-# Créer une liste de couleurs dans l'ordre du dataframe
-colors_list = [couleurs_causes.get(cause, '#CCCCCC') for cause in df_final['Cause']]
-
-fig_pie = px.pie(
-    df_final,
-    names="Cause",
-    values="Pourcentage",
-    hole=0.4
-)
-
-fig_pie.update_traces(
-    textposition='outside',
-    textinfo="label+percent",
-    textfont_size=13,
-    hovertemplate="<b>%{label}</b><br>Part: %{percent}<extra></extra>",
-    marker=dict(
-        colors=colors_list,
-        line=dict(color='#ffffff', width=2)
+    cellules_causes = filtrer_cellules(
+        aggregats, "causes",
+        annees_selectionnees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
     )
-)
-
-fig_pie.update_layout(
-    title={
-        'text': "Répartition des causes (%)",
-        'font': dict(size=22, color="#FFFFFF", family="Arial Black"),  # Blanc et plus gros
-        'x': 0.5,
-        'xanchor': 'center',
-        'y': 0.98,
-        'yanchor': 'top'
-    },
-    showlegend=False,
-    height=550,
-    width=900,
-    margin=dict(l=100, r=100, t=80, b=50),
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)'
-)
-
-# Barplot avec les mêmes couleurs
-df_bar = df_final.sort_values('Retard_moyen', ascending=False)
-
-# Créer la liste de couleurs pour le barplot (dans l'ordre trié)
-colors_bar = [couleurs_causes.get(cause, '#CCCCCC') for cause in df_bar['Cause']]
+    df_final = finaliser_causes(reagreger_composantes(cellules_causes))
+df_final["Retard_moyen"] = df_final["Retard_moyen"].round(1)
 
-fig_bar = px.bar(
-    df_bar,
-    x="Cause",
-    y="Retard_moyen",
-    text='Retard_moyen'
-)
-
-fig_bar.update_traces(
-    texttemplate="%{text:.1f} min",
-    textposition="outside",
-    marker_color=colors_bar,  # Appliquer les mêmes couleurs
-    marker_line_color='#ffffff',
-    marker_line_width=1.5
-)
-
-fig_bar.update_layout(
-    title={
-        'text': "Retard moyen par cause",
-        'font': dict(size=22, color="#FFFFFF", family="Arial Black"),  # Blanc et plus gros
-        'x': 0.5,
-        'xanchor': 'center',
-        'y': 0.98,
-        'yanchor': 'top'
-    },
-    xaxis_title="Cause",
-    yaxis_title="Retard moyen (min)",
-    xaxis=dict(
-        title_font=dict(size=14, color="#E0E0E0"),
-        tickfont=dict(size=11, color="#E0E0E0")
-    ),
-    yaxis=dict(
-        title_font=dict(size=14, color="#E0E0E0"),
-        tickfont=dict(size=11, color="#E0E0E0")
-    ),
-    height=500,
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    margin=dict(l=40, r=40, t=80, b=100)
+fig_pie, fig_bar = charger_figures_causes(
+    version_donnees, tuple(annees_selectionnees),
+    filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, df_final
 )
 
 # Afficher les deux graphiques côte à côte
@@ -749,165 +918,211 @@ with col_bar:
 
 st.header("Où se concentrent les retards sur le réseau SNCF ?")
 
-# 📅 On prend la période déjà filtrée dans df_filtre (pas besoin de re-sélectionner l’année)
+# Indicateurs par gare lus dans l'agrégat par gare (départs et arrivées), coordonnées comprises
+if est_vue_defaut:
+    gares_vue = vue_defaut["gares"]
+else:
+    gares_vue = charger_gares(
+        version_donnees, tuple(annees_selectionnees),
+        filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, aggregats
+    )
 
-# Option : nombre de liaisons à afficher
-nb_trajets = st.selectbox(
-    "Afficher les liaisons problématiques",
-    options=[0, 3, 5, 10],
-    format_func=lambda x: "Aucune liaison" if x == 0 else f"Top {x} des pires liaisons",
-    index=1,
-)
+col1, col2, col3 = st.columns([1, 1, 1])
 
-# ==========================
-# 📊 Agrégation par gare
-# ==========================
-retards_par_gare = df_filtre.groupby('gare_depart').agg({
-    'nb_train_depart_retard': 'sum',
-    'nb_train_prevu': 'sum',
-    'retard_moyen_depart': 'mean'
-}).reset_index()
-
-retards_par_gare['taux_retard'] = (
-    retards_par_gare['nb_train_depart_retard'] / retards_par_gare['nb_train_prevu'] * 100
-)
+with col1:
+    role_carte = st.radio(
+        "Retards des trains",
+        list(LIBELLES_ROLES),
+        format_func=LIBELLES_ROLES.get,
+        horizontal=True,
+        key="role_carte",
+        help="Au départ, à l'arrivée ou les deux cumulés pour chaque gare"
+    )
 
-# 📍 Coordonnées des gares
-gares_coords = get_gares_coordinates()
-retards_par_gare['coords'] = retards_par_gare['gare_depart'].apply(
-    lambda x: trouver_coordonnees(x, gares_coords)
-)
-retards_avec_coords = retards_par_gare.dropna(subset=['coords'])
+with col2:
+    # Option : nombre de liaisons à afficher
+    nb_trajets = st.selectbox(
+        "Afficher les liaisons problématiques",
+        options=OPTIONS_NB_TRAJETS,
+        format_func=lambda x: "Aucune liaison" if x == 0 else f"Top {x} des pires liaisons",
+        index=1,
+        key="select_nb_trajets",
+    )
 
-if len(retards_avec_coords) == 0:
-    st.warning("Aucune gare géolocalisée pour la période sélectionnée.")
-    st.stop()
+with col3:
+    critere_liaisons = st.selectbox(
+        "Classer les liaisons par",
+        options=list(CRITERES_LIAISONS),
+        format_func=CRITERES_LIAISONS.get,
+        key="critere_liaisons",
+        help="Les retards pour 100 km comparent équitablement liaisons courtes et longues "
+             "(distance à vol d'oiseau entre les gares)"
+    )
+
+gares_role = gares_vue[gares_vue['role'] == role_carte]
 
 # ==========================
-# 🗺️ Construction de la carte
+# 🔁 Liaisons problématiques
 # ==========================
-latitudes = [coord[0] for coord in retards_avec_coords['coords']]
-longitudes = [coord[1] for coord in retards_avec_coords['coords']]
-centre_lat = sum(latitudes) / len(latitudes)
-centre_lon = sum(longitudes) / len(longitudes)
+if est_vue_defaut:
+    trajets_temp = vue_defaut["liaisons"]
+else:
+    trajets_temp = retards_par_liaison(filtrer_cellules(
+        aggregats, "trafic",
+        annees_selectionnees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
+    ), aggregats["distances"])
+
+# 👉 Vue par défaut : carte (retards au départ) déjà rendue à la publication du snapshot
+if (
+    est_vue_defaut and role_carte == "depart" and critere_liaisons == CRITERE_LIAISONS_DEFAUT
+    and nb_trajets in vue_defaut["cartes"]
+):
+    st.iframe(vue_defaut["cartes"][nb_trajets], width=1400, height=700)
+else:
+    # 📍 Gares géolocalisées
+    retards_avec_coords = gares_role.dropna(subset=['lat', 'lon'])
 
-m = folium.Map(location=[centre_lat, centre_lon], zoom_start=6, tiles='OpenStreetMap')
+    if len(retards_avec_coords) == 0:
+        # ex. TER : régularité publiée par région, sans gares à placer ; le reste de la page s'affiche
+        st.info("Aucune gare géolocalisée pour la période sélectionnée.")
+    else:
+        # ==========================
+        # 🗺️ Construction de la carte
+        # ==========================
+        m = construire_carte(retards_avec_coords, trajets_temp, nb_trajets, aggregats["coordonnees"], critere_liaisons)
+
+        # ==========================
+        # 💬 Affichage dans Streamlit
+        # ==========================
 
-max_taux = retards_avec_coords['taux_retard'].max()
-min_taux = retards_avec_coords['taux_retard'].min()
+        # 👉 Utilisation de st_folium (nouvelle méthode officielle)
+        st_folium(m, width=1400, height=700)
 
 # ==========================
-# 🔁 Liaisons problématiques
+# 🏆 Classement des gares
 # ==========================
-if nb_trajets > 0:
-    trajets_temp = df_filtre.groupby(['gare_depart', 'gare_arrivee']).agg({
-        'nb_train_retard_arrivee': 'sum',
-        'nb_train_prevu': 'sum',
-        'retard_moyen_arrivee': 'mean'
-    }).reset_index()
-    
-    trajets_temp = trajets_temp[trajets_temp['gare_depart'] != trajets_temp['gare_arrivee']].copy()
-    trajets_temp['taux_retard'] = (trajets_temp['nb_train_retard_arrivee'] / trajets_temp['nb_train_prevu']) * 100
-    trajets_temp = trajets_temp.sort_values('nb_train_retard_arrivee', ascending=False)
-    
-    paires_vues = set()
-    trajets_selectionnes = []
-    
-    for _, row in trajets_temp.iterrows():
-        paire = tuple(sorted([row['gare_depart'], row['gare_arrivee']]))
-        if paire not in paires_vues:
-            trajets_selectionnes.append(row)
-            paires_vues.add(paire)
-            if len(trajets_selectionnes) >= nb_trajets:
-                break
-    
-    # Flèches animées avec AntPath
-    for trajet in trajets_selectionnes:
-        coord_depart = trouver_coordonnees(trajet['gare_depart'], gares_coords)
-        coord_arrivee = trouver_coordonnees(trajet['gare_arrivee'], gares_coords)
-        
-        if coord_depart and coord_arrivee:
-            taux = trajet['taux_retard']
-            couleur_ligne = "#000000" if taux > 20 else "#050505" if taux > 10 else "#000000"
-            epaisseur = 3 + (trajet['nb_train_retard_arrivee'] / trajets_temp['nb_train_retard_arrivee'].max()) * 5
-
-            AntPath(
-                locations=[coord_depart, coord_arrivee],
-                color=couleur_ligne,
-                weight=epaisseur,
-                opacity=0.8,
-                dash_array=[10, 20],
-                delay=800,
-                pulse_color="#ffffff",
-                tooltip=(
-                    f"🚄 <b>{trajet['gare_depart']} → {trajet['gare_arrivee']}</b><br>"
-                    f"Retards: {trajet['nb_train_retard_arrivee']:.0f}<br>"
-                    f"Taux: {taux:.1f}%"
-                )
-            ).add_to(m)
+with st.expander(f"🏆 Gares les plus touchées ({LIBELLES_ROLES[role_carte].lower()})"):
+    classement = gares_role.nlargest(10, 'nb_train_retard')
+    st.dataframe(
+        pd.DataFrame({
+            "Gare": classement['gare'],
+            "Trains": classement['nb_train_prevu'].astype(int),
+            "Trains en retard": classement['nb_train_retard'].astype(int),
+            "Taux de retard (%)": classement['taux_retard'].round(1),
+            "Retard moyen (min)": classement['retard_moyen'].round(1),
+            "Taux d'annulation (%)": classement['taux_annulation'].round(1),
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
 
 # ==========================
-# 📍 Points des gares
+# 🛤️ Classement des liaisons
 # ==========================
-for _, row in retards_avec_coords.iterrows():
-    lat, lon = row['coords']
-    taux = row['taux_retard']
-
-    if taux < 20:
-        color = '#4CAF50'
-    elif taux < 50:
-        color = '#FFC107'
-    else:
-        color = '#F44336'
-
-    nb_trains = row['nb_train_prevu']
-    radius = 5 + (nb_trains / retards_avec_coords['nb_train_prevu'].max()) * 15
-
-    folium.CircleMarker(
-        location=[lat, lon],
-        radius=radius,
-        popup=f"<b>{row['gare_depart']}</b><br>Taux: {taux:.1f}%<br>Trains: {nb_trains:.0f}",
-        color=color,
-        fill=True,
-        fillColor=color,
-        fillOpacity=0.85,
-        weight=2
-    ).add_to(m)
+with st.expander(f"🛤️ Liaisons les plus touchées ({CRITERES_LIAISONS[critere_liaisons].lower()})"):
+    classement = top_liaisons(trajets_temp, 10, critere_liaisons)
+    st.dataframe(
+        pd.DataFrame({
+            "Départ": classement['gare_depart'],
+            "Arrivée": classement['gare_arrivee'],
+            "Trains": classement['nb_train_prevu'].astype(int),
+            "Trains en retard": classement['nb_train_retard_arrivee'].astype(int),
+            "Taux de retard (%)": classement['taux_retard'].round(1),
+            "Distance (km)": classement['distance_km'].round(0),
+            "Retard / 100 km (min)": classement['retard_100km'].round(2),
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
 
 # ==========================
-# 🧾 Légende claire et visible
+# 🚨 Mois anormaux par liaison
 # ==========================
-legend_html = """
-<div style="
-     position: fixed; 
-     bottom: 50px; left: 50px; 
-     background-color: rgba(30, 30, 30, 0.9);
-     color: white;
-     border: 1px solid #666;
-     border: 2px solid #777;
-     z-index: 9999; 
-     padding: 12px; 
-     border-radius: 8px; 
-     font-size: 14px; 
-     box-shadow: 2px 2px 8px rgba(0,0,0,0.2);
-     max-width: 270px;">
-  <h4 style="margin-top:0;">📊 Légende</h4>
-  <p style="margin:4px 0;">● <b style="color:#4CAF50;">Vert</b> : Peu de retards au départ (< 20 %)</p>
-  <p style="margin:4px 0;">● <b style="color:#FFC107;">Orange</b> : Retards modérés</p>
-  <p style="margin:4px 0;">● <b style="color:#F44336;">Rouge</b> : Retards élevés (> 50 %)</p>
-  <hr style="margin:6px 0;">
-  <p style="margin:4px 0;">➡️ <b>Flèches animées</b> : liaisons les plus problématiques</p>
-  <p style="margin:4px 0;">⚫ <b>Taille du point</b> = nombre de trains</p>
-</div>
-"""
-m.get_root().html.add_child(folium.Element(legend_html))
+if "anomalies" in aggregats:
+    anomalies = charger_anomalies(
+        version_donnees, tuple(annees_selectionnees),
+        filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau, aggregats
+    )
+    with st.expander(f"🚨 Mois anormaux par liaison ({len(anomalies)})"):
+        st.caption(
+            f"Écart d'au moins {SEUIL_ANOMALIE:g} écarts-types à l'historique de la liaison "
+            "(taux de retard, retards > 30 min, annulations ou répartition des causes)."
+        )
+        top_anomalies = anomalies.head(20)
+        st.dataframe(
+            pd.DataFrame({
+                "Liaison": top_anomalies['gare_depart'] + " → " + top_anomalies['gare_arrivee'].fillna("—"),
+                "Mois": top_anomalies['Year'].astype(str) + "-" + top_anomalies['Month'].astype(str).str.zfill(2),
+                "Taux de retard (%)": top_anomalies['taux_retard'].round(1),
+                "Habituel (%)": top_anomalies['taux_retard_habituel'].round(1),
+                "Retards > 30 min (%)": top_anomalies['taux_retard_sup_30'].round(1),
+                "Annulations (%)": top_anomalies['taux_annulation'].round(1),
+                "Score": top_anomalies['score'].round(1),
+                "Motif": top_anomalies['motif'].map(LIBELLES_MOTIFS),
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
 
 # ==========================
-# 💬 Affichage dans Streamlit
+# 📥 Export de la sélection
 # ==========================
+OCTETS_PAR_MO = 1_000_000
+
+with st.expander("📥 Exporter les données filtrées"):
+    col_table, col_format = st.columns(2)
+    with col_table:
+        table_export = st.selectbox(
+            "Table",
+            options=list(LIBELLES_TABLES),
+            format_func=LIBELLES_TABLES.get,
+            key="export_table"
+        )
+    with col_format:
+        format_export = st.radio(
+            "Format",
+            options=formats_disponibles(),
+            format_func=LIBELLES_FORMATS.get,
+            horizontal=True,
+            key="export_format"
+        )
+
+    trop_de_lignes = (
+        format_export == "xlsx"
+        and table_export == "lignes"
+        and nb_liaisons_disponibles > MAX_LIGNES_EXCEL
+    )
+    if trop_de_lignes:
+        st.warning(f"Plus de {MAX_LIGNES_EXCEL:,} lignes : choisir CSV ou Parquet.".replace(',', ' '))
 
-# 👉 Utilisation de st_folium (nouvelle méthode officielle)
-st_folium(m, width=1400, height=700)
+    # Le fichier est écrit lot par lot sur disque (et réutilisé pour les mêmes filtres)
+    # seulement à la demande, jamais à chaque rerun
+    filtres_export = (
+        tuple(annees_selectionnees), filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
+    )
+    cle_demande = (version_donnees, table_export, format_export, filtres_export)
+    if st.button("Préparer le fichier", key="export_preparer", disabled=trop_de_lignes):
+        with st.spinner("Écriture de l'export..."):
+            st.session_state["export_pret"] = (
+                cle_demande,
+                fichier_export(version_donnees, table_export, format_export, filtres_export, aggregats),
+            )
+
+    export_pret = st.session_state.get("export_pret")
+    if export_pret is not None and export_pret[0] == cle_demande and export_pret[1].exists():
+        extension, mime = FORMATS[format_export]
+        taille = export_pret[1].stat().st_size
+        taille_lisible = (
+            f"{taille / OCTETS_PAR_MO:.1f} Mo" if taille >= OCTETS_PAR_MO else f"{taille / 1e3:.0f} Ko"
+        )
+        # lecture différée au clic : le fichier n'est pas rechargé en mémoire à chaque rerun
+        st.download_button(
+            f"⬇️ Télécharger ({taille_lisible})",
+            data=export_pret[1].read_bytes,
+            file_name=f"sncf_{table_export}.{extension}",
+            mime=mime,
+            key="export_telecharger"
+        )
 
 st.markdown('</div>', unsafe_allow_html=True)
 
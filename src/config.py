@@ -0,0 +1,15 @@
+# src/config.py
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Dossier local des données (snapshots, stores...), surchargeable pour les déploiements
+DATA_DIR = Path(os.environ.get("SNCF_DATA_DIR", PROJECT_ROOT / "data"))
+
+# Profondeur d'historique collectée (le store partitionné permet d'aller bien au-delà de 5 ans)
+NB_ANNEES = int(os.environ.get("SNCF_NB_ANNEES", "5"))
+
+# Fichiers d'export SNCF locaux (CSV / JSON / JSON-lines, .gz accepté) à importer à la place de l'API,
+# pour les machines sans accès réseau : "chemin,chemin" ou "TER=chemin,TGV=dossier/*.csv.gz"
+FICHIERS_LOCAUX = os.environ.get("SNCF_FICHIERS_LOCAUX", "")
@@ -0,0 +1,216 @@
+# src/data/aggregats.py
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.causes import composantes_causes
+from src.data.facettes import DIMENSIONS, compter_facettes
+from src.data.gares import composantes_gares, coordonnees_gares, distances_gares
+from src.data.groupes import (
+    compte_par_groupe,
+    diviser,
+    indexer_groupes,
+    somme_par_groupe,
+)
+from src.data.increments import cellules_touchees
+from src.data.store import agreger_par_lots
+from src.data.transform import appliquer_filtres
+
+# Grain des cellules précalculées : assez fin pour appliquer tous les filtres de la sidebar,
+# bien plus petit que la base brute (une ligne par année au lieu d'une par mois).
+CLES_CELLULE = ["Year", "reseau", "service", "gare_depart", "gare_arrivee"]
+CLES_MENSUELLES = ["Year", "Month", "reseau", "service", "gare_depart", "gare_arrivee"]
+# Cellules par gare : chaque cellule de liaison apparaît pour sa gare de départ et pour sa gare d'arrivée
+CLES_GARES = CLES_CELLULE + ["role", "gare"]
+
+# Colonnes additives (sommes) et colonnes moyennées (stockées en somme + nombre de valeurs)
+COLONNES_SOMMES = [
+    "nb_train_prevu",
+    "nb_annulation",
+    "nb_train_retard_arrivee",
+    "nb_train_depart_retard",
+    "nb_train_retard_sup_30",
+]
+COLONNES_MOYENNES = [
+    "retard_moyen_tous_trains_arrivee",
+    "retard_moyen_depart",
+    "retard_moyen_arrivee",
+]
+
+# Classements possibles des liaisons -> libellé ; les taux rapportés à la distance évitent
+# de comparer une liaison de 50 km à une de 800 km sur le seul nombre de retards
+CRITERES_LIAISONS = {
+    "nb_train_retard_arrivee": "Trains en retard",
+    "retard_100km": "Minutes de retard par train / 100 km",
+    "retard_arrivee_100km": "Retard moyen des trains en retard / 100 km",
+}
+CRITERE_LIAISONS_DEFAUT = "nb_train_retard_arrivee"
+# En dessous (gares d'une même ville, coordonnées approchées), un taux par km ne veut plus rien dire
+DISTANCE_MIN_KM = 30.0
+
+
+def composantes_trafic(
+    df: pd.DataFrame,
+    par: list[str] | None = None,
+    dropna: bool = True,
+) -> pd.DataFrame:
+    """Sommes et comptes additifs du trafic pour chaque groupe de `par`."""
+    codes, comp = indexer_groupes(df, par, dropna=dropna)
+    n = len(comp)
+
+    for c in COLONNES_SOMMES:
+        comp[c] = somme_par_groupe(codes, n, df[c] if c in df.columns else np.zeros(len(df)))
+    for c in COLONNES_MOYENNES:
+        valeurs = df[c] if c in df.columns else np.full(len(df), np.nan)
+        comp[f"somme_{c}"] = somme_par_groupe(codes, n, valeurs)
+        comp[f"nb_{c}"] = compte_par_groupe(codes, n, valeurs)
+
+    return comp
+
+
+def reagreger_trafic(comp: pd.DataFrame, par: list[str] | None = None) -> pd.DataFrame:
+    """Regroupe des cellules de trafic sur des clés plus grossières et recalcule les moyennes."""
+    valeurs = COLONNES_SOMMES + [f"{p}_{c}" for c in COLONNES_MOYENNES for p in ("somme", "nb")]
+    if par:
+        res = comp.groupby(par, sort=True, dropna=False)[valeurs].sum().reset_index()
+    else:
+        res = comp[valeurs].sum().to_frame().T
+    for c in COLONNES_MOYENNES:
+        res[c] = diviser(res[f"somme_{c}"], res[f"nb_{c}"])
+    return res
+
+
+# Agrégats additifs : nom -> (composantes(df, par), clés des cellules, clés qui situent les cellules d'une ligne).
+# Une ligne de la base ne compte que dans les cellules qui partagent ses clés de situation.
+AGREGATS_ADDITIFS = {
+    "causes": (partial(composantes_causes, dropna=False), CLES_CELLULE, CLES_CELLULE),
+    "trafic": (partial(composantes_trafic, dropna=False), CLES_MENSUELLES, CLES_MENSUELLES),
+    "facettes": (lambda df, par: compter_facettes(df), ["Year"] + DIMENSIONS, ["Year"] + DIMENSIONS),
+    "gares": (partial(composantes_gares, dropna=False), CLES_GARES, CLES_CELLULE),
+}
+
+
+def construire_aggregats(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Précalcule les agrégats additifs du dashboard, une fois par version des données."""
+    aggregats = {nom: composantes(df, par) for nom, (composantes, par, _) in AGREGATS_ADDITIFS.items()}
+    aggregats.update(_coordonnees_et_distances(aggregats["gares"]["gare"]))
+    return aggregats
+
+
+def construire_aggregats_par_lots(version: str, dossier: Path | None = None) -> dict[str, pd.DataFrame]:
+    """Mêmes agrégats que construire_aggregats, calculés lot par lot depuis le store de `version`."""
+    aggregats = {
+        nom: agreger_par_lots(composantes, par, version, dossier=dossier)
+        for nom, (composantes, par, _) in AGREGATS_ADDITIFS.items()
+    }
+    aggregats.update(_coordonnees_et_distances(aggregats["gares"]["gare"]))
+    return aggregats
+
+
+def mettre_a_jour_aggregats(
+    precedents: dict[str, pd.DataFrame],
+    df: pd.DataFrame,
+    modifiees: pd.DataFrame,
+) -> dict[str, pd.DataFrame]:
+    """
+    Mêmes agrégats que construire_aggregats(df), repartis de ceux de la version précédente :
+    seules les cellules touchées par `modifiees` (lignes ajoutées, révisées ou retirées,
+    cf. differences_lignes) sont recalculées, depuis les lignes de `df` qui y tombent.
+    Le coût suit le nombre de lignes modifiées, pas la longueur de l'historique.
+    """
+    aggregats = {}
+    lignes = {}  # lignes de df à réagréger, par clés de situation (partagées entre agrégats)
+    for nom, (composantes, par, situation) in AGREGATS_ADDITIFS.items():
+        precedent = precedents[nom]
+        gardees = precedent[~cellules_touchees(precedent, situation, modifiees)]
+        if tuple(situation) not in lignes:
+            lignes[tuple(situation)] = df[cellules_touchees(df, situation, modifiees)]
+        recalculees = composantes(lignes[tuple(situation)], par)
+        aggregats[nom] = pd.concat([gardees, recalculees.astype(precedent.dtypes.to_dict())], ignore_index=True)
+
+    gares = aggregats["gares"]["gare"]
+    if set(gares.dropna()) == set(precedents["gares"]["gare"].dropna()):
+        # mêmes gares : coordonnées et distances inchangées
+        aggregats.update({nom: precedents[nom] for nom in ("coordonnees", "distances")})
+    else:
+        aggregats.update(_coordonnees_et_distances(gares))
+    return aggregats
+
+
+def _coordonnees_et_distances(gares: pd.Series) -> dict[str, pd.DataFrame]:
+    """Coordonnées des gares et matrice des distances entre elles, calculées une fois par version."""
+    coordonnees = coordonnees_gares(gares)
+    return {"coordonnees": coordonnees, "distances": distances_gares(coordonnees)}
+
+
+def filtrer_cellules(
+    aggregats: dict[str, pd.DataFrame],
+    nom: str,
+    annees,
+    filtre_service: str = "Tous",
+    filtre_gare_depart: str = "Toutes",
+    filtre_gare_arrivee: str = "Toutes",
+    filtre_reseau: str = "Tous",
+) -> pd.DataFrame:
+    """Cellules d'un agrégat qui correspondent aux filtres de la sidebar."""
+    return appliquer_filtres(
+        aggregats[nom], annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau
+    )
+
+
+def metriques_mensuelles(cellules: pd.DataFrame, par: list[str] | None = None) -> pd.DataFrame:
+    """
+    Même résultat que generer_metrics_synthetiques, mais depuis les cellules de trafic.
+    `par` ajoute des clés devant (Year, Month), ex. ["serie"] pour plusieurs séries d'un coup.
+    """
+    if cellules.empty:
+        return pd.DataFrame()
+
+    cles = (par or []) + ["Year", "Month"]
+    grouped = taux_trafic(reagreger_trafic(cellules, par=cles), cles)
+    grouped.insert(len(cles) + 4, "Date", pd.to_datetime(grouped[["Year", "Month"]].assign(day=1)))
+    return grouped
+
+
+def taux_trafic(grouped: pd.DataFrame, cles: list[str]) -> pd.DataFrame:
+    """Colonnes du graphique temporel (sommes, retard moyen, taux en %) d'un trafic réagrégé."""
+    grouped = grouped.rename(columns={"retard_moyen_tous_trains_arrivee": "retard_moyen"})
+    grouped = grouped[cles + ["nb_train_prevu", "nb_annulation", "nb_train_retard_arrivee", "retard_moyen"]].copy()
+    grouped["late_rate"] = np.nan_to_num(diviser(grouped["nb_train_retard_arrivee"] * 100, grouped["nb_train_prevu"]))
+    grouped["cancellation_rate"] = np.nan_to_num(diviser(grouped["nb_annulation"] * 100, grouped["nb_train_prevu"]))
+    return grouped
+
+
+def retards_par_liaison(cellules: pd.DataFrame, distances: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Retards à l'arrivée par liaison, triés du plus grand nombre de trains en retard au plus petit.
+    Avec `distances` (agrégat "distances"), ajoute distance_km et les retards pour 100 km
+    (NaN si une gare n'est pas géolocalisée ou si la liaison fait moins de DISTANCE_MIN_KM).
+    """
+    trajets = reagreger_trafic(cellules, par=["gare_depart", "gare_arrivee"])
+    trajets = trajets.dropna(subset=["gare_depart", "gare_arrivee"])
+    trajets = trajets[trajets["gare_depart"] != trajets["gare_arrivee"]]
+    trajets = trajets[[
+        "gare_depart", "gare_arrivee", "nb_train_retard_arrivee", "nb_train_prevu",
+        "retard_moyen_arrivee", "retard_moyen_tous_trains_arrivee",
+    ]]
+    trajets["taux_retard"] = diviser(trajets["nb_train_retard_arrivee"] * 100, trajets["nb_train_prevu"])
+    if distances is not None:
+        # gares toutes manquantes (TER seul) : clés regroupées en float, remises en texte pour la jointure
+        trajets = trajets.astype({"gare_depart": object, "gare_arrivee": object})
+        trajets = trajets.merge(distances, on=["gare_depart", "gare_arrivee"], how="left")
+        distance = trajets["distance_km"].where(trajets["distance_km"] >= DISTANCE_MIN_KM)
+        trajets["retard_100km"] = diviser(trajets["retard_moyen_tous_trains_arrivee"] * 100, distance)
+        trajets["retard_arrivee_100km"] = diviser(trajets["retard_moyen_arrivee"] * 100, distance)
+    return trajets.sort_values("nb_train_retard_arrivee", ascending=False).reset_index(drop=True)
+
+
+def top_liaisons(trajets: pd.DataFrame, nb: int, critere: str = CRITERE_LIAISONS_DEFAUT) -> pd.DataFrame:
+    """Les `nb` pires liaisons selon `critere` (colonne de CRITERES_LIAISONS), un seul sens par paire de gares."""
+    if critere != CRITERE_LIAISONS_DEFAUT and critere in trajets.columns:
+        trajets = trajets.sort_values(critere, ascending=False, na_position="last", kind="stable")
+    paires = np.sort(trajets[["gare_depart", "gare_arrivee"]].to_numpy(dtype=str), axis=1)
+    doublon = pd.DataFrame(paires).duplicated().to_numpy()
+    return trajets[~doublon].head(nb)
@@ -0,0 +1,154 @@
+# src/data/anomalies.py
+import numpy as np
+import pandas as pd
+
+from src.data.causes import CAUSES_COLS
+from src.data.groupes import (
+    compte_par_groupe,
+    diviser,
+    indexer_groupes,
+    somme_par_groupe,
+)
+
+CLES_LIAISON = ["reseau", "service", "gare_depart", "gare_arrivee"]
+CLES_MOIS = CLES_LIAISON + ["Year", "Month"]
+
+# Taux suivis (%) -> colonne du numérateur, rapportée à nb_train_prevu
+TAUX = {
+    "taux_retard": "nb_train_retard_arrivee",
+    "taux_retard_sup_30": "nb_train_retard_sup_30",
+    "taux_annulation": "nb_annulation",
+}
+PARTS_CAUSES = {c: f"part_{c.removeprefix('prct_cause_')}" for c in CAUSES_COLS}
+MESURES = list(TAUX) + list(PARTS_CAUSES.values())
+COLONNES_MESURES = CLES_MOIS + ["nb_train_prevu"] + MESURES
+
+MIN_HISTORIQUE = 12  # mois connus de la liaison (hors mois noté) avant de lui donner un score
+PLANCHER_ECART = 1.0  # point de % : sur un historique plat, un écart minime ne devient pas infini
+SEUIL_ANOMALIE = 3.5  # écarts-types
+SEUIL_MOIS_RESTANTS = 0.5  # comptes de mois sommés en float (+1 / -1) : au-dessus, il reste au moins un mois
+
+LIBELLES_MOTIFS = {
+    "z_taux_retard": "Retards",
+    "z_taux_retard_sup_30": "Retards > 30 min",
+    "z_taux_annulation": "Annulations",
+    "z_causes": "Répartition des causes",
+}
+
+
+def mesures_mensuelles(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Une ligne par (liaison, mois) : taux de retard, de retard > 30 min, d'annulation et parts des causes.
+    Les lignes sans gares (TER, publié par région) n'ont pas de liaison à noter et sont écartées.
+    """
+    df = df.dropna(subset=["gare_depart", "gare_arrivee"])
+    df = df.drop_duplicates(subset=CLES_MOIS, keep="last")
+    prevus = df["nb_train_prevu"].to_numpy(dtype=float)
+
+    mesures = df[CLES_MOIS].reset_index(drop=True)
+    mesures["nb_train_prevu"] = prevus
+    for nom, colonne in TAUX.items():
+        mesures[nom] = diviser(df.reindex(columns=[colonne]).to_numpy(dtype=float).ravel() * 100, prevus)
+    parts = df.reindex(columns=list(PARTS_CAUSES)).to_numpy(dtype=float)
+    for i, nom in enumerate(PARTS_CAUSES.values()):
+        mesures[nom] = parts[:, i]
+    return mesures
+
+
+def contributions(mesures: pd.DataFrame, signe: float = 1.0) -> pd.DataFrame:
+    """
+    Référence additive de chaque liaison : nombre, somme et somme des carrés de chaque mesure.
+    Ajouter ou retirer des mois revient à additionner ces sommes (signe=-1 pour retirer).
+    """
+    codes, references = indexer_groupes(mesures, CLES_LIAISON, dropna=False)
+    n = len(references)
+    for m in MESURES:
+        x = mesures[m].to_numpy(dtype=float)
+        references[f"n_{m}"] = signe * compte_par_groupe(codes, n, x)
+        references[f"s_{m}"] = signe * somme_par_groupe(codes, n, x)
+        references[f"q_{m}"] = signe * somme_par_groupe(codes, n, x * x)
+    return references
+
+
+def cumuler_references(morceaux: list[pd.DataFrame]) -> pd.DataFrame:
+    """Somme de références partielles ; les liaisons dont il ne reste aucun mois disparaissent."""
+    references = pd.concat(morceaux, ignore_index=True)
+    references = references.groupby(CLES_LIAISON, sort=True, dropna=False).sum().reset_index()
+    compte = references[[f"n_{m}" for m in MESURES]].to_numpy().max(axis=1)
+    return references[compte > SEUIL_MOIS_RESTANTS].reset_index(drop=True)
+
+
+def scorer(mesures: pd.DataFrame, references: pd.DataFrame) -> pd.DataFrame:
+    """
+    Écart de chaque (liaison, mois) à l'historique de sa liaison, en écarts-types, calculé
+    d'un bloc pour toutes les liaisons. Le mois noté est retiré de sa propre référence.
+    score = pire écart entre les taux (à la hausse seulement) et la répartition des causes.
+    """
+    ref = mesures[CLES_LIAISON].merge(references, on=CLES_LIAISON, how="left")
+    resultat = mesures.copy()
+
+    ecarts = {}
+    for m in MESURES:
+        x = mesures[m].to_numpy(dtype=float)
+        present = ~np.isnan(x)
+        n = ref[f"n_{m}"].to_numpy(dtype=float) - present
+        s = ref[f"s_{m}"].to_numpy(dtype=float) - np.nan_to_num(x)
+        q = ref[f"q_{m}"].to_numpy(dtype=float) - np.nan_to_num(x) ** 2
+        moyenne = diviser(s, n)
+        variance = np.maximum(diviser(q - n * moyenne**2, n - 1), 0.0)
+        z = (x - moyenne) / np.sqrt(variance + PLANCHER_ECART**2)
+        ecarts[m] = np.where(n >= MIN_HISTORIQUE, z, np.nan)
+        if m == "taux_retard":
+            resultat["taux_retard_habituel"] = moyenne
+
+    for m in TAUX:
+        resultat[f"z_{m}"] = ecarts[m]
+    carres = np.column_stack([ecarts[m] ** 2 for m in PARTS_CAUSES.values()])
+    nb_causes = (~np.isnan(carres)).sum(axis=1)
+    resultat["z_causes"] = np.sqrt(diviser(np.nansum(carres, axis=1), nb_causes))
+
+    colonnes = list(LIBELLES_MOTIFS)
+    z = resultat[colonnes].to_numpy(dtype=float)
+    resultat["score"] = np.fmax.reduce(z, axis=1)
+    motif = np.array(colonnes, dtype=object)[np.argmax(np.where(np.isnan(z), -np.inf, z), axis=1)]
+    resultat["motif"] = np.where(np.isnan(resultat["score"]), None, motif)
+    return resultat
+
+
+def _differences(mesures: pd.DataFrame, anciennes: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(mois nouveaux ou révisés, anciennes valeurs des mois révisés ou sortis de la fenêtre)."""
+    mesures = mesures[COLONNES_MESURES]
+    anciennes = anciennes[COLONNES_MESURES].astype(mesures.dtypes.to_dict())
+    # une empreinte par ligne (clés + valeurs) : inchangée <=> présente des deux côtés
+    empreintes = pd.util.hash_pandas_object(mesures, index=False)
+    empreintes_anciennes = pd.util.hash_pandas_object(anciennes, index=False)
+    return (
+        mesures[~empreintes.isin(empreintes_anciennes).to_numpy()],
+        anciennes[~empreintes_anciennes.isin(empreintes).to_numpy()],
+    )
+
+
+def mettre_a_jour_anomalies(
+    df: pd.DataFrame,
+    precedent: dict[str, pd.DataFrame] | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Scores d'anomalie de chaque (liaison, mois) et références par liaison, à publier avec la version.
+    Avec l'état de la version précédente, les références ne reçoivent que la différence
+    (mois arrivés, révisés ou sortis de la fenêtre) au lieu d'être recalculées sur tout l'historique.
+    """
+    mesures = mesures_mensuelles(df)
+    if precedent is not None and {"anomalies", "references"} <= set(precedent):
+        ajouts, retraits = _differences(mesures, precedent["anomalies"])
+        references = cumuler_references(
+            [precedent["references"], contributions(ajouts), contributions(retraits, signe=-1.0)]
+        )
+    else:
+        references = contributions(mesures)
+    return {"anomalies": scorer(mesures, references), "references": references}
+
+
+def anomalies_signalees(anomalies: pd.DataFrame, seuil: float = SEUIL_ANOMALIE) -> pd.DataFrame:
+    """(liaison, mois) dont le score dépasse le seuil, du plus anormal au moins anormal."""
+    signalees = anomalies[anomalies["score"] >= seuil]
+    return signalees.sort_values("score", ascending=False).reset_index(drop=True)
@@ -0,0 +1,123 @@
+# src/data/carte.py
+import folium
+import pandas as pd
+from folium.plugins import AntPath
+
+from src.data.aggregats import CRITERE_LIAISONS_DEFAUT, top_liaisons
+
+OPTIONS_NB_TRAJETS = [0, 3, 5, 10]  # choix du selectbox "liaisons problématiques"
+# taux de retard (%) des couleurs de la carte
+SEUIL_LIAISON_TRES_EN_RETARD = 20
+SEUIL_LIAISON_EN_RETARD = 10
+SEUIL_GARE_PEU_DE_RETARDS = 20  # vert en dessous (cf. légende)
+SEUIL_GARE_RETARDS_ELEVES = 50  # rouge au-dessus
+
+LEGENDE_HTML = """
+<div style="
+     position: fixed;
+     bottom: 50px; left: 50px;
+     background-color: rgba(30, 30, 30, 0.9);
+     color: white;
+     border: 1px solid #666;
+     border: 2px solid #777;
+     z-index: 9999;
+     padding: 12px;
+     border-radius: 8px;
+     font-size: 14px;
+     box-shadow: 2px 2px 8px rgba(0,0,0,0.2);
+     max-width: 270px;">
+  <h4 style="margin-top:0;">📊 Légende</h4>
+  <p style="margin:4px 0;">● <b style="color:#4CAF50;">Vert</b> : Peu de retards (< 20 %)</p>
+  <p style="margin:4px 0;">● <b style="color:#FFC107;">Orange</b> : Retards modérés</p>
+  <p style="margin:4px 0;">● <b style="color:#F44336;">Rouge</b> : Retards élevés (> 50 %)</p>
+  <hr style="margin:6px 0;">
+  <p style="margin:4px 0;">➡️ <b>Flèches animées</b> : liaisons les plus problématiques</p>
+  <p style="margin:4px 0;">⚫ <b>Taille du point</b> = nombre de trains</p>
+</div>
+"""
+
+
+def construire_carte(
+    gares: pd.DataFrame,
+    trajets: pd.DataFrame,
+    nb_trajets: int,
+    coordonnees: pd.DataFrame,
+    critere: str = CRITERE_LIAISONS_DEFAUT,
+) -> folium.Map:
+    """
+    Carte des retards par gare (un rôle de finaliser_gares, gares géolocalisées)
+    et flèches animées sur les `nb_trajets` pires liaisons de `trajets` selon `critere`.
+    `coordonnees` est la table gare / lat / lon calculée avec les agrégats.
+    """
+    positions = dict(zip(coordonnees["gare"], zip(coordonnees["lat"], coordonnees["lon"])))
+    m = folium.Map(location=[gares["lat"].mean(), gares["lon"].mean()], zoom_start=6, tiles='OpenStreetMap')
+
+    # 🔁 Liaisons problématiques
+    if nb_trajets > 0 and not trajets.empty:
+        max_retards = trajets['nb_train_retard_arrivee'].max()
+        for _, trajet in top_liaisons(trajets, nb_trajets, critere).iterrows():
+            coord_depart = positions.get(trajet['gare_depart'])
+            coord_arrivee = positions.get(trajet['gare_arrivee'])
+
+            if coord_depart and coord_arrivee:
+                taux = trajet['taux_retard']
+                couleur_ligne = (
+                    "#000000" if taux > SEUIL_LIAISON_TRES_EN_RETARD
+                    else "#050505" if taux > SEUIL_LIAISON_EN_RETARD
+                    else "#000000"
+                )
+                epaisseur = 3 + (trajet['nb_train_retard_arrivee'] / max_retards) * 5
+
+                AntPath(
+                    locations=[coord_depart, coord_arrivee],
+                    color=couleur_ligne,
+                    weight=epaisseur,
+                    opacity=0.8,
+                    dash_array=[10, 20],
+                    delay=800,
+                    pulse_color="#ffffff",
+                    tooltip=(
+                        f"🚄 <b>{trajet['gare_depart']} → {trajet['gare_arrivee']}</b><br>"
+                        f"Retards: {trajet['nb_train_retard_arrivee']:.0f}<br>"
+                        f"Taux: {taux:.1f}%"
+                        + (
+                            f"<br>Distance: {trajet['distance_km']:.0f} km"
+                            f"<br>Retard / 100 km: {trajet['retard_100km']:.1f} min"
+                            if pd.notna(trajet.get('distance_km')) else ""
+                        )
+                    )
+                ).add_to(m)
+
+    # 📍 Points des gares
+    max_trains = gares['nb_train_prevu'].max()
+    for _, row in gares.iterrows():
+        taux = row['taux_retard']
+
+        if taux < SEUIL_GARE_PEU_DE_RETARDS:
+            color = '#4CAF50'
+        elif taux < SEUIL_GARE_RETARDS_ELEVES:
+            color = '#FFC107'
+        else:
+            color = '#F44336'
+
+        nb_trains = row['nb_train_prevu']
+        radius = 5 + (nb_trains / max_trains) * 15
+
+        folium.CircleMarker(
+            location=[row['lat'], row['lon']],
+            radius=radius,
+            popup=f"<b>{row['gare']}</b><br>Taux: {taux:.1f}%<br>Trains: {nb_trains:.0f}",
+            color=color,
+            fill=True,
+            fillColor=color,
+            fillOpacity=0.85,
+            weight=2
+        ).add_to(m)
+
+    m.get_root().html.add_child(folium.Element(LEGENDE_HTML))
+    return m
+
+
+def rendre_carte(m: folium.Map) -> str:
+    """HTML autonome de la carte (servi tel quel par la vue par défaut)."""
+    return m.get_root().render()
@@ -0,0 +1,100 @@
+# src/data/causes.py
+import numpy as np
+import pandas as pd
+
+from src.data.groupes import diviser, indexer_groupes, somme_par_groupe
+
+CAUSES_COLS = {
+    "prct_cause_externe": "Causes externes",
+    "prct_cause_infra": "Infrastructure ferroviaire",
+    "prct_cause_gestion_trafic": "Gestion du trafic",
+    "prct_cause_materiel_roulant": "Matériel roulant",
+    "prct_cause_gestion_gare": "Gestion en gare",
+    "prct_cause_prise_en_charge_voyageurs": "Affluence voyageurs",
+}
+
+# Anciennes pondérations du graphique "Retard moyen par cause", gardées si on veut les réappliquer
+POIDS_HISTORIQUES = {
+    "prct_cause_externe": 1.4,
+    "prct_cause_infra": 1.4,
+    "prct_cause_gestion_trafic": 0.8,
+    "prct_cause_materiel_roulant": 0.8,
+    "prct_cause_gestion_gare": 1.1,
+    "prct_cause_prise_en_charge_voyageurs": 1.1,
+}
+
+
+def composantes_causes(
+    df: pd.DataFrame,
+    par: list[str] | None = None,
+    dropna: bool = True,
+) -> pd.DataFrame:
+    """
+    Sommes additives nécessaires à l'attribution par cause, pour chaque groupe de `par`.
+    Chaque ligne est pondérée par son nombre de trains en retard à l'arrivée,
+    donc les composantes de plusieurs groupes peuvent simplement être additionnées.
+    """
+    codes, comp = indexer_groupes(df, par, dropna=dropna)
+    n = len(comp)
+
+    poids = np.nan_to_num(df["nb_train_retard_arrivee"].to_numpy(dtype=float))
+
+    parts = df.reindex(columns=list(CAUSES_COLS)).to_numpy(dtype=float)
+    a_des_causes = ~np.isnan(parts).all(axis=1)
+    retard = df.reindex(columns=["retard_moyen_arrivee"]).to_numpy(dtype=float).ravel()
+
+    comp["nb_train_retard_arrivee"] = somme_par_groupe(codes, n, poids)
+    comp["poids_causes"] = somme_par_groupe(codes, n, poids * a_des_causes)
+    comp["poids_retard"] = somme_par_groupe(codes, n, poids * ~np.isnan(retard))
+    comp["somme_retard"] = somme_par_groupe(codes, n, retard * poids)
+    for i, c in enumerate(CAUSES_COLS):
+        comp[f"somme_{c}"] = somme_par_groupe(codes, n, parts[:, i] * poids)
+
+    return comp
+
+
+def reagreger_composantes(comp: pd.DataFrame, par: list[str] | None = None) -> pd.DataFrame:
+    """Regroupe des composantes déjà calculées sur des clés plus grossières."""
+    valeurs = [c for c in comp.columns if c.startswith(("somme_", "poids_", "nb_"))]
+    if not par:
+        return comp[valeurs].sum().to_frame().T
+    return comp.groupby(par, sort=True, dropna=False)[valeurs].sum().reset_index()
+
+
+def finaliser_causes(
+    comp: pd.DataFrame,
+    par: list[str] | None = None,
+    poids: dict[str, float] | None = None,
+) -> pd.DataFrame:
+    """
+    Transforme les composantes en un frame long : une ligne par (groupe, cause)
+    avec la part de la cause (%) et les minutes de retard qui lui sont attribuées.
+    `poids` permet de sur/sous-pondérer certaines causes (aucune pondération par défaut).
+    """
+    par = par or []
+    n = len(comp)
+    nb_causes = len(CAUSES_COLS)
+
+    sommes = comp[[f"somme_{c}" for c in CAUSES_COLS]].to_numpy(dtype=float)
+    pourcentages = diviser(sommes, comp["poids_causes"].to_numpy(dtype=float)[:, None], defaut=0.0)
+    retard_moyen = diviser(comp["somme_retard"], comp["poids_retard"], defaut=0.0)
+
+    coeffs = np.array([(poids or {}).get(c, 1.0) for c in CAUSES_COLS])
+    ponderes = pourcentages * coeffs
+    parts = diviser(ponderes, ponderes.sum(axis=1, keepdims=True), defaut=0.0)
+
+    resultat = comp[par].loc[comp.index.repeat(nb_causes)].reset_index(drop=True)
+    resultat["Cause_raw"] = np.tile(list(CAUSES_COLS), n)
+    resultat["Cause"] = np.tile(list(CAUSES_COLS.values()), n)
+    resultat["Pourcentage"] = pourcentages.ravel()
+    resultat["Retard_moyen"] = (parts * retard_moyen[:, None]).ravel()
+    return resultat
+
+
+def attribuer_causes(
+    df: pd.DataFrame,
+    par: list[str] | None = None,
+    poids: dict[str, float] | None = None,
+) -> pd.DataFrame:
+    """Attribution des minutes de retard par cause pour chaque groupe (gare, liaison, mois...)."""
+    return finaliser_causes(composantes_causes(df, par), par, poids)
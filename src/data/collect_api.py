@@ -1,49 +1,217 @@
 # src/data/collect_api.py
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 import requests
 
+from src.config import DATA_DIR
+
 BASE_URL = "https://ressources.data.sncf.com/api/records/1.0/search/"
+META_URL = "https://ressources.data.sncf.com/api/datasets/1.0/{dataset}/"
 DATASET = "regularite-mensuelle-tgv-aqst"
 
+LIGNES_PAR_PAGE = 10000
+NB_PAGES_MAX = 20
+NB_TELECHARGEMENTS_PARALLELES = 8
+NB_TENTATIVES = 3
 
-def telecharger_donnees_sncf(nb_annees: int = 5) -> pd.DataFrame:
-    """Télécharge les données SNCF et garde seulement les nb_annees dernières."""
-    params = {
+# Dernière version vue de chaque jeu (ETag, Last-Modified, date de traitement ODS)
+FICHIER_ETAT_COLLECTE = DATA_DIR / "collecte.json"
+
+# Jeux de régularité SNCF : identifiant ODS + correspondance de leurs colonnes
+# vers le schéma TGV attendu par enrichir_base. Seules les mesures que le jeu publie
+# vraiment sont renommées ; les autres restent manquantes (NaN), jamais remplies avec
+# une colonne d'un autre sens. Transilien n'est pas collecté : il ne publie que des taux
+# de ponctualité par voyageur, sans nombre de trains.
+DATASETS = {
+    "TGV": {
         "dataset": DATASET,
-        "rows": 10000,
+        "cle": ["date", "service", "gare_depart", "gare_arrivee"],
+        "colonnes": {},
+    },
+    "Intercités": {
+        "dataset": "regularite-mensuelle-intercites",
+        "cle": ["date", "depart", "arrivee"],
+        "colonnes": {
+            "depart": "gare_depart",
+            "arrivee": "gare_arrivee",
+            "nombre_de_trains_programmes": "nb_train_prevu",
+            "nombre_de_trains_annules": "nb_annulation",
+            "nombre_de_trains_en_retard_a_l_arrivee": "nb_train_retard_arrivee",
+        },
+        "constantes": {"service": "National"},
+    },
+    "TER": {
+        "dataset": "regularite-mensuelle-ter",
+        # régularité par région : pas de gares, la région reste dans sa propre colonne
+        "cle": ["date", "region"],
+        "colonnes": {
+            "nombre_de_trains_programmes": "nb_train_prevu",
+            "nombre_de_trains_annules": "nb_annulation",
+            "nombre_de_trains_en_retard_a_l_arrivee": "nb_train_retard_arrivee",
+        },
+        "constantes": {"service": "Régional"},
+    },
+}
+# Colonnes de la clé TGV (hors date) dont dépendent facettes, agrégats et store : ajoutées
+# vides aux réseaux qui ne les publient pas (TER : ni gares ni liaisons)
+COLONNES_CLES = [c for c in DATASETS["TGV"]["cle"] if c != "date"]
+
+
+def reseaux_actifs() -> list[str]:
+    """Réseaux à collecter (variable SNCF_RESEAUX="TGV,TER", tous par défaut)."""
+    valeur = os.environ.get("SNCF_RESEAUX", "")
+    choisis = [r.strip() for r in valeur.split(",") if r.strip()]
+    return [r for r in choisis if r in DATASETS] or list(DATASETS)
+
+
+def _telecharger_page(dataset: str, start: int) -> dict | None:
+    params = {
+        "dataset": dataset,
+        "rows": LIGNES_PAR_PAGE,
         "sort": "date",
-        "facet": ["service", "gare_depart", "gare_arrivee"],
+        "start": start,
+    }
+    try:
+        resp = requests.get(BASE_URL, params=params, timeout=30)
+        resp.raise_for_status()
+        return resp.json()
+    except Exception:
+        return None
+
+
+def charger_etat_collecte() -> dict:
+    if not FICHIER_ETAT_COLLECTE.exists():
+        return {}
+    try:
+        return json.loads(FICHIER_ETAT_COLLECTE.read_text())
+    except ValueError:
+        return {}
+
+
+def sauver_etat_collecte(etat: dict) -> None:
+    FICHIER_ETAT_COLLECTE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = FICHIER_ETAT_COLLECTE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(etat, indent=2))
+    os.replace(tmp, FICHIER_ETAT_COLLECTE)
+
+
+def verifier_modification(dataset: str, etat_precedent: dict | None = None) -> tuple[bool, dict]:
+    """
+    Interroge les métadonnées du jeu (requête conditionnelle If-None-Match /
+    If-Modified-Since) pour savoir s'il a été republié depuis la dernière collecte.
+    En cas de doute (pas d'état, API muette), on considère qu'il a changé.
+    """
+    etat_precedent = etat_precedent or {}
+    entetes = {}
+    if etat_precedent.get("etag"):
+        entetes["If-None-Match"] = etat_precedent["etag"]
+    if etat_precedent.get("last_modified"):
+        entetes["If-Modified-Since"] = etat_precedent["last_modified"]
+
+    try:
+        resp = requests.get(META_URL.format(dataset=dataset), headers=entetes, timeout=15)
+        if resp.status_code == 304:  # noqa: PLR2004
+            return False, etat_precedent
+        resp.raise_for_status()
+        metas = resp.json().get("metas", {})
+    except Exception:
+        return True, etat_precedent
+
+    etat = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "modifie_le": metas.get("data_processed") or metas.get("modified"),
     }
+    modifie = etat["modifie_le"] is None or etat["modifie_le"] != etat_precedent.get("modifie_le")
+    return modifie, etat
+
+
+def empreinte_page(page: dict) -> str:
+    """Empreinte d'une page (ODS donne déjà un recordid qui hache le contenu de chaque ligne)."""
+    ids = [rec.get("recordid") or empreinte_record(rec["fields"]) for rec in page.get("records", [])]
+    return hashlib.sha1("|".join(ids).encode()).hexdigest()
 
-    all_data = []
-    offset = 0
-
-    for _ in range(20):
-        params["start"] = offset
-        try:
-            resp = requests.get(BASE_URL, params=params, timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
-        except Exception:
-            if offset == 0:
-                return pd.DataFrame()
-            break
 
-        records = data.get("records", [])
-        if not records:
+def empreinte_record(fields: dict) -> str:
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _telecharger_pages(dataset: str) -> tuple[list[dict], bool]:
+    """
+    Toutes les pages d'un jeu. Renvoie (pages, coherent) : coherent=False si le jeu
+    a bougé pendant la collecte (nhits différent ou première page modifiée),
+    auquel cas les offsets ont pu glisser et des lignes être sautées ou doublées.
+    """
+    premiere = _telecharger_page(dataset, 0)
+    if premiere is None:
+        return [], True
+
+    records = premiere.get("records", [])
+    nb_total = premiere.get("nhits", len(records))
+    offsets = range(LIGNES_PAR_PAGE, min(nb_total, LIGNES_PAR_PAGE * NB_PAGES_MAX), LIGNES_PAR_PAGE)
+
+    pages = [premiere]
+    if len(records) < LIGNES_PAR_PAGE or not offsets:
+        return pages, True
+
+    with ThreadPoolExecutor(max_workers=NB_TELECHARGEMENTS_PARALLELES) as pool:
+        suivantes = list(pool.map(lambda start: _telecharger_page(dataset, start), offsets))
+    # on garde seulement les pages contiguës, comme le téléchargement séquentiel
+    for page in suivantes:
+        if page is None or not page.get("records"):
             break
+        pages.append(page)
+
+    controle = _telecharger_page(dataset, 0)
+    coherent = (
+        controle is not None
+        and all(p.get("nhits", nb_total) == nb_total for p in pages)
+        and empreinte_page(controle) == empreinte_page(premiere)
+    )
+    return pages, coherent
 
-        for rec in records:
-            all_data.append(rec["fields"])
 
-        offset += len(records)
-        if len(records) < params["rows"]:
+def telecharger_dataset(dataset: str, nb_annees: int = 5, cle: list[str] | None = None) -> pd.DataFrame:
+    """
+    Télécharge un jeu de données ODS : la première page donne le nombre total
+    de lignes (nhits), les pages suivantes sont récupérées en parallèle.
+    Si le jeu est republié pendant la collecte, on recommence (NB_TENTATIVES) ;
+    sans collecte cohérente, le frame est vide, comme un téléchargement échoué
+    (le réseau est alors repris de la version publiée). On dédoublonne ensuite
+    sur la clé naturelle `cle`.
+    """
+    for _ in range(NB_TENTATIVES):
+        pages, coherent = _telecharger_pages(dataset)
+        if coherent:
             break
+    else:
+        return pd.DataFrame()
 
+    all_data = [rec["fields"] for page in pages for rec in page.get("records", [])]
     if not all_data:
         return pd.DataFrame()
 
     df = pd.DataFrame(all_data)
+    df["empreinte"] = [
+        rec.get("recordid") or empreinte_record(rec["fields"])
+        for page in pages for rec in page.get("records", [])
+    ]
+    # l'empreinte ne sert qu'au dédoublonnage : elle ne doit pas finir dans la base publiée
+    df = df.drop_duplicates(subset="empreinte").drop(columns="empreinte")
+    return garder_annees(df, nb_annees, cle)
+
+
+def garder_annees(df: pd.DataFrame, nb_annees: int = 5, cle: list[str] | None = None) -> pd.DataFrame:
+    """Dédoublonne sur la clé naturelle, parse `date` (AAAA-MM) et garde les nb_annees dernières."""
+    if cle and all(c in df.columns for c in cle):
+        # même clé, contenu différent : la ligne vue en dernier est la plus récente
+        df = df.drop_duplicates(subset=cle, keep="last")
+
     df["Date"] = pd.to_datetime(df["date"], format="%Y-%m", errors="coerce")
 
     date_max = df["Date"].max()
@@ -51,6 +219,47 @@ def telecharger_donnees_sncf(nb_annees: int = 5) -> pd.DataFrame:
     return df[df["Date"] >= date_min].copy()
 
 
+def harmoniser(df: pd.DataFrame, reseau: str) -> pd.DataFrame:
+    """
+    Renomme les colonnes d'un réseau vers le schéma TGV et ajoute la dimension `reseau` ;
+    les colonnes de clé que le réseau ne publie pas sont ajoutées vides (NaN).
+    """
+    if df.empty:
+        return df
+
+    definition = DATASETS[reseau]
+    df = df.rename(columns=definition["colonnes"])
+    for col, valeur in definition.get("constantes", {}).items():
+        if col not in df.columns:
+            df[col] = valeur
+    for col in COLONNES_CLES:
+        if col not in df.columns:
+            df[col] = pd.Series(np.nan, index=df.index, dtype=object)
+    df["reseau"] = reseau
+    return df
+
+
+def telecharger_donnees_sncf(nb_annees: int = 5) -> pd.DataFrame:
+    """Télécharge les données SNCF et garde seulement les nb_annees dernières."""
+    return harmoniser(telecharger_dataset(DATASET, nb_annees, DATASETS["TGV"]["cle"]), "TGV")
+
+
+def telecharger_reseaux(nb_annees: int = 5, reseaux: list[str] | None = None) -> pd.DataFrame:
+    """Télécharge tous les réseaux en parallèle et les empile dans un seul frame."""
+    reseaux = reseaux or reseaux_actifs()
+
+    def telecharger(reseau):
+        definition = DATASETS[reseau]
+        return harmoniser(telecharger_dataset(definition["dataset"], nb_annees, definition["cle"]), reseau)
+
+    with ThreadPoolExecutor(max_workers=len(reseaux)) as pool:
+        frames = [df for df in pool.map(telecharger, reseaux) if not df.empty]
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
 def get_gares_coordinates() -> dict:
     """Dico de coords"""
     return {
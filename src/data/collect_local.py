@@ -0,0 +1,183 @@
+# src/data/collect_local.py
+import glob
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+
+from src.config import FICHIERS_LOCAUX
+from src.data.causes import CAUSES_COLS
+from src.data.collect_api import DATASETS, garder_annees, harmoniser
+
+EXTENSIONS = (".csv", ".json", ".jsonl", ".ndjson")
+NB_LECTURES_PARALLELES = 4  # fichiers lus en même temps
+TAILLE_BLOC_LECTURE = 8 << 20  # octets par bloc analysé (les blocs sont répartis sur les threads Arrow)
+
+# Types imposés à la lecture (sinon déduits) : colonnes texte des différents jeux, le reste en float
+COLONNES_TEXTE = [
+    "date", "service", "gare_depart", "gare_arrivee", "depart", "arrivee", "region",
+    "commentaire_annulation", "commentaire_retards_depart", "commentaire_retard_arrivee",
+]
+COLONNES_NUMERIQUES = [
+    "duree_moyenne", "nb_train_prevu", "nb_annulation",
+    "nb_train_depart_retard", "retard_moyen_depart", "retard_moyen_tous_trains_depart",
+    "nb_train_retard_arrivee", "retard_moyen_arrivee", "retard_moyen_tous_trains_arrivee",
+    "nb_train_retard_sup_15", "retard_moyen_trains_retard_sup15", "nb_train_retard_sup_30", "nb_train_retard_sup_60",
+    *CAUSES_COLS,
+    *(source for d in DATASETS.values() for source in d["colonnes"] if source not in COLONNES_TEXTE),
+]
+TYPES_COLONNES = {
+    **{c: pa.string() for c in COLONNES_TEXTE},
+    **{c: pa.float64() for c in COLONNES_NUMERIQUES},
+}
+
+
+def _lister(motif: str) -> list[Path]:
+    """Fichiers d'un motif : chemin, glob ou dossier (tous les exports qu'il contient)."""
+    fichiers = []
+    for chemin in map(Path, sorted(glob.glob(motif)) or [motif]):
+        if chemin.is_dir():
+            fichiers += sorted(f for f in chemin.iterdir() if f.name.removesuffix(".gz").endswith(EXTENSIONS))
+        elif chemin.is_file():
+            fichiers.append(chemin)
+    return fichiers
+
+
+def deviner_reseau(chemin: Path) -> str:
+    """Réseau d'un export d'après l'identifiant du jeu dans son nom (celui donné par ODS), TGV sinon."""
+    nom = chemin.name.lower()
+    for reseau, definition in sorted(DATASETS.items(), key=lambda r: -len(r[1]["dataset"])):
+        if definition["dataset"] in nom:
+            return reseau
+    return "TGV"
+
+
+def sources_locales(valeur: str | None = None) -> dict[str, list[Path]]:
+    """
+    Fichiers locaux par réseau, depuis SNCF_FICHIERS_LOCAUX (ou `valeur`) :
+    "chemin,chemin" ou "RESEAU=chemin" ; un chemin peut être un glob ou un dossier.
+    Vide si l'import local n'est pas configuré.
+    """
+    valeur = FICHIERS_LOCAUX if valeur is None else valeur
+    sources: dict[str, list[Path]] = {}
+    for entree in (e.strip() for e in valeur.split(",")):
+        if not entree:
+            continue
+        reseau, _, motif = entree.partition("=")
+        if reseau not in DATASETS:
+            reseau, motif = None, entree
+        for chemin in _lister(motif):
+            if not any(chemin in chemins for chemins in sources.values()):
+                sources.setdefault(reseau or deviner_reseau(chemin), []).append(chemin)
+    return {r: sources[r] for r in DATASETS if r in sources}
+
+
+def empreinte_sources(sources: dict[str, list[Path]]) -> str:
+    """Empreinte (chemin, taille, date de modification) : change dès qu'un fichier est remplacé."""
+    etats = [
+        (reseau, str(chemin), chemin.stat().st_size, chemin.stat().st_mtime_ns)
+        for reseau, chemins in sources.items() for chemin in chemins
+    ]
+    return hashlib.sha1(json.dumps(etats).encode()).hexdigest()[:12]
+
+
+def _debut(chemin: Path, taille: int = 1 << 16) -> str:
+    """Premiers octets du fichier (décompressés si .gz)."""
+    with pa.input_stream(str(chemin)) as f:
+        return f.read(taille).decode("utf-8", errors="ignore").lstrip("\ufeff")
+
+
+def _typer(table: pa.Table) -> pa.Table:
+    """Applique TYPES_COLONNES aux colonnes présentes (JSON déjà parsé)."""
+    schema = pa.schema([
+        (nom, TYPES_COLONNES.get(nom, table.schema.field(nom).type)) for nom in table.column_names
+    ])
+    return table.cast(schema)
+
+
+def lire_csv(chemin: Path) -> pa.Table:
+    """CSV d'export (séparateur ; ou ,) analysé par blocs en parallèle, types imposés."""
+    entete = _debut(chemin).split("\n", 1)[0]
+    separateur = ";" if entete.count(";") > entete.count(",") else ","
+    return pa_csv.read_csv(
+        str(chemin),
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=TAILLE_BLOC_LECTURE),
+        parse_options=pa_csv.ParseOptions(delimiter=separateur),
+        convert_options=pa_csv.ConvertOptions(column_types=TYPES_COLONNES, strings_can_be_null=True),
+    )
+
+
+def _premier_enregistrement(debut: str) -> dict | None:
+    """Première ligne non vide si c'est à elle seule un objet JSON complet (donc du JSON-lines), sinon None."""
+    premiere = next((ligne for ligne in debut.splitlines() if ligne.strip()), "")
+    try:
+        objet = json.loads(premiere)
+    except ValueError:
+        return None  # document sur plusieurs lignes (export indenté) ou ligne plus longue que `debut`
+    if not isinstance(objet, dict) or "records" in objet:
+        return None  # réponse ODS {"records": [...]} écrite sur une seule ligne
+    return objet
+
+
+def lire_json(chemin: Path) -> pa.Table:
+    """
+    JSON-lines analysé par blocs en parallèle ; tableau JSON (ou réponse ODS v1
+    {"records": [{"fields": ...}]}, indentée ou non) chargé d'un bloc puisqu'il ne se découpe pas.
+    """
+    colonnes = _premier_enregistrement(_debut(chemin))
+    if colonnes is not None:
+        schema = pa.schema([(c, TYPES_COLONNES[c]) for c in colonnes if c in TYPES_COLONNES])
+        return pa_json.read_json(
+            str(chemin),
+            read_options=pa_json.ReadOptions(use_threads=True, block_size=TAILLE_BLOC_LECTURE),
+            parse_options=pa_json.ParseOptions(explicit_schema=schema, unexpected_field_behavior="infer"),
+        )
+
+    with pa.input_stream(str(chemin)) as f:
+        donnees = json.loads(f.read())
+    if isinstance(donnees, dict):
+        donnees = donnees.get("records", [])
+    records = [r.get("fields", r) for r in donnees]
+    return _typer(pa.Table.from_pylist(records)) if records else pa.table({})
+
+
+def lire_fichier(chemin: Path) -> pd.DataFrame:
+    """Un fichier d'export local (CSV, JSON, JSON-lines, éventuellement .gz) en DataFrame."""
+    nom = chemin.name.lower().removesuffix(".gz")
+    table = lire_csv(chemin) if nom.endswith(".csv") else lire_json(chemin)
+    df = table.to_pandas()
+    if "date" in df.columns:
+        # certains exports écrivent le mois en date complète (2024-01-01) : même format AAAA-MM que l'API
+        df["date"] = df["date"].str[:7]
+    return df
+
+
+def importer_fichiers(nb_annees: int = 5, sources: dict[str, list[Path]] | None = None) -> pd.DataFrame:
+    """
+    Équivalent hors ligne de telecharger_reseaux : lit les fichiers en parallèle,
+    puis, par réseau, même dédoublonnage, même fenêtre de nb_annees et même harmonisation.
+    """
+    sources = sources_locales() if sources is None else sources
+    fichiers = [(reseau, chemin) for reseau, chemins in sources.items() for chemin in chemins]
+    if not fichiers:
+        return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=NB_LECTURES_PARALLELES) as pool:
+        lus = list(pool.map(lambda f: lire_fichier(f[1]), fichiers))
+
+    frames = []
+    for reseau in sources:
+        morceaux = [df for (r, _), df in zip(fichiers, lus) if r == reseau and not df.empty]
+        if not morceaux:
+            continue
+        df = garder_annees(pd.concat(morceaux, ignore_index=True), nb_annees, DATASETS[reseau]["cle"])
+        frames.append(harmoniser(df, reseau))
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,64 @@
+# src/data/comparaison.py
+import numpy as np
+import pandas as pd
+
+from src.data.aggregats import metriques_mensuelles, reagreger_trafic
+from src.data.causes import finaliser_causes, reagreger_composantes
+from src.data.groupes import diviser
+from src.data.transform import masque_filtres
+
+# Filtres d'une sélection, dans l'ordre des arguments de masque_filtres
+CHAMPS_SELECTION = ("annees", "filtre_service", "filtre_gare_depart", "filtre_gare_arrivee", "filtre_reseau")
+
+
+def etiqueter_cellules(cellules: pd.DataFrame, selections: list[tuple]) -> pd.DataFrame:
+    """
+    Empile les cellules de chaque sélection avec son numéro dans `serie`
+    (une cellule peut appartenir à plusieurs sélections). Seuls des masques sont
+    calculés par sélection ; l'agrégation se fait ensuite en un seul groupby.
+    """
+    indices = [np.flatnonzero(masque_filtres(cellules, *selection).to_numpy()) for selection in selections]
+    etiquetees = cellules.iloc[np.concatenate(indices)].reset_index(drop=True)
+    etiquetees.insert(0, "serie", np.repeat(np.arange(len(selections)), [len(i) for i in indices]))
+    return etiquetees
+
+
+def _nommer(df: pd.DataFrame, libelles: list[str]) -> pd.DataFrame:
+    df["serie"] = np.array(libelles, dtype=object)[df["serie"].to_numpy(dtype=int)]
+    return df
+
+
+def comparer_selections(aggregats: dict[str, pd.DataFrame], selections: dict[str, tuple]) -> dict[str, pd.DataFrame]:
+    """
+    Séries mensuelles, KPI et parts de causes de plusieurs sélections (libellé -> filtres,
+    cf. CHAMPS_SELECTION) en une agrégation groupée par `serie` au lieu d'un calcul par sélection.
+    """
+    libelles = list(selections)
+    trafic = etiqueter_cellules(aggregats["trafic"], list(selections.values()))
+    causes = etiqueter_cellules(aggregats["causes"], list(selections.values()))
+
+    metriques = metriques_mensuelles(trafic, par=["serie"])
+
+    kpis = reagreger_trafic(trafic, par=["serie"])
+    kpis = kpis[["serie", "nb_train_prevu", "nb_annulation", "nb_train_retard_arrivee",
+                 "nb_train_retard_sup_30", "retard_moyen_tous_trains_arrivee"]]
+    kpis = kpis.rename(columns={"retard_moyen_tous_trains_arrivee": "retard_moyen"})
+    kpis["late_rate"] = diviser(kpis["nb_train_retard_arrivee"] * 100, kpis["nb_train_prevu"], defaut=0.0)
+    kpis["cancellation_rate"] = diviser(kpis["nb_annulation"] * 100, kpis["nb_train_prevu"], defaut=0.0)
+    kpis["taux_retard_sup_30"] = diviser(kpis["nb_train_retard_sup_30"] * 100, kpis["nb_train_prevu"], defaut=0.0)
+    kpis["un_sur_x"] = np.floor(diviser(kpis["nb_train_prevu"], kpis["nb_train_retard_sup_30"], defaut=0.0)).astype(int)
+
+    parts = finaliser_causes(reagreger_composantes(causes, par=["serie"]), par=["serie"])
+    # cause principale = plus grande part de la série (pondérée par les trains en retard)
+    principales = parts.loc[parts.groupby("serie")["Pourcentage"].idxmax(), ["serie", "Cause", "Pourcentage"]]
+    kpis = kpis.merge(
+        principales.rename(columns={"Cause": "cause_principale", "Pourcentage": "valeur_cause_principale"}),
+        on="serie",
+        how="left",
+    )
+
+    return {
+        "metriques": _nommer(metriques, libelles) if not metriques.empty else metriques,
+        "kpis": _nommer(kpis, libelles),
+        "causes": _nommer(parts, libelles),
+    }
@@ -0,0 +1,211 @@
+# src/data/export.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from src.config import DATA_DIR
+from src.data.aggregats import (
+    filtrer_cellules,
+    metriques_mensuelles,
+    retards_par_liaison,
+)
+from src.data.gares import finaliser_gares
+from src.data.store import filtre_store, ouvrir_store
+
+DOSSIER_EXPORTS = DATA_DIR / "exports"
+TAILLE_LOT_EXPORT = 50_000  # lignes lues / écrites à la fois
+MAX_LIGNES_EXCEL = 1_048_575  # limite d'une feuille Excel, en-tête compris
+
+FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+LIBELLES_FORMATS = {"csv": "CSV", "parquet": "Parquet", "xlsx": "Excel"}
+LIBELLES_TABLES = {
+    "lignes": "Lignes brutes",
+    "metriques": "Métriques mensuelles",
+    "liaisons": "Retards par liaison",
+    "gares": "Indicateurs par gare",
+}
+
+
+class ExportInvalideError(ValueError):
+    pass
+
+
+def _moteur_excel() -> str | None:
+    """Bibliothèque d'écriture Excel : xlsxwriter (dépendance du projet), sinon openpyxl."""
+    for module in ("xlsxwriter", "openpyxl"):
+        try:
+            __import__(module)
+            return module
+        except ImportError:
+            continue
+    return None
+
+
+def formats_disponibles() -> list[str]:
+    return [f for f in FORMATS if f != "xlsx" or _moteur_excel()]
+
+
+def lots_lignes(
+    version: str, filtres: tuple, dossier: Path | None = None, taille_lot: int = TAILLE_LOT_EXPORT
+) -> Iterable[pa.RecordBatch]:
+    """Lignes brutes des filtres (mêmes arguments que filtre_store), lues lot par lot dans le store de `version`."""
+    dataset = ouvrir_store(version, dossier)
+    if dataset is None:
+        return
+    # lecture anticipée limitée : la mémoire reste de l'ordre de quelques lots
+    yield from dataset.to_batches(
+        filter=filtre_store(*filtres), batch_size=taille_lot, batch_readahead=1, fragment_readahead=1
+    )
+
+
+def lots_frame(df: pd.DataFrame, taille_lot: int = TAILLE_LOT_EXPORT) -> Iterable[pa.RecordBatch]:
+    """Découpe un DataFrame (agrégat) en lots Arrow."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    yield from table.to_batches(max_chunksize=taille_lot)
+
+
+def lots_table(
+    version: str, table: str, filtres: tuple, aggregats: dict[str, pd.DataFrame]
+) -> Iterable[pa.RecordBatch]:
+    """Lots d'une table exportable pour les filtres (annees, service, gare_depart, gare_arrivee, reseau)."""
+    if table == "lignes":
+        return lots_lignes(version, filtres)
+    if table == "metriques":
+        return lots_frame(metriques_mensuelles(filtrer_cellules(aggregats, "trafic", *filtres)))
+    if table == "liaisons":
+        return lots_frame(retards_par_liaison(filtrer_cellules(aggregats, "trafic", *filtres), aggregats["distances"]))
+    if table == "gares":
+        cellules = filtrer_cellules(aggregats, "gares", *filtres)
+        return lots_frame(finaliser_gares(cellules, coordonnees=aggregats["coordonnees"]))
+    raise ExportInvalideError(f"table inconnue : {table}")
+
+
+def _lignes_excel(lots: Iterable[pa.RecordBatch]) -> Iterable[list]:
+    """En-tête puis lignes en valeurs Python (dates en texte ISO, NaN en cellule vide)."""
+    nb_lignes = 0
+    for lot in lots:
+        if nb_lignes == 0:
+            yield lot.schema.names
+        nb_lignes += lot.num_rows
+        if nb_lignes > MAX_LIGNES_EXCEL:
+            raise ExportInvalideError(f"plus de {MAX_LIGNES_EXCEL} lignes : utiliser CSV ou Parquet")
+        for ligne in zip(*(colonne.to_pylist() for colonne in lot.columns)):
+            yield [
+                v.isoformat() if isinstance(v, (date, datetime)) else None if v != v else v
+                for v in ligne
+            ]
+
+
+def _ecrire_excel(lots: Iterable[pa.RecordBatch], chemin: Path) -> None:
+    """Écriture ligne à ligne en mode mémoire constante (xlsxwriter) ou write-only (openpyxl)."""
+    moteur = _moteur_excel()
+    if moteur is None:
+        raise ExportInvalideError("export Excel indisponible : installer xlsxwriter ou openpyxl")
+
+    if moteur == "xlsxwriter":
+        import xlsxwriter
+
+        classeur = xlsxwriter.Workbook(str(chemin), {"constant_memory": True})
+        feuille = classeur.add_worksheet("export")
+        try:
+            for i, ligne in enumerate(_lignes_excel(lots)):
+                feuille.write_row(i, 0, ligne)
+        finally:
+            classeur.close()
+    else:
+        import openpyxl
+
+        classeur = openpyxl.Workbook(write_only=True)
+        feuille = classeur.create_sheet("export")
+        for ligne in _lignes_excel(lots):
+            feuille.append(ligne)
+        classeur.save(chemin)
+
+
+def ecrire_export(lots: Iterable[pa.RecordBatch], format: str, chemin: Path) -> Path:
+    """Écrit les lots un par un dans `chemin` : seul le lot courant est en mémoire."""
+    lots = iter(lots)
+    if format == "xlsx":
+        _ecrire_excel(lots, chemin)
+        return chemin
+
+    premier = next(lots, None)
+    if premier is None:
+        chemin.write_bytes(b"")
+        return chemin
+
+    if format == "csv":
+        ecrivain = pa_csv.CSVWriter(str(chemin), premier.schema)
+    elif format == "parquet":
+        ecrivain = pq.ParquetWriter(str(chemin), premier.schema)
+    else:
+        raise ExportInvalideError(f"format inconnu : {format}")
+    with ecrivain:
+        ecrivain.write(premier)
+        for lot in lots:
+            ecrivain.write(lot)
+    return chemin
+
+
+def cle_export(version: str, table: str, format: str, filtres: tuple) -> str:
+    """Clé de cache d'un export : même version + même table + mêmes filtres = même fichier."""
+    brut = json.dumps([version, table, format, filtres], default=list, ensure_ascii=False)
+    return hashlib.sha1(brut.encode()).hexdigest()[:16]
+
+
+def fichier_export(
+    version: str,
+    table: str,
+    format: str,
+    filtres: tuple,
+    aggregats: dict[str, pd.DataFrame],
+    dossier: Path | None = None,
+) -> Path:
+    """
+    Fichier d'export écrit lot par lot sur disque et mis en cache par
+    (version, table, format, filtres) : un second téléchargement ne recalcule rien.
+    """
+    if format not in FORMATS:
+        raise ExportInvalideError(f"format inconnu : {format}")
+    if table not in LIBELLES_TABLES:
+        raise ExportInvalideError(f"table inconnue : {table}")
+    filtres = (tuple(int(a) for a in filtres[0]),) + tuple(filtres[1:])
+    dossier = Path(dossier or DOSSIER_EXPORTS)
+    extension, _ = FORMATS[format]
+    chemin = dossier / version / f"{table}_{cle_export(version, table, format, filtres)}.{extension}"
+    if chemin.exists():
+        return chemin
+
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    nettoyer_exports(dossier, garder=version)
+    tmp = chemin.with_name(f".{chemin.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        ecrire_export(lots_table(version, table, filtres, aggregats), format, tmp)
+        os.replace(tmp, chemin)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return chemin
+
+
+def nettoyer_exports(dossier: Path | None = None, garder: str | None = None) -> None:
+    """Les exports d'une ancienne version ne resserviront plus."""
+    dossier = Path(dossier or DOSSIER_EXPORTS)
+    if not dossier.exists():
+        return
+    for ancien in dossier.iterdir():
+        if ancien.is_dir() and ancien.name != garder:
+            shutil.rmtree(ancien, ignore_errors=True)
@@ -0,0 +1,110 @@
+# src/data/facettes.py
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+# Ordre de la cascade dans la sidebar et valeur "pas de filtre" de chaque liste
+DIMENSIONS = ["reseau", "gare_depart", "gare_arrivee", "service"]
+JOKERS = {"reseau": "Tous", "gare_depart": "Toutes", "gare_arrivee": "Toutes", "service": "Tous"}
+
+
+def compter_facettes(df: pd.DataFrame) -> pd.DataFrame:
+    """Nombre de lignes par (Year, reseau, gare_depart, gare_arrivee, service)."""
+    return (
+        df.groupby(["Year"] + DIMENSIONS, dropna=False)
+        .size()
+        .rename("nb_lignes")
+        .reset_index()
+    )
+
+
+def _avec_jokers(cellules: pd.DataFrame, dims: list[str]) -> pd.DataFrame:
+    """Duplique les cellules pour chaque combinaison de `dims` remplacées par leur joker."""
+    frames = []
+    for masque in product([False, True], repeat=len(dims)):
+        f = cellules.copy()
+        for dim, joker in zip(dims, masque):
+            if joker:
+                f[dim] = JOKERS[dim]
+        frames.append(f)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _colonnes(index: dict, periode: tuple[int, int]) -> tuple[int, int]:
+    """Colonnes de cumul qui bornent la période : compte sur [début, fin] = cumul[:, j] - cumul[:, i]."""
+    debut, fin = periode
+    return (
+        int(np.searchsorted(index["annees"], debut, side="left")),
+        int(np.searchsorted(index["annees"], fin, side="right")),
+    )
+
+
+def construire_index_facettes(facettes: pd.DataFrame) -> dict:
+    """
+    Index des listes déroulantes, construit une fois par version des données :
+    comptes cumulés année par année de chaque combinaison (jokers compris) et, pour
+    chaque liste, ses candidates selon les choix précédents. Le compte d'une période
+    [a, b] est une différence de deux colonnes de cumul, faite au lookup : l'index
+    grandit avec le nombre d'années, pas avec le nombre de périodes possibles.
+    """
+    if facettes.empty:
+        return {}
+    par_annee = (
+        _avec_jokers(facettes, DIMENSIONS)
+        .groupby(DIMENSIONS + ["Year"], dropna=False)["nb_lignes"].sum()
+        .unstack("Year", fill_value=0)
+        .sort_index(axis=1)
+    )
+    cumul = np.cumsum(par_annee.to_numpy(), axis=1)
+    cles = par_annee.index.to_frame(index=False)
+
+    index = {
+        "annees": par_annee.columns.to_numpy(dtype=int),
+        "cumul": np.hstack([np.zeros((len(cumul), 1), dtype=cumul.dtype), cumul]),
+        "lignes": {cle: i for i, cle in enumerate(map(tuple, cles.to_numpy()))},
+    }
+    for i, dim in enumerate(DIMENSIONS):
+        # candidates de `dim` : clés où `dim` a une vraie valeur (ni joker ni manquante)
+        # et toutes les listes suivantes sont en joker ; triées par valeur
+        masque = (cles[dim] != JOKERS[dim]) & cles[dim].notna()
+        for d in DIMENSIONS[i + 1:]:
+            masque &= cles[d] == JOKERS[d]
+        candidates = cles[masque].sort_values(dim, kind="stable")
+
+        prefixe = DIMENSIONS[:i]
+        if prefixe:
+            groupes = candidates.groupby(prefixe, sort=False).indices
+        else:
+            groupes = {(): np.arange(len(candidates))}
+        valeurs = candidates[dim].to_numpy()
+        lignes = candidates.index.to_numpy()
+        index[dim] = {
+            cle if isinstance(cle, tuple) else (cle,): (valeurs[positions], lignes[positions])
+            for cle, positions in groupes.items()
+        }
+    return index
+
+
+def annees_facettes(index: dict) -> list[int]:
+    """Années couvertes par l'index."""
+    return index["annees"].tolist() if index else []
+
+
+def options_facette(index: dict, periode: tuple[int, int], dim: str, *selection) -> list:
+    """Options de la liste `dim` sachant les choix faits dans les listes précédentes, sur la période."""
+    if not index or tuple(selection) not in index[dim]:
+        return []
+    valeurs, lignes = index[dim][tuple(selection)]
+    i, j = _colonnes(index, periode)
+    comptes = index["cumul"][lignes, j] - index["cumul"][lignes, i]
+    return valeurs[comptes > 0].tolist()
+
+
+def compte_facette(index: dict, periode: tuple[int, int], *selection) -> int:
+    """Nombre de lignes pour une combinaison complète (reseau, départ, arrivée, service) sur la période."""
+    ligne = index.get("lignes", {}).get(tuple(selection)) if index else None
+    if ligne is None:
+        return 0
+    i, j = _colonnes(index, periode)
+    return max(int(index["cumul"][ligne, j] - index["cumul"][ligne, i]), 0)
@@ -0,0 +1,53 @@
+# src/data/factice.py
+import numpy as np
+import pandas as pd
+
+from src.data.causes import CAUSES_COLS
+from src.data.collect_api import get_gares_coordinates
+
+
+def generer_donnees_factices(
+    nb_annees: int = 5,
+    nb_liaisons: int = 150,
+    graine: int = 0,
+) -> pd.DataFrame:
+    """
+    Jeu de données synthétique au format de l'API (une ligne par liaison et par mois),
+    pour les tests de charge sans accès réseau. À passer ensuite dans enrichir_base.
+    """
+    rng = np.random.default_rng(graine)
+    gares = np.array(sorted(set(get_gares_coordinates())))
+    mois = pd.date_range(end=pd.Timestamp.today().normalize(), periods=12 * nb_annees, freq="MS")
+
+    departs = rng.choice(gares, nb_liaisons)
+    arrivees = rng.choice(gares, nb_liaisons)
+    services = rng.choice(["National", "International"], nb_liaisons, p=[0.85, 0.15])
+
+    n = nb_liaisons * len(mois)
+    idx = np.tile(np.arange(nb_liaisons), len(mois))
+    dates = np.repeat(mois, nb_liaisons)
+
+    nb_prevu = rng.integers(50, 900, n)
+    nb_annulation = rng.binomial(nb_prevu, 0.02)
+    nb_retard_arrivee = rng.binomial(nb_prevu - nb_annulation, 0.15)
+    parts_causes = rng.dirichlet(np.ones(len(CAUSES_COLS)), n) * 100
+
+    df = pd.DataFrame({
+        "date": dates.strftime("%Y-%m"),
+        "service": services[idx],
+        "gare_depart": departs[idx],
+        "gare_arrivee": arrivees[idx],
+        "nb_train_prevu": nb_prevu,
+        "nb_annulation": nb_annulation,
+        "nb_train_depart_retard": rng.binomial(nb_prevu - nb_annulation, 0.1),
+        "retard_moyen_depart": rng.gamma(2.0, 6.0, n),
+        "nb_train_retard_arrivee": nb_retard_arrivee,
+        "retard_moyen_arrivee": rng.gamma(3.0, 9.0, n),
+        "retard_moyen_tous_trains_arrivee": rng.gamma(2.0, 3.0, n),
+        "nb_train_retard_sup_30": rng.binomial(nb_retard_arrivee, 0.2),
+    })
+    for i, c in enumerate(CAUSES_COLS):
+        df[c] = parts_causes[:, i]
+
+    df["Date"] = pd.to_datetime(df["date"], format="%Y-%m")
+    return df
@@ -0,0 +1,218 @@
+# src/data/figures.py
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Courbes du graphique temporel -> (libellé, couleur)
+COURBES = {
+    "late_rate": ("Taux de retard", '#e74c3c'),
+    "cancellation_rate": ("Taux d'annulation", '#f39c12'),
+}
+# Cartes de chaleur Année × Mois -> (colonne, titre, échelle de couleurs)
+CARTES_CHALEUR = [
+    ("late_rate", "Taux de retard (%)", "Reds"),
+    ("cancellation_rate", "Taux d'annulation (%)", "Oranges"),
+]
+COULEURS_CAUSES = {
+    'Infrastructure ferroviaire': '#D91828',
+    'Causes externes': '#8B0A1A',
+    'Gestion du trafic': '#E8744F',
+    'Matériel roulant': '#F4A582',
+    'Affluence voyageurs': '#C7D4E8',
+    'Gestion en gare': '#92A8D1',
+}
+# Parties d'un gabarit qui ne servent à aucun graphique 2D du dashboard (échelles de couleurs
+# par défaut, axes polaires / 3D / cartes...) : ~85 % des octets d'un gabarit complet
+SECTIONS_INUTILES = (
+    "colorscale", "coloraxis", "polar", "ternary", "scene", "geo", "mapbox",
+    "sliderdefaults", "updatemenudefaults",
+)
+TRANSPARENT = "rgba(0,0,0,0)"
+GRILLE = "rgba(255,255,255,0.1)"
+
+
+@lru_cache(maxsize=None)
+def gabarit_compact(nom: str, types_traces: tuple[str, ...]) -> go.layout.Template:
+    """
+    Gabarit `nom` réduit à la mise en page 2D et aux types de traces utilisés. Construit une
+    fois et partagé par toutes les figures : le gabarit complet (~7 Ko) partait dans chaque figure.
+    """
+    complet = pio.templates[nom].to_plotly_json()
+    return go.layout.Template(
+        layout={k: v for k, v in complet["layout"].items() if k not in SECTIONS_INUTILES},
+        data={t: complet["data"][t] for t in types_traces if t in complet["data"]},
+    )
+
+
+def _valeurs(serie) -> np.ndarray:
+    """Valeurs en float32 : plotly les envoie en binaire (base64), deux fois plus court qu'en float64."""
+    return np.asarray(serie, dtype=np.float32)
+
+
+def _dates(serie: pd.Series) -> np.ndarray:
+    """Dates en texte AAAA-MM-JJ (au lieu de l'horodatage complet)."""
+    return np.datetime_as_string(serie.to_numpy(dtype="datetime64[ns]"), unit="D")
+
+
+def figure_temporelle(
+    serie: pd.DataFrame,
+    granularite: str,
+    courbes: tuple[str, ...],
+    prevision: pd.DataFrame | None = None,
+) -> go.Figure:
+    """
+    Graphique temporel des `courbes` (colonnes de COURBES) à la granularité donnée,
+    série mensuelle lissée ; `prevision` ajoute les mois prévus en pointillés.
+    """
+    if granularite == 'saison':
+        axe_x, survol_x = serie['Mois'].astype(str).to_numpy(), "%{x}"
+    elif granularite == 'annee':
+        axe_x, survol_x = serie['Year'].to_numpy(), "%{x}"
+    else:
+        axe_x, survol_x = _dates(serie['Date']), "%{x|%b %Y}"
+    suffixe = '_smooth' if granularite == 'mois' else ''
+    mode_trace = 'lines' if granularite == 'mois' else 'lines+markers'
+    forme = dict(shape='spline', smoothing=1.3) if granularite == 'mois' else {}
+
+    traces = []
+    for colonne in courbes:
+        libelle, couleur = COURBES[colonne]
+        traces.append(go.Scatter(
+            x=axe_x,
+            y=_valeurs(serie[f'{colonne}{suffixe}']),
+            mode=mode_trace,
+            name=f'{libelle} (%)',
+            line=dict(color=couleur, width=2.5, **forme),
+            hovertemplate=f"<b>{libelle}</b><br>Date: {survol_x}<br>Valeur: %{{y:.2f}}%<extra></extra>"
+        ))
+    if prevision is not None and not prevision.empty:
+        for colonne in courbes:
+            libelle, couleur = COURBES[colonne]
+            nom = f"{libelle} prévu (%)"
+            traces.append(go.Scatter(
+                x=_dates(prevision['Date']),
+                y=_valeurs(prevision[colonne]),
+                mode='lines+markers',
+                name=nom,
+                line=dict(color=couleur, width=2, dash='dash'),
+                hovertemplate=f"<b>{nom}</b><br>Date: %{{x|%b %Y}}<br>Valeur: %{{y:.2f}}%<extra></extra>"
+            ))
+
+    xaxis = dict(gridcolor=GRILLE)
+    if granularite in ('mois', 'trimestre'):
+        xaxis.update(tickangle=45, dtick="M3", tickformat="%b %Y")
+    elif granularite == 'annee':
+        xaxis.update(dtick=1)
+    return go.Figure(data=traces, layout=dict(
+        title=dict(
+            text="Évolution temporelle des métriques", font=dict(size=18, color="#F2F2F2"), x=0.5, xanchor='center'
+        ),
+        xaxis=xaxis,
+        yaxis=dict(title="Taux (%)", gridcolor=GRILLE),
+        hovermode='x unified',
+        template=gabarit_compact("plotly_dark", ("scatter",)),
+        height=500,
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, bgcolor="rgba(0,0,0,0.3)"),
+        margin=dict(t=80, b=40, l=60, r=60),
+        plot_bgcolor=TRANSPARENT,
+        paper_bgcolor=TRANSPARENT,
+    ))
+
+
+def figure_chaleur(tableau: pd.DataFrame, titre: str, echelle: str) -> go.Figure:
+    """Carte de chaleur Année × Mois d'un taux (cf. carte_chaleur), valeurs affichées dans les cases."""
+    return go.Figure(
+        data=go.Heatmap(
+            z=_valeurs(tableau.to_numpy(dtype=float)),
+            x=[str(c) for c in tableau.columns],
+            y=tableau.index.to_numpy(),
+            coloraxis="coloraxis",
+            texttemplate="%{z:.1f}",
+            hovertemplate="%{x} %{y}<br>%{z:.1f} %<extra></extra>",
+        ),
+        layout=dict(
+            title=dict(text=titre, font=dict(size=16, color="#F2F2F2"), x=0.5, xanchor='center'),
+            coloraxis=dict(colorscale=echelle, colorbar=dict(title="%")),
+            xaxis=dict(title=""),
+            yaxis=dict(title="", autorange="reversed", dtick=1),
+            template=gabarit_compact("plotly_dark", ("heatmap",)),
+            height=350,
+            margin=dict(t=60, b=20, l=40, r=20),
+            plot_bgcolor=TRANSPARENT,
+            paper_bgcolor=TRANSPARENT,
+        ),
+    )
+
+
+def _titre_causes(texte: str) -> dict:
+    return {
+        'text': texte,
+        'font': dict(size=22, color="#FFFFFF", family="Arial Black"),
+        'x': 0.5,
+        'xanchor': 'center',
+        'y': 0.98,
+        'yanchor': 'top',
+    }
+
+
+def figures_causes(causes: pd.DataFrame) -> tuple[go.Figure, go.Figure]:
+    """Camembert des parts de causes et barres du retard moyen par cause (mêmes couleurs)."""
+    # gabarit par défaut (thème Streamlit quand l'app tourne), allégé lui aussi
+    gabarit = pio.templates.default
+
+    fig_pie = go.Figure(
+        data=go.Pie(
+            labels=causes['Cause'].tolist(),
+            values=_valeurs(causes['Pourcentage']),
+            hole=0.4,
+            textposition='outside',
+            textinfo="label+percent",
+            textfont_size=13,
+            hovertemplate="<b>%{label}</b><br>Part: %{percent}<extra></extra>",
+            marker=dict(
+                colors=[COULEURS_CAUSES.get(c, '#CCCCCC') for c in causes['Cause']],
+                line=dict(color='#ffffff', width=2),
+            ),
+        ),
+        layout=dict(
+            title=_titre_causes("Répartition des causes (%)"),
+            template=gabarit_compact(gabarit, ("pie",)),
+            showlegend=False,
+            height=550,
+            width=900,
+            margin=dict(l=100, r=100, t=80, b=50),
+            paper_bgcolor=TRANSPARENT,
+            plot_bgcolor=TRANSPARENT,
+        ),
+    )
+
+    barres = causes.sort_values('Retard_moyen', ascending=False)
+    axe = dict(title_font=dict(size=14, color="#E0E0E0"), tickfont=dict(size=11, color="#E0E0E0"))
+    fig_bar = go.Figure(
+        data=go.Bar(
+            x=barres['Cause'].tolist(),
+            y=_valeurs(barres['Retard_moyen']),
+            texttemplate="%{y:.1f} min",
+            textposition="outside",
+            hovertemplate="<b>%{x}</b><br>Retard moyen: %{y:.1f} min<extra></extra>",
+            marker=dict(
+                color=[COULEURS_CAUSES.get(c, '#CCCCCC') for c in barres['Cause']],
+                line=dict(color='#ffffff', width=1.5),
+            ),
+        ),
+        layout=dict(
+            title=_titre_causes("Retard moyen par cause"),
+            template=gabarit_compact(gabarit, ("bar",)),
+            xaxis=dict(title="Cause", **axe),
+            yaxis=dict(title="Retard moyen (min)", **axe),
+            height=500,
+            paper_bgcolor=TRANSPARENT,
+            plot_bgcolor=TRANSPARENT,
+            margin=dict(l=40, r=40, t=80, b=100),
+        ),
+    )
+    return fig_pie, fig_bar
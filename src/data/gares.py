@@ -0,0 +1,113 @@
+# src/data/gares.py
+import numpy as np
+import pandas as pd
+
+from src.data.collect_api import get_gares_coordinates, trouver_coordonnees
+from src.data.groupes import diviser, indexer_groupes, somme_par_groupe
+
+# Rôle d'une gare sur une liaison -> (colonne de la gare, trains en retard, retard moyen des trains en retard)
+ROLES = {
+    "depart": ("gare_depart", "nb_train_depart_retard", "retard_moyen_depart"),
+    "arrivee": ("gare_arrivee", "nb_train_retard_arrivee", "retard_moyen_arrivee"),
+}
+LIBELLES_ROLES = {"depart": "Départs", "arrivee": "Arrivées", "ensemble": "Départs + arrivées"}
+COLONNES_GARES = ["nb_train_prevu", "nb_annulation", "nb_train_retard", "minutes_retard", "poids_retard"]
+RAYON_TERRE_KM = 6371.0
+
+
+def _colonne(df: pd.DataFrame, nom: str) -> np.ndarray:
+    if nom in df.columns:
+        return df[nom].to_numpy(dtype=float)
+    return np.full(len(df), np.nan)
+
+
+def composantes_gares(
+    df: pd.DataFrame,
+    par: list[str] | None = None,
+    dropna: bool = True,
+) -> pd.DataFrame:
+    """
+    Sommes additives par gare : chaque ligne compte une fois pour sa gare de départ
+    (role="depart") et une fois pour sa gare d'arrivée (role="arrivee").
+    `par` peut combiner les colonnes de la base et "role" / "gare".
+    Le retard moyen est pondéré par le nombre de trains en retard (minutes_retard / poids_retard).
+    """
+    cles = [c for c in (par or []) if c in df.columns]
+    roles = []
+    for role, (col_gare, col_retards, col_retard_moyen) in ROLES.items():
+        retards = np.nan_to_num(_colonne(df, col_retards))
+        retard_moyen = _colonne(df, col_retard_moyen)
+        roles.append(
+            df[cles].assign(
+                role=role,
+                gare=df[col_gare].to_numpy(),
+                nb_train_prevu=_colonne(df, "nb_train_prevu"),
+                nb_annulation=_colonne(df, "nb_annulation"),
+                nb_train_retard=retards,
+                minutes_retard=retard_moyen * retards,
+                poids_retard=np.where(np.isnan(retard_moyen), 0.0, retards),
+            )
+        )
+    empile = pd.concat(roles, ignore_index=True)
+
+    codes, comp = indexer_groupes(empile, par, dropna=dropna)
+    for c in COLONNES_GARES:
+        comp[c] = somme_par_groupe(codes, len(comp), empile[c])
+    return comp
+
+
+def coordonnees_gares(gares) -> pd.DataFrame:
+    """Coordonnées de chaque gare distincte (recherchées une seule fois), gares inconnues exclues."""
+    gares_coords = get_gares_coordinates()
+    lignes = []
+    for gare in pd.unique(pd.Series(gares).dropna()):
+        coords = trouver_coordonnees(gare, gares_coords)
+        if coords:
+            lignes.append((gare, coords[0], coords[1]))
+    return pd.DataFrame(lignes, columns=["gare", "lat", "lon"])
+
+
+def matrice_distances(lat, lon) -> np.ndarray:
+    """Distances orthodromiques (km) entre tous les couples de points : haversine vectorisée, (n, n)."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * RAYON_TERRE_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distances_gares(coordonnees: pd.DataFrame) -> pd.DataFrame:
+    """
+    Distance à vol d'oiseau entre chaque couple (ordonné) de gares géolocalisées, calculée
+    d'un bloc sur la table des coordonnées : gare_depart, gare_arrivee, distance_km.
+    """
+    matrice = matrice_distances(coordonnees["lat"], coordonnees["lon"])
+    gares = coordonnees["gare"].to_numpy()
+    i, j = np.nonzero(~np.eye(len(gares), dtype=bool))
+    return pd.DataFrame({"gare_depart": gares[i], "gare_arrivee": gares[j], "distance_km": matrice[i, j]})
+
+
+def finaliser_gares(
+    comp: pd.DataFrame,
+    par: list[str] | None = None,
+    coordonnees: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Indicateurs par gare pour chaque rôle, plus le rôle "ensemble" (départs + arrivées) :
+    trains, retards, annulations, taux (%) et retard moyen pondéré. Ajoute lat / lon si
+    `coordonnees` est fourni (NaN pour les gares non géolocalisées).
+    """
+    par = par or []
+    par_role = comp.groupby(par + ["gare", "role"], sort=True)[COLONNES_GARES].sum().reset_index()
+    ensemble = par_role.groupby(par + ["gare"], sort=True)[COLONNES_GARES].sum().reset_index()
+    ensemble.insert(len(par) + 1, "role", "ensemble")
+
+    gares = pd.concat([par_role, ensemble], ignore_index=True)
+    gares["taux_retard"] = diviser(gares["nb_train_retard"] * 100, gares["nb_train_prevu"])
+    gares["taux_annulation"] = diviser(gares["nb_annulation"] * 100, gares["nb_train_prevu"])
+    gares["retard_moyen"] = diviser(gares["minutes_retard"], gares["poids_retard"])
+    if coordonnees is not None:
+        # une colonne de gares entièrement vide (TER seul) revient du groupby en float
+        gares = gares.astype({"gare": object}).merge(coordonnees, on="gare", how="left")
+    return gares
@@ -0,0 +1,55 @@
+# src/data/groupes.py
+import numpy as np
+import pandas as pd
+
+
+def indexer_groupes(
+    df: pd.DataFrame,
+    par: list[str] | None = None,
+    dropna: bool = True,
+) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    Code chaque ligne par son groupe (0..n-1) et renvoie les clés uniques.
+    Avec dropna=True, les lignes dont une clé est manquante reçoivent le code -1.
+    """
+    if not par:
+        return np.zeros(len(df), dtype=np.intp), pd.DataFrame(index=[0])
+
+    grouper = df.groupby(par, sort=True, dropna=dropna)
+    codes = grouper.ngroup().fillna(-1).to_numpy(dtype=np.intp)
+    cles = grouper.size().index.to_frame(index=False)
+    return codes, cles
+
+
+def somme_par_groupe(codes: np.ndarray, nb_groupes: int, valeurs) -> np.ndarray:
+    """Somme par groupe (les NaN comptent pour 0)."""
+    valeurs = np.asarray(valeurs, dtype=float)
+    masque = codes >= 0
+    return np.bincount(
+        codes[masque],
+        weights=np.nan_to_num(valeurs[masque]),
+        minlength=nb_groupes,
+    )
+
+
+def compte_par_groupe(codes: np.ndarray, nb_groupes: int, valeurs) -> np.ndarray:
+    """Nombre de valeurs non manquantes par groupe."""
+    valeurs = np.asarray(valeurs, dtype=float)
+    masque = (codes >= 0) & ~np.isnan(valeurs)
+    return np.bincount(codes[masque], minlength=nb_groupes).astype(float)
+
+
+def moyenne_par_groupe(codes: np.ndarray, nb_groupes: int, valeurs) -> np.ndarray:
+    """Moyenne par groupe en ignorant les NaN (NaN si le groupe est vide)."""
+    sommes = somme_par_groupe(codes, nb_groupes, valeurs)
+    comptes = compte_par_groupe(codes, nb_groupes, valeurs)
+    return diviser(sommes, comptes)
+
+
+def diviser(numerateur, denominateur, defaut: float = np.nan) -> np.ndarray:
+    """Division élément par élément, `defaut` là où le dénominateur est nul."""
+    numerateur = np.asarray(numerateur, dtype=float)
+    denominateur = np.asarray(denominateur, dtype=float)
+    resultat = np.full(np.broadcast(numerateur, denominateur).shape, defaut, dtype=float)
+    np.divide(numerateur, denominateur, out=resultat, where=denominateur > 0)
+    return resultat
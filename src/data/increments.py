@@ -0,0 +1,39 @@
+# src/data/increments.py
+import numpy as np
+import pandas as pd
+
+SEUIL_RECONSTRUCTION = 0.5  # au-delà de cette part de lignes modifiées, tout recalculer coûte autant
+
+
+def empreintes_lignes(df: pd.DataFrame, colonnes: list[str] | None = None) -> pd.Series:
+    """Empreinte 64 bits de chaque ligne (sur `colonnes`, toutes par défaut)."""
+    return pd.util.hash_pandas_object(df[colonnes] if colonnes else df, index=False)
+
+
+def differences_lignes(df: pd.DataFrame, anciennes: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame] | None:
+    """
+    (lignes nouvelles ou révisées de `df`, lignes de `anciennes` révisées ou disparues),
+    par empreinte de ligne. None si les deux bases n'ont pas les mêmes colonnes.
+    """
+    if list(df.columns) != list(anciennes.columns):
+        return None
+    anciennes = anciennes.astype(df.dtypes.to_dict())
+    empreintes = empreintes_lignes(df)
+    empreintes_anciennes = empreintes_lignes(anciennes)
+    return (
+        df[~empreintes.isin(empreintes_anciennes).to_numpy()],
+        anciennes[~empreintes_anciennes.isin(empreintes).to_numpy()],
+    )
+
+
+def cellules_touchees(table: pd.DataFrame, cles: list[str], modifiees: pd.DataFrame) -> np.ndarray:
+    """Masque des lignes de `table` dont les clés `cles` sont celles d'une ligne modifiée."""
+    table = table[cles].astype(modifiees[cles].dtypes.to_dict())
+    # tri grossier sur les clés numériques (Year, Month : rapide), empreinte complète sur le reste
+    numeriques = [c for c in cles if pd.api.types.is_numeric_dtype(table[c])]
+    masque = np.ones(len(table), dtype=bool)
+    if numeriques:
+        masque = empreintes_lignes(table, numeriques).isin(empreintes_lignes(modifiees, numeriques)).to_numpy()
+    candidates = np.flatnonzero(masque)
+    masque[candidates] = empreintes_lignes(table.iloc[candidates]).isin(empreintes_lignes(modifiees, cles)).to_numpy()
+    return masque
@@ -0,0 +1,69 @@
+# src/data/kpi.py
+import numpy as np
+import pandas as pd
+
+from src.data.groupes import (
+    compte_par_groupe,
+    diviser,
+    indexer_groupes,
+    moyenne_par_groupe,
+    somme_par_groupe,
+)
+
+CAUSES_LABELS = {
+    "prct_cause_infra": "Infrastructure",
+    "prct_cause_externe": "Externes",
+    "prct_cause_gestion_trafic": "Trafic",
+    "prct_cause_materiel_roulant": "Matériel",
+    "prct_cause_gestion_gare": "Gare",
+    "prct_cause_prise_en_charge_voyageurs": "Affluence",
+}
+
+
+def calculer_kpis(df: pd.DataFrame, par: list[str] | None = None) -> pd.DataFrame:
+    """
+    Calcule les indicateurs des cartes KPI pour chaque groupe de `par`
+    (ex: ["Year"], ["gare_depart"], ["Year", "Month"]) en une seule passe.
+    Sans `par`, renvoie une seule ligne pour tout le frame.
+    """
+    codes, kpis = indexer_groupes(df, par)
+    n = len(kpis)
+
+    def colonne(nom):
+        if nom in df.columns:
+            return df[nom].to_numpy(dtype=float)
+        return np.full(len(df), np.nan)
+
+    kpis["nb_lignes"] = np.bincount(codes[codes >= 0], minlength=n)
+    kpis["retard_moyen"] = moyenne_par_groupe(codes, n, colonne("retard_moyen_tous_trains_arrivee"))
+
+    nb_prevus = somme_par_groupe(codes, n, colonne("nb_train_prevu"))
+    sup_30 = colonne("nb_train_retard_sup_30")
+    nb_sup_30 = somme_par_groupe(codes, n, sup_30)
+    kpis["nb_train_prevu"] = nb_prevus
+    kpis["nb_train_retard_sup_30"] = nb_sup_30
+    # NaN quand aucune ligne du groupe ne publie la mesure (ex. TER) : inconnu, pas 0 %
+    kpis["taux_retard_sup_30"] = np.where(
+        compte_par_groupe(codes, n, sup_30) > 0, diviser(nb_sup_30 * 100, nb_prevus, defaut=0.0), np.nan
+    )
+    kpis["un_sur_x"] = np.floor(diviser(nb_prevus, nb_sup_30, defaut=0.0)).astype(int)
+
+    # Part moyenne de chaque cause, puis cause dominante par argmax sur les colonnes
+    parts = np.column_stack([moyenne_par_groupe(codes, n, colonne(c)) for c in CAUSES_LABELS])
+    for i, c in enumerate(CAUSES_LABELS):
+        kpis[c] = parts[:, i]
+
+    idx = np.argmax(np.where(np.isnan(parts), -np.inf, parts), axis=1)
+    connue = ~np.isnan(parts).all(axis=1)
+    kpis["cause_principale"] = np.where(connue, np.array(list(CAUSES_LABELS.values()), dtype=object)[idx], None)
+    kpis["cause_principale_col"] = np.array(list(CAUSES_LABELS))[idx]
+    kpis["valeur_cause_principale"] = parts[np.arange(n), idx]
+
+    return kpis
+
+
+def evolution_pct(courant, precedent):
+    """Évolution en % de `precedent` vers `courant` (0 si la référence n'est pas > 0)."""
+    courant = np.asarray(courant, dtype=float)
+    precedent = np.asarray(precedent, dtype=float)
+    return np.nan_to_num(diviser((courant - precedent) * 100, precedent, defaut=0.0))
@@ -0,0 +1,216 @@
+# src/data/pipeline.py
+import time
+
+import pandas as pd
+
+from src.data.aggregats import (
+    AGREGATS_ADDITIFS,
+    construire_aggregats_par_lots,
+    mettre_a_jour_aggregats,
+)
+from src.data.anomalies import mettre_a_jour_anomalies
+from src.data.collect_api import (
+    DATASETS,
+    charger_etat_collecte,
+    reseaux_actifs,
+    sauver_etat_collecte,
+    telecharger_reseaux,
+    verifier_modification,
+)
+from src.data.collect_local import empreinte_sources, importer_fichiers, sources_locales
+from src.data.increments import SEUIL_RECONSTRUCTION, differences_lignes
+from src.data.previsions import calculer_previsions
+from src.data.snapshot import (
+    FORMAT_SNAPSHOT,
+    en_pandas,
+    marquer_verifie,
+    ouvrir_snapshot,
+    publier_snapshot,
+    version_donnees,
+    versions_publiees,
+)
+from src.data.store import ecrire_store, lire_store, nettoyer_store, ouvrir_store
+from src.data.transform import enrichir_base
+from src.data.vue_defaut import calculer_vue_defaut
+
+DUREE_VALIDITE_SNAPSHOT = 24 * 3600  # secondes
+
+
+def _meme_perimetre(snap: dict | None, nb_annees: int, reseaux: list[str]) -> bool:
+    return (
+        snap is not None
+        and snap["meta"].get("nb_annees") == nb_annees
+        and snap["meta"].get("reseaux") == reseaux
+    )
+
+
+def publier_donnees(df: pd.DataFrame, nb_annees: int, reseaux: list[str], meta: dict | None = None) -> str:
+    """
+    Écrit le store partitionné de la nouvelle version, en tire les agrégats,
+    précalcule la vue par défaut, les scores d'anomalie et les prévisions (repartant
+    de l'état de la version courante), et publie le tout dans un snapshot.
+    Quand la version courante s'y prête, seules les lignes qui ont changé depuis
+    (en général un nouveau mois) sont réécrites dans le store et réagrégées.
+    """
+    courant = ouvrir_snapshot()
+    version = version_donnees(df)
+    increment = _increment(courant, df)
+    if increment is None:
+        ecrire_store(df, version)
+        aggregats = construire_aggregats_par_lots(version)
+    else:
+        modifiees, precedents, infos = increment
+        ecrire_store(df, version, modifiees=modifiees, depuis=courant["meta"]["store"])
+        aggregats = mettre_a_jour_aggregats(precedents, df, modifiees)
+        meta = {**(meta or {}), "increment": infos}
+    aggregats.update(mettre_a_jour_anomalies(df, _tables_precedentes(courant, ["anomalies", "references"])))
+    aggregats.update(calculer_previsions(aggregats["trafic"], _tables_precedentes(courant, ["modeles"])))
+    version = publier_snapshot(
+        df,
+        aggregats,
+        meta={"nb_annees": nb_annees, "reseaux": reseaux, "store": version, **(meta or {})},
+        vue_defaut=calculer_vue_defaut(df, aggregats),
+    )
+    nettoyer_store(garder=versions_publiees())
+    return version
+
+
+def _increment(courant: dict | None, df: pd.DataFrame) -> tuple[pd.DataFrame, dict, dict] | None:
+    """
+    (lignes modifiées, agrégats de la version courante, résumé) pour une mise à jour
+    incrémentale ; None s'il faut tout reconstruire : pas de version courante, format
+    de snapshot différent, store désynchronisé, colonnes changées ou trop de lignes modifiées.
+    """
+    noms = list(AGREGATS_ADDITIFS) + ["coordonnees", "distances"]
+    if courant is None or courant["meta"].get("format") != FORMAT_SNAPSHOT:
+        return None
+    precedents = _tables_precedentes(courant, noms)
+    store = ouvrir_store(courant["meta"].get("store"))
+    if precedents is None or store is None or store.count_rows() != courant["donnees"].num_rows:
+        return None
+
+    differences = differences_lignes(df, en_pandas(courant["donnees"]))
+    if differences is None:
+        return None
+    ajouts, retraits = differences
+    if len(ajouts) + len(retraits) > SEUIL_RECONSTRUCTION * len(df):
+        return None
+    infos = {"depuis": courant["version"], "lignes_ajoutees": len(ajouts), "lignes_retirees": len(retraits)}
+    return pd.concat([ajouts, retraits], ignore_index=True), precedents, infos
+
+
+def _tables_precedentes(snap: dict | None, noms: list[str]) -> dict[str, pd.DataFrame] | None:
+    """Tables de la version publiée dont repart un calcul incrémental (None si absente ou trop ancienne)."""
+    if snap is None or not set(noms) <= set(snap["aggregats"]):
+        return None
+    return {nom: en_pandas(snap["aggregats"][nom]) for nom in noms}
+
+
+def _comme_publie(anciens: pd.DataFrame, snap: dict) -> pd.DataFrame:
+    """
+    Lignes relues dans le store remises dans l'ordre des colonnes et les types de la base
+    publiée (le store rend reseau / Year / service en dernier, Year en int64), sans quoi la
+    comparaison ligne à ligne de la publication suivante échoue et tout est reconstruit.
+    """
+    if anciens.empty:
+        return anciens
+    modele = snap["donnees"].schema.empty_table().to_pandas()
+    if set(anciens.columns) != set(modele.columns):
+        return anciens
+    return anciens[list(modele.columns)].astype(modele.dtypes.to_dict())
+
+
+def construire_snapshot(nb_annees: int = 5, forcer: bool = False) -> str | None:
+    """
+    Télécharge les réseaux republiés depuis la dernière collecte, réutilise le store
+    pour les autres, écrit le store partitionné, précalcule les agrégats et publie.
+    Si aucun réseau n'a bougé, rien n'est téléchargé ni recalculé.
+    Avec SNCF_FICHIERS_LOCAUX, les fichiers locaux remplacent l'API (cf. construire_snapshot_local).
+    """
+    sources = sources_locales()
+    if sources:
+        return construire_snapshot_local(nb_annees, sources, forcer)
+
+    reseaux = reseaux_actifs()
+    etat = charger_etat_collecte()
+    verifications = {r: verifier_modification(DATASETS[r]["dataset"], etat.get(r)) for r in reseaux}
+    inchanges = [r for r, (modifie, _) in verifications.items() if not modifie]
+
+    snap = ouvrir_snapshot()
+    store = snap["meta"].get("store") if snap is not None else None
+    reutilisable = not forcer and _meme_perimetre(snap, nb_annees, reseaux) and ouvrir_store(store) is not None
+    if reutilisable and len(inchanges) == len(reseaux):
+        marquer_verifie(snap["version"])
+        return snap["version"]
+
+    a_telecharger = [r for r in reseaux if not (reutilisable and r in inchanges)]
+    nouveaux = telecharger_reseaux(nb_annees=nb_annees, reseaux=a_telecharger)
+    recuperes = set(nouveaux["reseau"].unique()) if not nouveaux.empty else set()
+    if not recuperes and snap is not None:
+        return None  # API injoignable : l'ancien snapshot reste servi
+
+    # réseaux inchangés, ou dont le téléchargement a échoué : on reprend le store
+    a_reprendre = [r for r in reseaux if r not in recuperes]
+    anciens = _comme_publie(lire_store(store, reseaux=a_reprendre), snap) if a_reprendre else pd.DataFrame()
+
+    frames = [f for f in (anciens, nouveaux) if not f.empty]
+    if not frames:
+        return None
+    df = enrichir_base(pd.concat(frames, ignore_index=True))
+    version = publier_donnees(df, nb_annees, reseaux)
+
+    # les réseaux repris du store faute de téléchargement restent à revérifier
+    a_jour = recuperes | (set(inchanges) if reutilisable else set())
+    etat.update({r: nouvel for r, (_, nouvel) in verifications.items() if r in a_jour})
+    sauver_etat_collecte(etat)
+    return version
+
+
+def construire_snapshot_local(nb_annees: int, sources: dict, forcer: bool = False) -> str | None:
+    """
+    Importe les fichiers d'export locaux (machines sans réseau) et publie.
+    Tant qu'aucun fichier n'a changé (empreinte taille + date), le snapshot existant est gardé.
+    """
+    empreinte = empreinte_sources(sources)
+    snap = ouvrir_snapshot()
+    if not forcer and snap is not None and not _sources_changees(snap, nb_annees, empreinte):
+        marquer_verifie(snap["version"])
+        return snap["version"]
+
+    df = importer_fichiers(nb_annees, sources)
+    if df.empty:
+        return None
+    version = publier_donnees(enrichir_base(df), nb_annees, list(sources), meta={"sources": empreinte})
+    # fichier réécrit à l'identique : même version, déjà publiée, dont l'empreinte est à rafraîchir
+    marquer_verifie(version, sources=empreinte)
+    return version
+
+
+def _sources_changees(snap: dict, nb_annees: int, empreinte: str) -> bool:
+    return snap["meta"].get("nb_annees") != nb_annees or snap["meta"].get("sources") != empreinte
+
+
+def snapshot_perime(snap: dict, nb_annees: int, duree_validite: float = DUREE_VALIDITE_SNAPSHOT) -> bool:
+    sources = sources_locales()
+    if sources:
+        # fichiers locaux : rien à revérifier périodiquement, seul un fichier modifié compte
+        return _sources_changees(snap, nb_annees, empreinte_sources(sources))
+
+    meta = snap["meta"]
+    derniere_verification = max(meta["cree_le"], meta.get("verifie_le", 0))
+    return (
+        not _meme_perimetre(snap, nb_annees, reseaux_actifs())
+        or time.time() - derniere_verification > duree_validite
+    )
+
+
+def obtenir_snapshot(nb_annees: int = 5, duree_validite: float = DUREE_VALIDITE_SNAPSHOT) -> dict | None:
+    """
+    Snapshot courant, reconstruit s'il manque ou s'il est périmé.
+    Si l'API ne répond pas, on garde l'ancien snapshot plutôt que rien.
+    """
+    snap = ouvrir_snapshot()
+    a_reconstruire = snap is None or snapshot_perime(snap, nb_annees, duree_validite)
+    if a_reconstruire and construire_snapshot(nb_annees) is not None:
+        snap = ouvrir_snapshot()
+    return snap
@@ -0,0 +1,175 @@
+# src/data/previsions.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+
+from src.data.aggregats import metriques_mensuelles
+
+HORIZON_PREVISION = 6  # mois prévus après le dernier mois connu
+FENETRE_AJUSTEMENT = 36  # derniers mois utilisés pour ajuster chaque série
+MIN_MOIS_PREVISION = 12  # en dessous, pas de prévision
+NB_HARMONIQUES = 2  # saisonnalité annuelle (sin / cos)
+ALPHA_RIDGE = 1.0
+# À incrémenter quand le modèle change : les modèles en cache ne sont alors plus réutilisés
+VERSION_MODELE = 1
+
+CIBLES = ["late_rate", "cancellation_rate"]
+# Séries prévues : ensemble, départs d'une gare, liaison (mêmes combinaisons que les filtres de gares)
+NIVEAUX = {"ensemble": [], "gare": ["gare_depart"], "liaison": ["gare_depart", "gare_arrivee"]}
+CLES_SERIE = ["niveau", "gare_depart", "gare_arrivee"]
+NB_COEFFS = 2 + 2 * NB_HARMONIQUES  # niveau, pente, harmoniques
+TAILLE_LOT_SERIES = 250  # séries envoyées à la fois à un process
+MIN_SERIES_PARALLELE = 3000  # ~1 ms par série : en dessous, démarrer les process coûte plus que d'ajuster sur place
+
+
+def series_mensuelles(trafic: pd.DataFrame) -> pd.DataFrame:
+    """
+    Séries mensuelles (late_rate, cancellation_rate) de chaque niveau, depuis les cellules
+    de trafic, tous services et réseaux confondus ; "Toutes" pour les gares non fixées.
+    """
+    series = []
+    for niveau, par in NIVEAUX.items():
+        metriques = metriques_mensuelles(trafic.dropna(subset=par), par=par or None)
+        if metriques.empty:
+            continue
+        metriques.insert(0, "niveau", niveau)
+        for c in ("gare_depart", "gare_arrivee"):
+            if c not in par:
+                metriques[c] = "Toutes"
+        series.append(metriques[CLES_SERIE + ["Year", "Month"] + CIBLES])
+    if not series:
+        return pd.DataFrame(columns=CLES_SERIE + ["Year", "Month"] + CIBLES)
+    series = pd.concat(series, ignore_index=True)
+    series["t"] = series["Year"] * 12 + series["Month"] - 1  # mois absolu
+    return series
+
+
+def _conception(t: np.ndarray) -> np.ndarray:
+    """Variables du modèle : temps (en mois depuis le dernier mois connu) et harmoniques annuelles."""
+    colonnes = [t]
+    for k in range(1, NB_HARMONIQUES + 1):
+        angle = 2 * np.pi * k * (t % 12) / 12
+        colonnes += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(colonnes)
+
+
+def ajuster_lot(lot: list[tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    """
+    Ajuste un petit modèle par série (Ridge : tendance + saisonnalité, les deux cibles ensemble).
+    `lot` : [(t relatif au dernier mois, valeurs (n, 2))]. Renvoie les coefficients (nb_series, 2, NB_COEFFS).
+    """
+    coeffs = np.empty((len(lot), len(CIBLES), NB_COEFFS))
+    for i, (t, y) in enumerate(lot):
+        modele = Ridge(alpha=ALPHA_RIDGE).fit(_conception(t), y)
+        coeffs[i, :, 0] = modele.intercept_
+        coeffs[i, :, 1:] = modele.coef_
+    return coeffs
+
+
+def _empreintes(series: pd.DataFrame) -> pd.Series:
+    """Empreinte de l'historique de chaque série (mois + valeurs)."""
+    lignes = pd.util.hash_pandas_object(series[["t"] + CIBLES], index=False)
+    return lignes.groupby([series[c] for c in CLES_SERIE], sort=False).sum()
+
+
+def ajuster_series(
+    series: pd.DataFrame,
+    precedents: pd.DataFrame | None = None,
+    nb_process: int | None = None,
+) -> pd.DataFrame:
+    """
+    Un modèle par série, ajusté en parallèle sur un pool de process. Les séries dont
+    l'historique n'a pas bougé depuis la version précédente (même empreinte) reprennent
+    leurs coefficients sans réajustement.
+    """
+    series = series[series.groupby(CLES_SERIE, sort=False)["t"].transform("size") >= MIN_MOIS_PREVISION]
+    series = series.sort_values(CLES_SERIE + ["t"])
+    series = series[series.groupby(CLES_SERIE, sort=False).cumcount(ascending=False) < FENETRE_AJUSTEMENT]
+    if series.empty:
+        return pd.DataFrame()
+
+    empreintes = _empreintes(series)
+    modeles = empreintes.index.to_frame(index=False)
+    modeles["empreinte"] = empreintes.to_numpy()
+    groupes = series.groupby(CLES_SERIE, sort=False)
+    modeles["dernier_t"] = groupes["t"].max().to_numpy()
+    coeffs = np.full((len(modeles), len(CIBLES), NB_COEFFS), np.nan)
+
+    if precedents is not None and not precedents.empty and (precedents["version_modele"] == VERSION_MODELE).all():
+        repris = modeles[CLES_SERIE + ["empreinte"]].merge(precedents, on=CLES_SERIE + ["empreinte"], how="left")
+        colonnes = [f"{c}_{j}" for c in CIBLES for j in range(NB_COEFFS)]
+        coeffs = repris[colonnes].to_numpy(dtype=float).reshape(len(modeles), len(CIBLES), NB_COEFFS)
+
+    a_ajuster = np.flatnonzero(np.isnan(coeffs).any(axis=(1, 2)))
+    if len(a_ajuster):
+        positions = np.split(np.arange(len(series)), np.cumsum(groupes.size().to_numpy())[:-1])
+        t = series["t"].to_numpy()
+        y = series[CIBLES].to_numpy(dtype=float)
+        dernier = modeles["dernier_t"].to_numpy()
+        taches = [(t[positions[i]] - dernier[i], y[positions[i]]) for i in a_ajuster]
+        coeffs[a_ajuster] = _ajuster_en_parallele(taches, nb_process)
+
+    for i, c in enumerate(CIBLES):
+        for j in range(NB_COEFFS):
+            modeles[f"{c}_{j}"] = coeffs[:, i, j]
+    modeles["version_modele"] = VERSION_MODELE
+    return modeles
+
+
+def _ajuster_en_parallele(taches: list, nb_process: int | None = None) -> np.ndarray:
+    """Répartit les séries par lots sur un pool de process (sur place s'il y en a peu)."""
+    nb_process = nb_process or os.cpu_count() or 1
+    if nb_process == 1 or len(taches) < MIN_SERIES_PARALLELE:
+        return ajuster_lot(taches)
+    lots = [taches[i:i + TAILLE_LOT_SERIES] for i in range(0, len(taches), TAILLE_LOT_SERIES)]
+    # spawn : la publication peut tourner dans un thread de Streamlit, un fork y serait risqué
+    contexte = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=min(nb_process, len(lots)), mp_context=contexte) as pool:
+            return np.concatenate(list(pool.map(ajuster_lot, lots)))
+    except BrokenProcessPool:
+        # process impossibles à démarrer (ex. __main__ non réimportable) : ajustement sur place
+        return ajuster_lot(taches)
+
+
+def prevoir(modeles: pd.DataFrame, horizon: int = HORIZON_PREVISION) -> pd.DataFrame:
+    """Prévisions des `horizon` mois suivant le dernier mois connu de chaque série (taux bornés à [0, 100])."""
+    if modeles.empty:
+        return pd.DataFrame(columns=CLES_SERIE + ["Date"] + CIBLES)
+    pas = np.arange(1, horizon + 1)
+    t = (modeles["dernier_t"].to_numpy()[:, None] + pas).ravel()
+    conception = np.column_stack([np.ones(len(t)), _conception(np.tile(pas, len(modeles)))])
+
+    previsions = modeles.loc[modeles.index.repeat(horizon), CLES_SERIE].reset_index(drop=True)
+    previsions["Date"] = pd.to_datetime(pd.DataFrame({"year": t // 12, "month": t % 12 + 1, "day": 1}))
+    for c in CIBLES:
+        coeffs = modeles[[f"{c}_{j}" for j in range(NB_COEFFS)]].to_numpy(dtype=float)
+        valeurs = np.einsum("ij,ij->i", conception, np.repeat(coeffs, horizon, axis=0))
+        previsions[c] = np.clip(valeurs, 0.0, 100.0)
+    return previsions
+
+
+def calculer_previsions(
+    trafic: pd.DataFrame,
+    precedent: dict[str, pd.DataFrame] | None = None,
+    nb_process: int | None = None,
+) -> dict[str, pd.DataFrame]:
+    """Modèles et prévisions de toutes les séries, à publier avec la version des données."""
+    modeles = ajuster_series(series_mensuelles(trafic), (precedent or {}).get("modeles"), nb_process)
+    return {"modeles": modeles, "previsions": prevoir(modeles)}
+
+
+def prevision_serie(previsions: pd.DataFrame, gare_depart: str = "Toutes", gare_arrivee: str = "Toutes") -> pd.DataFrame:
+    """Prévision de la série qui correspond aux filtres de gares (vide si aucune)."""
+    niveau = "ensemble" if gare_depart == "Toutes" else "gare" if gare_arrivee == "Toutes" else "liaison"
+    masque = (
+        (previsions["niveau"] == niveau)
+        & (previsions["gare_depart"] == gare_depart)
+        & (previsions["gare_arrivee"] == gare_arrivee)
+    )
+    return previsions[masque].sort_values("Date")
@@ -0,0 +1,173 @@
+# src/data/snapshot.py
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from src.config import DATA_DIR
+
+DOSSIER_SNAPSHOTS = DATA_DIR / "snapshots"
+FICHIER_COURANT = "CURRENT"
+NB_VERSIONS_GARDEES = 3
+# À incrémenter quand le contenu d'un snapshot change : les mêmes données donnent alors une nouvelle version
+FORMAT_SNAPSHOT = 7
+
+
+def version_donnees(df: pd.DataFrame) -> str:
+    """Empreinte courte du contenu du frame, sert d'identifiant de version."""
+    empreinte = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(empreinte.tobytes() + bytes([FORMAT_SNAPSHOT])).hexdigest()[:12]
+
+
+def _ecrire_table(df: pd.DataFrame, chemin: Path) -> None:
+    # Non compressé : c'est ce qui permet de lire les colonnes directement dans le mmap
+    feather.write_feather(df.reset_index(drop=True), chemin, compression="uncompressed")
+
+
+def _lire_table(chemin: Path) -> pa.Table:
+    with pa.memory_map(str(chemin), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _ecrire_vue(vue: dict, dossier: Path) -> None:
+    """Tables de la vue par défaut en Arrow, résumé en JSON, cartes en HTML."""
+    dossier.mkdir(parents=True, exist_ok=True)
+    for nom, valeur in vue.items():
+        if isinstance(valeur, pd.DataFrame):
+            _ecrire_table(valeur, dossier / f"{nom}.arrow")
+    (dossier / "resume.json").write_text(json.dumps(vue["resume"]))
+    for nb_trajets, html in vue["cartes"].items():
+        (dossier / f"carte_{nb_trajets}.html").write_text(html)
+
+
+def _lire_vue(dossier: Path) -> dict | None:
+    if not dossier.exists():
+        return None
+    vue = {chemin.stem: _lire_table(chemin) for chemin in sorted(dossier.glob("*.arrow"))}
+    vue["resume"] = json.loads((dossier / "resume.json").read_text())
+    vue["cartes"] = {
+        int(chemin.stem.removeprefix("carte_")): chemin.read_text()
+        for chemin in dossier.glob("carte_*.html")
+    }
+    return vue
+
+
+def publier_snapshot(
+    df: pd.DataFrame,
+    aggregats: dict[str, pd.DataFrame],
+    meta: dict | None = None,
+    dossier: Path | None = None,
+    vue_defaut: dict | None = None,
+) -> str:
+    """
+    Écrit la base enrichie, ses agrégats et la vue par défaut précalculée dans un
+    nouveau dossier versionné, puis bascule le pointeur CURRENT de façon atomique.
+    """
+    dossier = Path(dossier or DOSSIER_SNAPSHOTS)
+    dossier.mkdir(parents=True, exist_ok=True)
+    version = version_donnees(df)
+    cible = dossier / version
+
+    if not cible.exists():
+        tmp = dossier / f".{version}.{os.getpid()}.tmp"
+        (tmp / "aggregats").mkdir(parents=True, exist_ok=True)
+        _ecrire_table(df, tmp / "donnees.arrow")
+        for nom, table in aggregats.items():
+            _ecrire_table(table, tmp / "aggregats" / f"{nom}.arrow")
+        if vue_defaut is not None:
+            _ecrire_vue(vue_defaut, tmp / "vue_defaut")
+        infos = {"version": version, "format": FORMAT_SNAPSHOT, "cree_le": time.time(), **(meta or {})}
+        (tmp / "meta.json").write_text(json.dumps(infos))
+        try:
+            os.replace(tmp, cible)
+        except OSError:
+            # un autre process a publié la même version entre-temps
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    pointeur_tmp = dossier / f".{FICHIER_COURANT}.{os.getpid()}.tmp"
+    pointeur_tmp.write_text(version)
+    os.replace(pointeur_tmp, dossier / FICHIER_COURANT)
+
+    nettoyer_snapshots(dossier, garder=version)
+    return version
+
+
+def version_courante(dossier: Path | None = None) -> str | None:
+    """Version pointée par CURRENT (None si aucun snapshot publié)."""
+    pointeur = Path(dossier or DOSSIER_SNAPSHOTS) / FICHIER_COURANT
+    if not pointeur.exists():
+        return None
+    return pointeur.read_text().strip() or None
+
+
+def ouvrir_snapshot(dossier: Path | None = None, version: str | None = None) -> dict | None:
+    """
+    Ouvre un snapshot en memory-map : rien n'est décodé à l'ouverture et
+    plusieurs process sur la même machine partagent les pages via le cache OS.
+    Renvoie {"version", "meta", "donnees": pa.Table, "aggregats": {nom: pa.Table},
+    "vue_defaut": {nom: pa.Table, "resume": dict, "cartes": {nb_trajets: html}} ou None}.
+    """
+    dossier = Path(dossier or DOSSIER_SNAPSHOTS)
+    version = version or version_courante(dossier)
+    if version is None or not (dossier / version).exists():
+        return None
+
+    racine = dossier / version
+    return {
+        "version": version,
+        "meta": json.loads((racine / "meta.json").read_text()),
+        "donnees": _lire_table(racine / "donnees.arrow"),
+        "aggregats": {
+            chemin.stem: _lire_table(chemin)
+            for chemin in sorted((racine / "aggregats").glob("*.arrow"))
+        },
+        "vue_defaut": _lire_vue(racine / "vue_defaut"),
+    }
+
+
+def marquer_verifie(version: str, dossier: Path | None = None, **champs) -> None:
+    """
+    Note que la version a été revérifiée (source inchangée) sans rien recalculer ;
+    `champs` met à jour d'autres métadonnées (ex. empreinte de sources aux données identiques).
+    """
+    chemin = Path(dossier or DOSSIER_SNAPSHOTS) / version / "meta.json"
+    meta = json.loads(chemin.read_text())
+    meta.update(champs, verifie_le=time.time())
+    tmp = chemin.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, chemin)
+
+
+def en_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Conversion en pandas qui réutilise les buffers mappés quand c'est possible
+    (colonnes numériques sans valeurs manquantes).
+    """
+    return table.to_pandas(split_blocks=True)
+
+
+def versions_publiees(dossier: Path | None = None) -> set[str]:
+    """Versions dont le snapshot est encore sur disque."""
+    dossier = Path(dossier or DOSSIER_SNAPSHOTS)
+    if not dossier.exists():
+        return set()
+    return {p.name for p in dossier.iterdir() if p.is_dir() and not p.name.startswith(".")}
+
+
+def nettoyer_snapshots(dossier: Path | None = None, garder: str | None = None) -> None:
+    """Supprime les vieilles versions (les lecteurs déjà ouverts gardent leur mmap)."""
+    dossier = Path(dossier or DOSSIER_SNAPSHOTS)
+    versions = sorted(
+        (p for p in dossier.iterdir() if p.is_dir() and not p.name.startswith(".")),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for ancienne in versions[NB_VERSIONS_GARDEES:]:
+        if ancienne.name != garder:
+            shutil.rmtree(ancienne, ignore_errors=True)
@@ -0,0 +1,182 @@
+# src/data/store.py
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from src.config import DATA_DIR
+from src.data.increments import cellules_touchees
+
+DOSSIER_STORE = DATA_DIR / "store"
+
+# <version>/reseau=TGV/Year=2024/service=National/ : un filtre sur ces colonnes ne lit que les bons dossiers
+PARTITIONNEMENT = ds.partitioning(
+    pa.schema([("reseau", pa.string()), ("Year", pa.int64()), ("service", pa.string())]),
+    flavor="hive",
+)
+CLES_PARTITIONS = PARTITIONNEMENT.schema.names
+TAILLE_LOT = 50_000  # lignes par lot pour les agrégations hors mémoire
+
+
+def ecrire_store(
+    df: pd.DataFrame,
+    version: str,
+    dossier: Path | None = None,
+    modifiees: pd.DataFrame | None = None,
+    depuis: str | None = None,
+) -> Path:
+    """
+    Écrit la base enrichie en Parquet partitionné par réseau, année et service,
+    dans un dossier propre à `version` (comme les snapshots) : les lecteurs d'une
+    version plus ancienne continuent de lire ses fichiers. Avec `modifiees` (lignes
+    ajoutées, révisées ou retirées depuis la version `depuis`), seules les partitions
+    qu'elles touchent sont réécrites ; les fichiers des autres sont repris tels quels
+    (liens physiques).
+    """
+    dossier = Path(dossier or DOSSIER_STORE)
+    cible = dossier / version
+    if cible.exists():
+        return cible
+
+    tmp = dossier / f".{version}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    if modifiees is not None and depuis is not None and (dossier / depuis).exists():
+        _reprendre_partitions(dossier / depuis, tmp, modifiees)
+        df = df[cellules_touchees(df, CLES_PARTITIONS, modifiees)]
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table,
+        tmp,
+        format="parquet",
+        partitioning=PARTITIONNEMENT,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    try:
+        os.replace(tmp, cible)
+    except OSError:
+        # un autre process a écrit la même version entre-temps
+        shutil.rmtree(tmp, ignore_errors=True)
+    return cible
+
+
+def nettoyer_store(garder: set[str], dossier: Path | None = None) -> None:
+    """Supprime les versions du store dont le snapshot n'est plus gardé."""
+    dossier = Path(dossier or DOSSIER_STORE)
+    if not dossier.exists():
+        return
+    for ancien in dossier.iterdir():
+        if ancien.is_dir() and not ancien.name.startswith(".") and ancien.name not in garder:
+            shutil.rmtree(ancien, ignore_errors=True)
+
+
+def _reprendre_partitions(dossier: Path, tmp: Path, modifiees: pd.DataFrame) -> None:
+    """Recopie dans `tmp` les fichiers des partitions du store qu'aucune ligne modifiée ne touche."""
+    touchees = {
+        tuple(None if pd.isna(v) else v for v in cles)
+        for cles in modifiees[CLES_PARTITIONS].drop_duplicates().itertuples(index=False)
+    }
+    for fragment in ds.dataset(dossier, format="parquet", partitioning=PARTITIONNEMENT).get_fragments():
+        cles = ds.get_partition_keys(fragment.partition_expression)
+        if tuple(cles.get(c) for c in CLES_PARTITIONS) in touchees:
+            continue
+        cible = tmp / Path(fragment.path).relative_to(dossier)
+        cible.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(fragment.path, cible)
+        except OSError:
+            shutil.copy2(fragment.path, cible)
+
+
+def ouvrir_store(version: str | None, dossier: Path | None = None) -> ds.Dataset | None:
+    """Dataset Arrow du store de `version` (rien n'est lu avant le premier scan)."""
+    if version is None:
+        return None
+    chemin = Path(dossier or DOSSIER_STORE) / version
+    if not chemin.exists():
+        return None
+    return ds.dataset(chemin, format="parquet", partitioning=PARTITIONNEMENT)
+
+
+def filtre_store(
+    annees=None,
+    filtre_service: str = "Tous",
+    filtre_gare_depart: str = "Toutes",
+    filtre_gare_arrivee: str = "Toutes",
+    filtre_reseau: str = "Tous",
+    reseaux: list[str] | None = None,
+) -> ds.Expression | None:
+    """
+    Expression Arrow équivalente aux filtres de la sidebar. Les conditions sur
+    reseau / Year / service élaguent les partitions, les gares sont filtrées au scan.
+    """
+    conditions = []
+    if annees is not None:
+        conditions.append(ds.field("Year").isin([int(a) for a in annees]))
+    if reseaux:
+        conditions.append(ds.field("reseau").isin(list(reseaux)))
+    if filtre_reseau != "Tous":
+        conditions.append(ds.field("reseau") == filtre_reseau)
+    if filtre_service != "Tous":
+        conditions.append(ds.field("service") == filtre_service)
+    if filtre_gare_depart != "Toutes":
+        conditions.append(ds.field("gare_depart") == filtre_gare_depart)
+    if filtre_gare_arrivee != "Toutes":
+        conditions.append(ds.field("gare_arrivee") == filtre_gare_arrivee)
+
+    if not conditions:
+        return None
+    filtre = conditions[0]
+    for condition in conditions[1:]:
+        filtre = filtre & condition
+    return filtre
+
+
+def lire_store(
+    version: str | None,
+    dossier: Path | None = None,
+    reseaux: list[str] | None = None,
+    colonnes: list[str] | None = None,
+    filtre: ds.Expression | None = None,
+) -> pd.DataFrame:
+    """Lit le store de `version` en ne touchant que les partitions qui correspondent au filtre."""
+    dataset = ouvrir_store(version, dossier)
+    if dataset is None:
+        return pd.DataFrame()
+    if reseaux:
+        condition = ds.field("reseau").isin(list(reseaux))
+        filtre = condition if filtre is None else filtre & condition
+    return dataset.to_table(columns=colonnes, filter=filtre).to_pandas()
+
+
+def agreger_par_lots(
+    composantes,
+    par: list[str],
+    version: str,
+    filtre: ds.Expression | None = None,
+    colonnes: list[str] | None = None,
+    dossier: Path | None = None,
+    taille_lot: int = TAILLE_LOT,
+) -> pd.DataFrame:
+    """
+    Agrégation hors mémoire : `composantes(df_lot, par)` est appliquée lot par lot
+    (sommes additives, cf. composantes_trafic / composantes_causes) puis les
+    résultats partiels sont additionnés. La mémoire reste bornée par la taille d'un lot.
+    """
+    dataset = ouvrir_store(version, dossier)
+    if dataset is None:
+        return pd.DataFrame()
+
+    partiels = []
+    for lot in dataset.to_batches(columns=colonnes, filter=filtre, batch_size=taille_lot):
+        if lot.num_rows:
+            partiels.append(composantes(lot.to_pandas(), par))
+    if not partiels:
+        return composantes(dataset.schema.empty_table().to_pandas(), par)
+
+    cumul = pd.concat(partiels, ignore_index=True)
+    return cumul.groupby(par, sort=True, dropna=False).sum(numeric_only=True).reset_index()
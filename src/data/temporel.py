@@ -0,0 +1,56 @@
+# src/data/temporel.py
+import pandas as pd
+
+from src.data.aggregats import reagreger_trafic, taux_trafic
+from src.data.transform import lisser_metriques
+
+# Granularités du graphique temporel -> clés de regroupement
+GRANULARITES = {
+    "mois": ["Year", "Month"],
+    "trimestre": ["Year", "Quarter"],
+    "annee": ["Year"],
+    "saison": ["Month"],  # même mois calendaire, toutes années confondues
+}
+LIBELLES_GRANULARITES = {"mois": "Mois", "trimestre": "Trimestre", "annee": "Année", "saison": "Saisonnalité"}
+NOMS_MOIS = ["Jan", "Fév", "Mar", "Avr", "Mai", "Juin", "Juil", "Août", "Sep", "Oct", "Nov", "Déc"]
+FENETRE_LISSAGE = 10  # mois
+
+
+def cumuls_temporels(cellules: pd.DataFrame, fenetre: int = FENETRE_LISSAGE) -> dict[str, pd.DataFrame]:
+    """
+    Séries du graphique temporel à chaque granularité, réagrégées exactement depuis
+    les sommes des cellules mensuelles (jamais depuis les lignes brutes).
+    La série mensuelle est livrée déjà lissée : changer de granularité n'est qu'un lookup.
+    """
+    if cellules.empty:
+        return {nom: pd.DataFrame() for nom in GRANULARITES}
+
+    mensuel = reagreger_trafic(cellules, par=["Year", "Month"])
+    mensuel["Quarter"] = (mensuel["Month"] - 1) // 3 + 1
+
+    series = {}
+    for nom, cles in GRANULARITES.items():
+        grouped = mensuel if nom == "mois" else reagreger_trafic(mensuel, par=cles)
+        series[nom] = taux_trafic(grouped, cles)
+
+    # Date de début de chaque période (axe des x), nom du mois pour la saisonnalité
+    premier_mois = {
+        "mois": series["mois"]["Month"],
+        "trimestre": (series["trimestre"]["Quarter"] - 1) * 3 + 1,
+        "annee": 1,
+    }
+    for nom, debut in premier_mois.items():
+        series[nom]["Date"] = pd.to_datetime(series[nom][["Year"]].assign(Month=debut, day=1))
+    series["saison"]["Mois"] = [NOMS_MOIS[m - 1] for m in series["saison"]["Month"]]
+
+    series["mois"] = lisser_metriques(series["mois"], fenetre)
+    return series
+
+
+def carte_chaleur(mensuel: pd.DataFrame, colonne: str) -> pd.DataFrame:
+    """Tableau Année × Mois d'un taux (mois absents = NaN), à partir de la série mensuelle."""
+    return (
+        mensuel.pivot(index="Year", columns="Month", values=colonne)
+        .reindex(columns=range(1, 13))
+        .rename(columns=lambda m: NOMS_MOIS[m - 1])
+    )
@@ -22,6 +22,10 @@ def enrichir_base(df: pd.DataFrame) -> pd.DataFrame:
         if c not in df.columns:
             df[c] = 0
 
+    # base historique = TGV uniquement
+    if "reseau" not in df.columns:
+        df["reseau"] = "TGV"
+
     return df
 
 
@@ -54,3 +58,44 @@ def generer_metrics_synthetiques(df_filtre: pd.DataFrame) -> pd.DataFrame:
     ).fillna(0)
 
     return grouped
+
+
+def lisser_metriques(df_metrics: pd.DataFrame, fenetre: int = 10) -> pd.DataFrame:
+    """Ajoute les taux lissés (moyenne mobile centrée) du graphique temporel."""
+    df_metrics = df_metrics.copy()
+    for c in ("late_rate", "cancellation_rate"):
+        df_metrics[f"{c}_smooth"] = df_metrics[c].rolling(window=fenetre, center=True, min_periods=1).mean()
+    return df_metrics
+
+
+def masque_filtres(
+    df: pd.DataFrame,
+    annees,
+    filtre_service: str = "Tous",
+    filtre_gare_depart: str = "Toutes",
+    filtre_gare_arrivee: str = "Toutes",
+    filtre_reseau: str = "Tous",
+) -> pd.Series:
+    """Masque booléen des filtres de la sidebar ("Tous"/"Toutes" = pas de filtre)."""
+    masque = df["Year"].isin(annees)
+    if filtre_reseau != "Tous":
+        masque &= df["reseau"] == filtre_reseau
+    if filtre_service != "Tous":
+        masque &= df["service"] == filtre_service
+    if filtre_gare_depart != "Toutes":
+        masque &= df["gare_depart"] == filtre_gare_depart
+    if filtre_gare_arrivee != "Toutes":
+        masque &= df["gare_arrivee"] == filtre_gare_arrivee
+    return masque
+
+
+def appliquer_filtres(
+    df: pd.DataFrame,
+    annees,
+    filtre_service: str = "Tous",
+    filtre_gare_depart: str = "Toutes",
+    filtre_gare_arrivee: str = "Toutes",
+    filtre_reseau: str = "Tous",
+) -> pd.DataFrame:
+    """Applique les filtres de la sidebar ("Tous"/"Toutes" = pas de filtre)."""
+    return df[masque_filtres(df, annees, filtre_service, filtre_gare_depart, filtre_gare_arrivee, filtre_reseau)]
@@ -0,0 +1,44 @@
+# src/data/vue_defaut.py
+import pandas as pd
+
+from src.data.aggregats import retards_par_liaison
+from src.data.carte import OPTIONS_NB_TRAJETS, construire_carte, rendre_carte
+from src.data.causes import finaliser_causes, reagreger_composantes
+from src.data.gares import finaliser_gares
+from src.data.kpi import calculer_kpis
+from src.data.temporel import cumuls_temporels
+
+
+def calculer_vue_defaut(df: pd.DataFrame, aggregats: dict[str, pd.DataFrame]) -> dict:
+    """
+    Précalcule la vue d'accueil (toutes les années, aucun filtre) au moment de la publication :
+    KPI, séries temporelles à chaque granularité, causes, indicateurs par gare et cartes rendues
+    (rôle "depart", comme la carte à l'ouverture).
+    Le premier affichage n'a plus ni store à lire ni agrégat à calculer.
+    """
+    annee_courante = int(df["Year"].max())
+    kpis = calculer_kpis(df[df["Year"].isin([annee_courante - 1, annee_courante])], par=["Year"])
+
+    gares = finaliser_gares(aggregats["gares"], coordonnees=aggregats["coordonnees"])
+    departs = gares[gares["role"] == "depart"].dropna(subset=["lat", "lon"])
+    trajets = retards_par_liaison(aggregats["trafic"], aggregats["distances"])
+    cartes = {}
+    if not departs.empty:
+        cartes = {
+            nb: rendre_carte(construire_carte(departs, trajets, nb, aggregats["coordonnees"]))
+            for nb in OPTIONS_NB_TRAJETS
+        }
+
+    return {
+        "resume": {
+            "annee_courante": annee_courante,
+            "nb_train_prevu": df["nb_train_prevu"].sum().item(),
+            "nb_lignes": len(df),
+        },
+        "kpis": kpis,
+        **{f"temporel_{nom}": serie for nom, serie in cumuls_temporels(aggregats["trafic"]).items()},
+        "causes": finaliser_causes(reagreger_composantes(aggregats["causes"])),
+        "gares": gares,
+        "liaisons": trajets,
+        "cartes": cartes,
+    }
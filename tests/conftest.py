@@ -0,0 +1,23 @@
+# tests/conftest.py
+import pandas as pd
+import pytest
+
+from src.data import collect_api, export, snapshot, store
+from src.data.factice import generer_donnees_factices
+from src.data.transform import enrichir_base
+
+
+@pytest.fixture
+def dossier_donnees(tmp_path, monkeypatch):
+    """Snapshots, store, exports et état de collecte dans un dossier temporaire (au lieu de data/)."""
+    monkeypatch.setattr(snapshot, "DOSSIER_SNAPSHOTS", tmp_path / "snapshots")
+    monkeypatch.setattr(store, "DOSSIER_STORE", tmp_path / "store")
+    monkeypatch.setattr(export, "DOSSIER_EXPORTS", tmp_path / "exports")
+    monkeypatch.setattr(collect_api, "FICHIER_ETAT_COLLECTE", tmp_path / "collecte.json")
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def base_factice() -> pd.DataFrame:
+    """Petite base enrichie synthétique : 3 ans × 40 liaisons."""
+    return enrichir_base(generer_donnees_factices(nb_annees=3, nb_liaisons=40))
@@ -0,0 +1,27 @@
+# tests/test_anomalies.py
+import numpy as np
+import pandas as pd
+
+from src.data.anomalies import mesures_mensuelles, mettre_a_jour_anomalies
+
+
+def test_lignes_sans_gares_ecartees_du_scoring(base_factice):
+    # TER : 2 régions x 24 mois, même clé de liaison (reseau, service, NaN, NaN)
+    mois = pd.date_range("2023-01", periods=24, freq="MS")
+    ter = pd.DataFrame([
+        {
+            "reseau": "TER", "service": "Régional", "region": region,
+            "gare_depart": np.nan, "gare_arrivee": np.nan,
+            "Year": m.year, "Month": m.month,
+            "nb_train_prevu": 1000.0, "nb_annulation": 20.0, "nb_train_retard_arrivee": 90.0,
+        }
+        for m in mois for region in ("Bretagne", "Occitanie")
+    ])
+    df = pd.concat([base_factice, ter], ignore_index=True)
+
+    mesures = mesures_mensuelles(df)
+    assert len(mesures) == len(mesures_mensuelles(base_factice))
+    assert mesures[["gare_depart", "gare_arrivee"]].notna().all().all()
+
+    anomalies = mettre_a_jour_anomalies(df)["anomalies"]
+    assert not (anomalies["reseau"] == "TER").any()
@@ -0,0 +1,29 @@
+# tests/test_collect_api.py
+from src.data import collect_api
+
+PAGE = {
+    "nhits": 2,
+    "records": [
+        {"recordid": "a", "fields": {"date": "2024-01", "gare_depart": "PARIS LYON", "nb_train_prevu": 310}},
+        {"recordid": "b", "fields": {"date": "2024-02", "gare_depart": "PARIS LYON", "nb_train_prevu": 295}},
+    ],
+}
+
+
+def test_collecte_sans_colonne_empreinte(monkeypatch):
+    monkeypatch.setattr(collect_api, "_telecharger_pages", lambda dataset: ([PAGE, PAGE], True))
+    df = collect_api.telecharger_dataset("jeu", nb_annees=5)
+    assert len(df) == len(PAGE["records"])  # page reçue deux fois : dédoublonnée
+    assert "empreinte" not in df.columns
+
+
+def test_collecte_jamais_coherente_ne_publie_rien(monkeypatch):
+    tentatives = []
+
+    def pages_incoherentes(dataset):
+        tentatives.append(dataset)
+        return [PAGE], False
+
+    monkeypatch.setattr(collect_api, "_telecharger_pages", pages_incoherentes)
+    assert collect_api.telecharger_dataset("jeu", nb_annees=5).empty
+    assert len(tentatives) == collect_api.NB_TENTATIVES
@@ -0,0 +1,42 @@
+# tests/test_collect_local.py
+import gzip
+import json
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.data.collect_local import lire_fichier
+
+LIGNES = [
+    {"date": "2024-01", "gare_depart": "PARIS LYON", "gare_arrivee": "MARSEILLE ST CHARLES", "nb_train_prevu": 310.0},
+    {"date": "2024-02", "gare_depart": "LYON PART DIEU", "gare_arrivee": "PARIS LYON", "nb_train_prevu": 295.0},
+]
+ATTENDU = pd.DataFrame(LIGNES)
+
+
+def _ecrire(chemin, texte):
+    if chemin.suffix == ".gz":
+        chemin.write_bytes(gzip.compress(texte.encode()))
+    else:
+        chemin.write_text(texte)
+    return chemin
+
+
+FORMATS = {
+    "csv": ("export.csv", "\n".join([";".join(LIGNES[0])] + [";".join(str(v) for v in r.values()) for r in LIGNES])),
+    "tableau": ("export.json", json.dumps(LIGNES)),
+    "tableau_indente": ("export.json", json.dumps(LIGNES, indent=2)),
+    "ods": ("export.json", json.dumps({"records": [{"fields": r} for r in LIGNES]})),
+    "ods_indente": ("export.json", json.dumps({"records": [{"fields": r} for r in LIGNES]}, indent=2)),
+    "jsonl": ("export.jsonl", "\n".join(json.dumps(r) for r in LIGNES) + "\n"),
+    "jsonl_gz": ("export.jsonl.gz", "\n".join(json.dumps(r) for r in LIGNES) + "\n"),
+    "ods_indente_gz": ("export.json.gz", json.dumps({"records": [{"fields": r} for r in LIGNES]}, indent=2)),
+}
+
+
+@pytest.mark.parametrize("format_export", FORMATS)
+def test_lire_fichier_tous_formats(tmp_path, format_export):
+    nom, texte = FORMATS[format_export]
+    df = lire_fichier(_ecrire(tmp_path / nom, texte))
+    assert_frame_equal(df[ATTENDU.columns], ATTENDU)
@@ -0,0 +1,20 @@
+# tests/test_export.py
+import pytest
+
+from src.data.export import ExportInvalideError, fichier_export, formats_disponibles
+from src.data.pipeline import publier_donnees
+from src.data.snapshot import en_pandas, ouvrir_snapshot
+
+
+def test_export_excel_des_lignes(dossier_donnees, base_factice):
+    version = publier_donnees(base_factice, nb_annees=3, reseaux=["TGV"])
+    aggregats = {nom: en_pandas(t) for nom, t in ouvrir_snapshot(version=version)["aggregats"].items()}
+    filtres = (tuple(sorted(base_factice["Year"].unique())), "Tous", "Toutes", "Toutes", "Tous")
+
+    assert "xlsx" in formats_disponibles()
+    chemin = fichier_export(version, "lignes", "xlsx", filtres, aggregats)
+    assert chemin.read_bytes()[:2] == b"PK"  # classeur xlsx = archive zip
+    assert fichier_export(version, "lignes", "xlsx", filtres, aggregats) == chemin  # resservi tel quel
+
+    with pytest.raises(ExportInvalideError):
+        fichier_export(version, "lignes", "ods", filtres, aggregats)
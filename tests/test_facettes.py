@@ -0,0 +1,57 @@
+# tests/test_facettes.py
+import numpy as np
+import pandas as pd
+
+from src.data.facettes import (
+    annees_facettes,
+    compte_facette,
+    compter_facettes,
+    construire_index_facettes,
+    options_facette,
+)
+
+COLONNES = ["Year", "reseau", "gare_depart", "gare_arrivee", "service"]
+
+
+def _base():
+    return pd.DataFrame({
+        "Year": [2021, 2021, 2022, 2024, 2024],
+        "reseau": ["TGV", "TGV", "TGV", "TGV", "TER"],
+        "gare_depart": ["PARIS", "LYON", "PARIS", "NANTES", np.nan],
+        "gare_arrivee": ["LYON", "PARIS", "LILLE", "PARIS", np.nan],
+        "service": ["National"] * 5,
+    })
+
+
+def _index(df):
+    return construire_index_facettes(compter_facettes(df))
+
+
+def test_options_et_comptes_par_periode():
+    df = _base()
+    index = _index(df)
+    assert annees_facettes(index) == [2021, 2022, 2024]
+
+    assert options_facette(index, (2021, 2024), "reseau") == ["TER", "TGV"]
+    assert options_facette(index, (2021, 2022), "reseau") == ["TGV"]
+    assert options_facette(index, (2021, 2024), "gare_depart", "TGV") == ["LYON", "NANTES", "PARIS"]
+    assert options_facette(index, (2022, 2024), "gare_depart", "Tous") == ["NANTES", "PARIS"]
+    assert options_facette(index, (2021, 2021), "gare_arrivee", "TGV", "PARIS") == ["LYON"]
+    # année sans données dans la période : bornes prises entre les années connues
+    assert options_facette(index, (2023, 2023), "reseau") == []
+    assert options_facette(index, (2023, 2024), "reseau") == ["TER", "TGV"]
+
+    assert compte_facette(index, (2021, 2024), "Tous", "Toutes", "Toutes", "Tous") == len(df)
+    debut, fin = periode = (2021, 2022)
+    assert compte_facette(index, periode, "TGV", "PARIS", "Toutes", "National") == (
+        df["Year"].between(debut, fin) & (df["gare_depart"] == "PARIS")
+    ).sum()
+    assert compte_facette(index, (2022, 2022), "TGV", "LYON", "PARIS", "National") == 0
+
+
+def test_gares_manquantes_comptees_mais_pas_proposees():
+    index = _index(_base())
+    # lignes TER sans gare (régularité par région) : dans les comptes, jamais dans les listes
+    assert options_facette(index, (2024, 2024), "gare_depart", "TER") == []
+    assert compte_facette(index, (2024, 2024), "TER", "Toutes", "Toutes", "Tous") == 1
+    assert _index(pd.DataFrame(columns=COLONNES)) == {}
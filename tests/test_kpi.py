@@ -0,0 +1,25 @@
+# tests/test_kpi.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.kpi import calculer_kpis
+
+
+def test_mesures_non_publiees_restent_inconnues():
+    # TGV publie retards > 30 min, retard moyen et causes ; le TER seulement les nombres de trains
+    df = pd.DataFrame({
+        "reseau": ["TGV", "TER"],
+        "nb_train_prevu": [100.0, 400.0],
+        "nb_train_retard_sup_30": [10.0, np.nan],
+        "retard_moyen_tous_trains_arrivee": [4.0, np.nan],
+        "prct_cause_infra": [60.0, np.nan],
+        "prct_cause_externe": [40.0, np.nan],
+    })
+    kpis = calculer_kpis(df, par=["reseau"]).set_index("reseau")
+
+    assert kpis.loc["TGV", "taux_retard_sup_30"] == pytest.approx(10.0)
+    assert kpis.loc["TGV", "cause_principale"] == "Infrastructure"
+    assert np.isnan(kpis.loc["TER", "taux_retard_sup_30"])
+    assert np.isnan(kpis.loc["TER", "retard_moyen"])
+    assert kpis.loc["TER", "cause_principale"] is None
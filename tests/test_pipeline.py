@@ -0,0 +1,72 @@
+# tests/test_pipeline.py
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from src.data import pipeline
+from src.data.aggregats import AGREGATS_ADDITIFS, construire_aggregats_par_lots
+from src.data.collect_api import COLONNES_CLES, DATASETS, garder_annees, harmoniser
+from src.data.factice import generer_donnees_factices
+from src.data.snapshot import en_pandas, ouvrir_snapshot
+from src.data.transform import enrichir_base
+
+
+def _simuler_api(monkeypatch, sources: dict[str, pd.DataFrame], modifies: set[str]) -> None:
+    """Collecte sans réseau : `sources` par réseau, seuls les réseaux de `modifies` ont été republiés."""
+    monkeypatch.setattr(pipeline, "sources_locales", lambda: {})
+    monkeypatch.setattr(pipeline, "reseaux_actifs", lambda: list(sources))
+    monkeypatch.setattr(
+        pipeline, "verifier_modification",
+        lambda dataset, etat: (etat is None or dataset in modifies, dataset),
+    )
+    monkeypatch.setattr(
+        pipeline, "telecharger_reseaux",
+        lambda nb_annees, reseaux: pd.concat([sources[r] for r in reseaux], ignore_index=True),
+    )
+
+
+def _trier(df: pd.DataFrame, cles: list[str]) -> pd.DataFrame:
+    return df.sort_values(cles, na_position="first").reset_index(drop=True)
+
+
+def test_rafraichir_un_reseau_publie_un_increment_egal_a_une_reconstruction(dossier_donnees, monkeypatch):
+    brut = generer_donnees_factices(nb_annees=3, nb_liaisons=40)
+    sources = {"TGV": brut.assign(reseau="TGV"), "TER": brut.assign(reseau="TER")}
+    datasets = {r: pipeline.DATASETS[r]["dataset"] for r in sources}
+    _simuler_api(monkeypatch, sources, modifies=set(datasets.values()))
+    assert pipeline.construire_snapshot(nb_annees=3) is not None
+
+    # seul le TER est republié, avec un mois de moins sur quelques liaisons
+    sources["TER"] = sources["TER"].iloc[:-3]
+    _simuler_api(monkeypatch, sources, modifies={datasets["TER"]})
+    version = pipeline.construire_snapshot(nb_annees=3)
+
+    snap = ouvrir_snapshot(version=version)
+    assert snap["meta"]["increment"] is not None
+    assert snap["meta"]["increment"]["lignes_retirees"] == len(brut) - len(sources["TER"])
+
+    complets = construire_aggregats_par_lots(version)
+    for nom, (_, cles, _) in AGREGATS_ADDITIFS.items():
+        assert_frame_equal(
+            _trier(en_pandas(snap["aggregats"][nom]), cles), _trier(complets[nom], cles), check_dtype=False
+        )
+
+
+def test_publier_le_ter_seul(dossier_donnees):
+    # format du jeu regularite-mensuelle-ter : une ligne par région et par mois, sans gares
+    mois = pd.date_range("2023-01", periods=24, freq="MS").strftime("%Y-%m")
+    brut = pd.DataFrame([
+        {
+            "date": m, "region": region,
+            "nombre_de_trains_programmes": 1000.0,
+            "nombre_de_trains_annules": 20.0,
+            "nombre_de_trains_en_retard_a_l_arrivee": 90.0,
+        }
+        for m in mois for region in ("Bretagne", "Occitanie")
+    ])
+    df = harmoniser(garder_annees(brut, 2, DATASETS["TER"]["cle"]), "TER")
+    assert set(COLONNES_CLES) <= set(df.columns)
+    assert df["gare_depart"].isna().all()
+
+    version = pipeline.publier_donnees(enrichir_base(df), nb_annees=2, reseaux=["TER"])
+    trafic = en_pandas(ouvrir_snapshot(version=version)["aggregats"]["trafic"])
+    assert trafic["nb_train_prevu"].sum() == brut["nombre_de_trains_programmes"].sum()
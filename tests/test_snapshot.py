@@ -0,0 +1,44 @@
+# tests/test_snapshot.py
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from src.data.snapshot import (
+    FORMAT_SNAPSHOT,
+    en_pandas,
+    ouvrir_snapshot,
+    publier_snapshot,
+    version_courante,
+)
+
+
+def test_ouvrir_snapshot_relit_ce_qui_a_ete_publie(tmp_path, base_factice):
+    aggregats = {"trafic": base_factice.groupby("Year", as_index=False)["nb_train_prevu"].sum()}
+    vue = {
+        "kpi": pd.DataFrame({"Year": [2024], "late_rate": [12.5]}),
+        "resume": {"nb_lignes": len(base_factice)},
+        "cartes": {5: "<div>carte</div>"},
+    }
+    meta = {"nb_annees": 3}
+    version = publier_snapshot(base_factice, aggregats, meta=meta, dossier=tmp_path, vue_defaut=vue)
+
+    snap = ouvrir_snapshot(tmp_path)
+    assert version_courante(tmp_path) == version == snap["version"]
+    assert snap["meta"]["format"] == FORMAT_SNAPSHOT
+    assert snap["meta"]["nb_annees"] == meta["nb_annees"]
+    assert_frame_equal(en_pandas(snap["donnees"]), base_factice.reset_index(drop=True))
+    assert_frame_equal(en_pandas(snap["aggregats"]["trafic"]), aggregats["trafic"])
+    assert_frame_equal(en_pandas(snap["vue_defaut"]["kpi"]), vue["kpi"])
+    assert snap["vue_defaut"]["resume"] == vue["resume"]
+    assert snap["vue_defaut"]["cartes"] == vue["cartes"]
+
+
+def test_nouvelle_version_bascule_le_pointeur(tmp_path, base_factice):
+    ancienne = publier_snapshot(base_factice, {}, dossier=tmp_path)
+    assert publier_snapshot(base_factice, {}, dossier=tmp_path) == ancienne  # mêmes données, même version
+
+    nouvelle = publier_snapshot(base_factice.iloc[:-1], {}, dossier=tmp_path)
+    assert nouvelle != ancienne
+    assert version_courante(tmp_path) == nouvelle
+    # les lecteurs encore sur l'ancienne version peuvent toujours l'ouvrir
+    assert ouvrir_snapshot(tmp_path, version=ancienne)["donnees"].num_rows == len(base_factice)
+    assert ouvrir_snapshot(tmp_path)["vue_defaut"] is None
@@ -0,0 +1,20 @@
+# tests/test_store.py
+from src.data.pipeline import publier_donnees
+from src.data.snapshot import ouvrir_snapshot
+from src.data.store import lire_store
+
+
+def test_chaque_version_lit_son_propre_store(dossier_donnees, base_factice):
+    ancienne = publier_donnees(base_factice, nb_annees=3, reseaux=["TGV"])
+    derniere_annee = base_factice["Year"].max()
+    reduite = base_factice[base_factice["Year"] < derniere_annee]
+    nouvelle = publier_donnees(reduite, nb_annees=3, reseaux=["TGV"])
+
+    assert nouvelle != ancienne
+    snap = ouvrir_snapshot(version=nouvelle)
+    assert snap["meta"]["store"] == nouvelle
+    assert snap["meta"]["increment"]["depuis"] == ancienne
+    # une session restée sur l'ancienne version lit toujours ses lignes, pas celles de la nouvelle
+    assert len(lire_store(ancienne)) == len(base_factice)
+    assert len(lire_store(nouvelle)) == len(reduite)
+    assert lire_store("inconnue").empty